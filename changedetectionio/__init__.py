@@ -32,10 +32,14 @@ def sigshutdown_handler(_signo, _stack_frame):
     logger.critical(f'Shutdown: Got Signal - {name} ({_signo}), Saving DB to disk and calling shutdown')
     datastore.sync_to_json()
     logger.success('Sync JSON to disk complete.')
+    if datastore.shard:
+        datastore.shard.leave()
     # This will throw a SystemExit exception, because eventlet.wsgi.server doesn't know how to deal with it.
     # Solution: move to gevent or other server in the future (#2014)
     datastore.stop_thread = True
     app.config.exit.set()
+    from changedetectionio import processing_pool
+    processing_pool.shutdown()
     sys.exit()
 
 def main():
@@ -70,6 +70,9 @@ def build_watch_json_schema(d):
               'notification_format',
               'notification_title',
               'proxy',
+              'schedule_cron',
+              'schedule_time_window',
+              'schedule_timezone',
               'tag',
               'title',
               'webdriver_js_execute_code'
@@ -84,7 +87,7 @@ def build_watch_json_schema(d):
                                       }
 
     schema['properties']['fetch_backend']['anyOf'].append({"type": "string",
-                                                           "enum": ["html_requests", "html_webdriver"]
+                                                           "enum": ["auto", "html_requests", "html_webdriver"]
                                                            })
 
 
@@ -105,11 +108,18 @@ def build_watch_json_schema(d):
                                                    }
 
     # Stuff that shouldn't be available but is just state-storage
-    for v in ['previous_md5', 'last_error', 'has_ldjson_price_data', 'previous_md5_before_filters', 'uuid']:
+    for v in ['adaptive_recheck_seconds', 'auto_fetch_tier', 'error_recheck_seconds', 'previous_md5', 'last_error', 'has_ldjson_price_data', 'previous_md5_before_filters',
+              'remote_etag', 'remote_last_modified', 'uuid']:
         del schema['properties'][v]
 
     schema['properties']['webdriver_delay']['anyOf'].append({'type': 'integer'})
 
+    schema['properties']['content_ready_strategy'] = {"type": "string",
+                                                      "enum": ["fixed", "network_idle", "dom_quiet", "filters"]
+                                                      }
+
+    schema['properties']['browser_steps_session_scope'] = {"type": "string", "enum": ["watch", "tag"]}
+
     schema['properties']['time_between_check'] = build_time_between_check_json_schema()
 
     # headers ?
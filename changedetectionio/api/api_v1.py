@@ -76,6 +76,8 @@ class Watch(Resource):
         # Properties are not returned as a JSON, so add the required props manually
         watch['history_n'] = watch.history_n
         watch['last_changed'] = watch.last_changed
+        watch['next_check'] = watch.next_check_time(default_seconds=self.datastore.threshold_seconds,
+                                                    schedule=self.datastore.get_schedule_for_watch(uuid))
         watch['viewed'] = watch.viewed
         return watch
 
@@ -252,6 +254,7 @@ class CreateWatch(Resource):
                     "last_changed": 1677103794,
                     "last_checked": 1677103794,
                     "last_error": false,
+                    "next_check": 1677114594,
                     "title": "",
                     "url": "http://www.quotationspage.com/random.php"
                 },
@@ -259,6 +262,7 @@ class CreateWatch(Resource):
                     "last_changed": 0,
                     "last_checked": 1676662819,
                     "last_error": false,
+                    "next_check": 1676673619,
                     "title": "QuickLook",
                     "url": "https://github.com/QL-Win/QuickLook/tags"
                 }
@@ -285,6 +289,8 @@ class CreateWatch(Resource):
                 'last_changed': watch.last_changed,
                 'last_checked': watch['last_checked'],
                 'last_error': watch['last_error'],
+                'next_check': watch.next_check_time(default_seconds=self.datastore.threshold_seconds,
+                                                    schedule=self.datastore.get_schedule_for_watch(uuid)),
                 'title': watch['title'],
                 'url': watch['url'],
                 'viewed': watch.viewed
@@ -369,10 +375,20 @@ class SystemInfo(Resource):
             {
                 'queue_size': 10 ,
                 'overdue_watches': ["watch-uuid-list"],
+                'workers': {'autoscale': True, 'busy': 3, 'count': 4, 'min': 2, 'max': 20, 'queue_size': 10, 'oldest_due_seconds': 12.5, 'average_check_seconds': 1.2,
+                            'decisions': [{'time': 1700000000, 'from': 2, 'to': 4, 'reason': "10 queued, 2 busy, 1.2s per check", 'queue_size': 10, 'oldest_due_seconds': 12.5, 'average_check_seconds': 1.2}]},
+                'browser_resource_blocking': {'blocked_requests': 300, 'blocked_by_type': {'media': 20, 'image': 280}, 'allowed_requests': 900, 'allowed_bytes': 52000000},
+                'pdf_to_html': {'conversions': 12, 'cache_hits': 30, 'timeouts': 0},
+                'playwright_async_engine': {'checks': 200, 'connections_made': 3, 'connections_recycled': 1, 'timeouts': 0, 'connections': 2, 'pages_open': 14},
+                'playwright_connection_pool': {'checks': 50, 'drivers_started': 4, 'connections_made': 5, 'connections_reused': 45, 'connections_recycled': 1, 'connection_failures': 0, 'drivers': 4, 'connections': 4},
+                'selenium_session_pool': {'checks': 60, 'sessions_created': 3, 'sessions_reused': 57, 'sessions_recycled': 1, 'session_failures': 0, 'idle_sessions': 2},
+                'requests_session_pool': {'requests': 120, 'new_connections': 20, 'reused_connections': 100, 'sessions': 2, 'sessions_created': 2, 'sessions_evicted': 0},
+                'shard': {'instance_id': 'instance-1', 'members': ['instance-1', 'instance-2'], 'owned_watches': 410},
                 'uptime': 38344.55,
                 'watch_count': 800,
                 'version': "0.40.1"
             }
+        @apiSuccess (200) {Object} browser_resource_blocking Requests blocked by the browser fetchers, 'allowed_bytes' is the Content-Length of the requests that were downloaded (not blocked)
         @apiName Get Info
         @apiGroup System Information
         """
@@ -382,22 +398,29 @@ class SystemInfo(Resource):
         # Check all watches and report which have not been checked but should have been
 
         for uuid, watch in self.datastore.data.get('watching', {}).items():
-            # see if now - last_checked is greater than the time that should have been
+            # see if now is past the time it should have been checked
             # this is not super accurate (maybe they just edited it) but better than nothing
-            t = watch.threshold_seconds()
-            if not t:
-                # Use the system wide default
-                t = self.datastore.threshold_seconds
-
-            time_since_check = time.time() - watch.get('last_checked')
+            # Uses the system wide default when not set, the adaptive interval when enabled, or the cron/time window schedule
+            next_check = self.datastore.get_next_check_time(uuid, default_seconds=self.datastore.threshold_seconds)
 
             # Allow 5 minutes of grace time before we decide it's overdue
-            if time_since_check - (5 * 60) > t:
+            if time.time() - (5 * 60) > next_check:
                 overdue_watches.append(uuid)
         from changedetectionio import __version__ as main_version
+        from changedetectionio.content_fetchers import playwright_async, playwright_pool, resource_blocking, selenium_pool, session_pool
+        from changedetectionio import pdf_to_html
+        from changedetectionio import worker_autoscaler
         return {
                    'queue_size': self.update_q.qsize(),
                    'overdue_watches': overdue_watches,
+                   'browser_resource_blocking': resource_blocking.get_stats(),
+                   'pdf_to_html': pdf_to_html.get_stats(),
+                   'playwright_async_engine': playwright_async.engine.get_stats() if playwright_async.engine else None,
+                   'playwright_connection_pool': playwright_pool.pool.get_stats() if playwright_pool.pool else None,
+                   'requests_session_pool': session_pool.get_pool().get_stats(),
+                   'selenium_session_pool': selenium_pool.pool.get_stats() if selenium_pool.pool else None,
+                   'shard': self.datastore.shard.get_state(list(self.datastore.data['watching'].keys())) if self.datastore.shard else None,
+                   'workers': worker_autoscaler.autoscaler.get_state() if worker_autoscaler.autoscaler else None,
                    'uptime': round(time.time() - self.datastore.start_time, 2),
                    'watch_count': len(self.datastore.data.get('watching', {})),
                    'version': main_version
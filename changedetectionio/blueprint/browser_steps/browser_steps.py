@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 
+import asyncio
 import os
 import time
 import re
@@ -43,35 +44,52 @@ browser_step_ui_config = {'Choose one': '0 0',
                           }
 
 
-# Good reference - https://playwright.dev/python/docs/input
-#                  https://pythonmana.com/2021/12/202112162236307035.html
-#
-# ONLY Works in Playwright because we need the fullscreen screenshot
-class steppable_browser_interface():
+class browser_steps_interface():
+    """
+    The Browser Steps for any browser engine, each engine implements an action_<name> for every operation in
+    browser_step_ui_config ('Click element' is action_click_element(selector, value))
+    """
     page = None
 
-    # Convert and perform "Click Button" for example
-    def call_action(self, action_name, selector=None, optional_value=None):
-        now = time.time()
+    def get_action(self, action_name, selector=None, optional_value=None):
+        """
+        :return: The action_ method, selector and value (with Jinja2 rendered), None for 'Choose one'
+        """
         call_action_name = re.sub('[^0-9a-zA-Z]+', '_', action_name.lower())
         if call_action_name == 'choose_one':
-            return
+            return None
 
         logger.debug(f"> Action calling '{call_action_name}'")
-        # https://playwright.dev/python/docs/selectors#xpath-selectors
-        if selector and selector.startswith('/') and not selector.startswith('//'):
-            selector = "xpath=" + selector
-
         action_handler = getattr(self, "action_" + call_action_name)
 
         # Support for Jinja2 variables in the value and selector
-
         if selector and ('{%' in selector or '{{' in selector):
             selector = jinja_render(template_str=selector)
 
         if optional_value and ('{%' in optional_value or '{{' in optional_value):
             optional_value = jinja_render(template_str=optional_value)
 
+        return action_handler, selector, optional_value
+
+
+# Good reference - https://playwright.dev/python/docs/input
+#                  https://pythonmana.com/2021/12/202112162236307035.html
+#
+# Playwright, also the live Browser Steps UI because we need the fullscreen screenshot
+class steppable_browser_interface(browser_steps_interface):
+
+    # Convert and perform "Click Button" for example
+    def call_action(self, action_name, selector=None, optional_value=None):
+        now = time.time()
+        action = self.get_action(action_name=action_name, selector=selector, optional_value=optional_value)
+        if not action:
+            return
+        action_handler, selector, optional_value = action
+
+        # https://playwright.dev/python/docs/selectors#xpath-selectors
+        if selector and selector.startswith('/') and not selector.startswith('//'):
+            selector = "xpath=" + selector
+
         action_handler(selector, optional_value)
         self.page.wait_for_timeout(1.5 * 1000)
         logger.debug(f"Call action done in {time.time()-now:.2f}s")
@@ -169,6 +187,149 @@ class steppable_browser_interface():
     def action_uncheck_checkbox(self, selector, value):
         self.page.locator(selector, timeout=1000).uncheck(timeout=1000)
 
+    def action_select_by_label(self, selector, value):
+        self.page.select_option(selector, label=value, timeout=10 * 1000)
+
+
+def xpath_literal(value):
+    "value as an xPath string, which has no escaping for quotes"
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat('" + value.replace("'", "', \"'\", '") + "')"
+
+
+# The fast Puppeteer fetcher (pyppeteer, async), the same actions as above
+class steppable_browser_interface_puppeteer(browser_steps_interface):
+
+    async def call_action(self, action_name, selector=None, optional_value=None):
+        now = time.time()
+        action = self.get_action(action_name=action_name, selector=selector, optional_value=optional_value)
+        if not action:
+            return
+        action_handler, selector, optional_value = action
+
+        await action_handler(selector, optional_value)
+        await asyncio.sleep(1.5)
+        logger.debug(f"Call action done in {time.time()-now:.2f}s")
+
+    async def get_element(self, selector, timeout):
+        "Wait for the CSS or xPath (starting with / or xpath:) element, Puppeteer has no selector engines like Playwright"
+        if selector.startswith('/') or selector.startswith('('):
+            return await self.page.waitForXPath(selector, timeout=timeout)
+        if re.match(r'^xpath1?[:=]', selector):
+            return await self.page.waitForXPath(re.sub(r'^xpath1?[:=]', '', selector), timeout=timeout)
+        return await self.page.waitForSelector(selector, timeout=timeout)
+
+    async def action_goto_url(self, selector=None, value=None):
+        now = time.time()
+        response = await self.page.goto(value, waitUntil='load', timeout=0)
+        logger.debug(f"Time to goto URL {time.time()-now:.2f}s")
+        return response
+
+    async def action_click_element_containing_text(self, selector=None, value=''):
+        if not len(value.strip()):
+            return
+        elements = await self.page.xpath(f"//*[contains(text(), {xpath_literal(value)})]")
+        if elements:
+            await elements[0].click(delay=randint(200, 500))
+
+    async def action_enter_text_in_field(self, selector, value):
+        if not len(selector.strip()):
+            return
+
+        element = await self.get_element(selector, timeout=10 * 1000)
+        # Replace what is there, like Playwright's fill()
+        await self.page.evaluate('(element) => { element.value = ""; }', element)
+        await element.type(value)
+
+    async def action_execute_js(self, selector, value):
+        response = await self.page.evaluate(value)
+        return response
+
+    async def action_click_element(self, selector, value):
+        logger.debug("Clicking element")
+        if not len(selector.strip()):
+            return
+
+        element = await self.get_element(selector, timeout=30 * 1000)
+        await element.click(delay=randint(200, 500))
+
+    async def action_click_element_if_exists(self, selector, value):
+        import pyppeteer.errors
+        logger.debug("Clicking element if exists")
+        if not len(selector.strip()):
+            return
+        try:
+            element = await self.get_element(selector, timeout=10 * 1000)
+            await element.click(delay=randint(200, 500))
+        except (pyppeteer.errors.TimeoutError, pyppeteer.errors.PyppeteerError):
+            # Not there, or the page redrew and now its long long gone
+            return
+
+    async def action_click_x_y(self, selector, value):
+        if not re.match(r'^\s?\d+\s?,\s?\d+\s?$', value):
+            raise Exception("'Click X,Y' step should be in the format of '100 , 90'")
+
+        x, y = value.strip().split(',')
+        x = int(float(x.strip()))
+        y = int(float(y.strip()))
+        await self.page.mouse.click(x, y, delay=randint(200, 500))
+
+    async def action_scroll_down(self, selector, value):
+        await self.page.evaluate('window.scrollBy(0, 600)')
+        await asyncio.sleep(1)
+
+    async def action_wait_for_seconds(self, selector, value):
+        await asyncio.sleep(float(value.strip()))
+
+    async def action_wait_for_text(self, selector, value):
+        import json
+        v = json.dumps(value)
+        await self.page.waitForFunction(f'() => document.querySelector("body").innerText.includes({v})', timeout=30000)
+
+    async def action_wait_for_text_in_element(self, selector, value):
+        import json
+        s = json.dumps(selector)
+        v = json.dumps(value)
+        await self.page.waitForFunction(f'() => document.querySelector({s}).innerText.includes({v})', timeout=30000)
+
+    async def action_press_enter(self, selector, value):
+        await self.page.keyboard.press("Enter", delay=randint(200, 500))
+
+    async def action_press_page_up(self, selector, value):
+        await self.page.keyboard.press("PageUp", delay=randint(200, 500))
+
+    async def action_press_page_down(self, selector, value):
+        await self.page.keyboard.press("PageDown", delay=randint(200, 500))
+
+    async def action_check_checkbox(self, selector, value):
+        element = await self.get_element(selector, timeout=1000)
+        if not await self.page.evaluate('(element) => element.checked', element):
+            await element.click()
+
+    async def action_uncheck_checkbox(self, selector, value):
+        element = await self.get_element(selector, timeout=1000)
+        if await self.page.evaluate('(element) => element.checked', element):
+            await element.click()
+
+    async def action_select_by_label(self, selector, value):
+        import pyppeteer.errors
+        element = await self.get_element(selector, timeout=10 * 1000)
+        found = await self.page.evaluate("""(select, label) => {
+            const option = Array.from(select.options).find((o) => o.label.trim() === label.trim());
+            if (!option) {
+                return false;
+            }
+            select.value = option.value;
+            select.dispatchEvent(new Event('input', {bubbles: true}));
+            select.dispatchEvent(new Event('change', {bubbles: true}));
+            return true;
+        }""", element, value)
+        if not found:
+            raise pyppeteer.errors.ElementHandleError(f"No option with the label '{value}'")
+
 
 # Responsible for maintaining a live 'context' with the chrome CDP
 # @todo - how long do contexts live for anyway?
@@ -62,6 +62,7 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         # Delete the tag, and any tag reference
         if datastore.data['settings']['application']['tags'].get(uuid):
             del datastore.data['settings']['application']['tags'][uuid]
+            datastore.schedule_revision += 1
 
         for watch_uuid, watch in datastore.data['watching'].items():
             if watch.get('tags') and uuid in watch['tags']:
@@ -135,7 +136,14 @@ def construct_blueprint(datastore: ChangeDetectionStore):
 #                flash(','.join(l), 'error')
 #           return redirect(url_for('tags.form_tag_edit_submit', uuid=uuid))
 
+        # At least the schedule must be valid, the scheduler uses it for every watch in this group
+        for field in [form.schedule_cron, form.schedule_time_window, form.schedule_timezone]:
+            if not field.validate(form):
+                flash(f"{field.label.text} - {','.join(field.errors)}", 'error')
+                return redirect(url_for('tags.form_tag_edit', uuid=uuid))
+
         datastore.data['settings']['application']['tags'][uuid].update(form.data)
+        datastore.schedule_revision += 1
         datastore.needs_write_urgent = True
         flash("Updated")
 
@@ -22,6 +22,9 @@ def available_fetchers():
                 t = tuple([name, obj.fetcher_description])
                 p.append(t)
 
+    # Not a fetcher by itself, picks one of the above for each check, see difference_detection_processor.call_browser_auto()
+    p.append(('auto', "Automatic - Basic fast Plaintext/HTTP Client, Chrome/Javascript only when the page needs it"))
+
     return p
 
 
@@ -29,7 +32,6 @@ def available_fetchers():
 # rather than site-specific.
 use_playwright_as_chrome_fetcher = os.getenv('PLAYWRIGHT_DRIVER_URL', False)
 if use_playwright_as_chrome_fetcher:
-    # @note - For now, browser steps always uses playwright
     if not strtobool(os.getenv('FAST_PUPPETEER_CHROME_FETCHER', 'False')):
         logger.debug('Using Playwright library as fetcher')
         from .playwright import fetcher as html_webdriver
@@ -0,0 +1,122 @@
+import asyncio
+import atexit
+import os
+import threading
+from urllib.parse import urlparse
+
+import chardet
+import requests
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# Optional, one event loop and connection pool shared by all 'html_requests' fetches instead of a blocking
+# requests.request() per watch, with a limit per host. The update_worker thread of the check still waits for the
+# request, so the number of requests in flight is still the number of workers (FETCH_WORKERS), only the connections
+# and the event loop are shared.
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+engine = None
+engine_lock = threading.Lock()
+
+
+def enabled():
+    return aiohttp is not None and strtobool(os.getenv('ASYNC_HTTP_FETCHER', 'false'))
+
+
+def supports_proxy(proxy_url):
+    # aiohttp only talks to HTTP proxies, socks5:// etc still go via requests
+    return not proxy_url or urlparse(proxy_url).scheme in ['http', 'https']
+
+
+class response():
+    """
+    Just enough of requests.Response for the 'html_requests' fetcher
+    """
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = requests.utils.get_encoding_from_headers(headers)
+
+    @property
+    def text(self):
+        encoding = self.encoding
+        if not encoding:
+            # Same as requests 'apparent_encoding'
+            encoding = chardet.detect(self.content)['encoding'] or 'utf-8'
+        try:
+            return str(self.content, encoding, errors='replace')
+        except LookupError:
+            return str(self.content, 'utf-8', errors='replace')
+
+
+class async_http_engine():
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name='async-http-fetcher').start()
+        self.session = asyncio.run_coroutine_threadsafe(self._create_session(), self.loop).result()
+        atexit.register(self.close)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(timeout=5)
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 1000)),
+                                         limit_per_host=int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS_PER_HOST', 6)),
+                                         ssl=False)
+        # No cookies shared between watches (requests.request() uses a new session every time)
+        # and no Content-Type added to the request body when the watch did not set one
+        return aiohttp.ClientSession(connector=connector,
+                                     cookie_jar=aiohttp.DummyCookieJar(),
+                                     skip_auto_headers=['Content-Type'],
+                                     trust_env=False)
+
+    async def _request(self, method, url, headers, data, timeout, proxy):
+        # Same as requests, 'timeout' is for connecting and for each read, not the whole request
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        try:
+            async with self.session.request(method=method, url=url, headers=headers, data=data, timeout=client_timeout,
+                                            proxy=proxy or None, ssl=False) as r:
+                content = await r.read()
+                # Repeated headers are joined like requests does
+                headers = requests.structures.CaseInsensitiveDict()
+                for k, v in r.headers.items():
+                    headers[k] = f"{headers[k]}, {v}" if k in headers else v
+                return response(url=str(r.url), status_code=r.status, headers=headers, content=content)
+
+        # Raise the same exceptions as requests so the error handling and messages stay the same
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"Request to {url} timed out after {timeout} seconds") from e
+        except aiohttp.InvalidURL as e:
+            raise requests.exceptions.InvalidURL(str(e)) from e
+        except aiohttp.TooManyRedirects as e:
+            raise requests.exceptions.TooManyRedirects(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def request(self, method, url, headers, data, timeout, proxy=None):
+        """
+        Called from the update_worker threads, waits for the request to finish on the shared event loop
+        """
+        return asyncio.run_coroutine_threadsafe(self._request(method=method, url=url, headers=headers, data=data,
+                                                              timeout=timeout, proxy=proxy),
+                                                self.loop).result()
+
+
+def get_engine():
+    global engine
+    with engine_lock:
+        if engine is None:
+            logger.info("Starting the async HTTP fetch engine")
+            engine = async_http_engine()
+        return engine
@@ -1,8 +1,13 @@
+import hashlib
+import json
 import os
+import threading
+import time
 from abc import abstractmethod
 from loguru import logger
 
 from changedetectionio.content_fetchers import BrowserStepsStepException
+from changedetectionio.strtobool import strtobool
 
 
 def manage_user_agent(headers, current_ua=''):
@@ -40,17 +45,30 @@ def manage_user_agent(headers, current_ua=''):
 
 
 class Fetcher():
+    # What the browser fetchers should not download, see resource_blocking.py
+    block_rules = None
     browser_connection_is_custom = None
     browser_connection_url = None
+    # Cookies and localStorage after the Browser Steps marked as 'setup' (login etc), see browser_session_load()
+    browser_session_path = None
     browser_steps = None
     browser_steps_screenshot_path = None
     content = None
+    # How a browser fetcher knows the page is ready (see res/content_ready.js), 'fixed' always waits the whole delay
+    content_ready_js = ""
+    content_ready_strategy = 'fixed'
     error = None
     fetcher_description = "No description"
+    # What the processor needs from a browser fetch besides the HTML (see difference_detection_processor.get_fetch_plan())
+    fetch_plan = {'instock_data': True, 'screenshot': True, 'xpath_data': True}
     headers = {}
     instock_data = None
     instock_data_js = ""
+    # The session was restored from browser_session_path, the 'setup' Browser Steps are not run again
+    skip_setup_steps = False
     status_code = None
+    # Can send If-None-Match/If-Modified-Since and understands a "304 Not Modified" reply
+    supports_conditional_requests = False
     webdriver_js_execute_code = None
     xpath_data = None
     xpath_element_js = ""
@@ -68,6 +86,7 @@ class Fetcher():
         # The code that scrapes elements and makes a list of elements/size/position to click on in the VisualSelector
         self.xpath_element_js = resource_string(__name__, "res/xpath_element_scraper.js").decode('utf-8')
         self.instock_data_js = resource_string(__name__, "res/stock-not-in-stock.js").decode('utf-8')
+        self.content_ready_js = resource_string(__name__, "res/content_ready.js").decode('utf-8')
 
     @abstractmethod
     def get_error(self):
@@ -103,6 +122,14 @@ class Fetcher():
     def is_ready(self):
         return True
 
+    def content_ready_options(self, include_filters):
+        """
+        :return: The options for res/content_ready.js, JSON and jq filters are not something to wait for in the page
+        """
+        return {'strategy': self.content_ready_strategy,
+                'filters': [f for f in (include_filters or []) if f.strip() and not f.startswith(('json:', 'jq:'))],
+                'quiet_ms': int(os.getenv('CONTENT_READY_QUIET_MS', 500))}
+
     def get_all_headers(self):
         """
         Get all headers but ensure all keys are lowercase
@@ -110,6 +137,17 @@ class Fetcher():
         """
         return {k.lower(): v for k, v in self.headers.items()}
 
+    def get_conditional_request_validators(self):
+        """
+        The validators from the reply that can be sent back with the next request (If-None-Match/If-Modified-Since)
+        :return: dict ready to update the watch with
+        """
+        if not self.supports_conditional_requests:
+            return {}
+
+        headers = self.get_all_headers()
+        return {'remote_etag': headers.get('etag'), 'remote_last_modified': headers.get('last-modified')}
+
     def browser_steps_get_valid_steps(self):
         if self.browser_steps is not None and len(self.browser_steps):
             valid_steps = filter(
@@ -120,41 +158,120 @@ class Fetcher():
 
         return None
 
-    def iterate_browser_steps(self):
-        from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
-        from playwright._impl._errors import TimeoutError, Error
+    def browser_steps_to_run(self):
+        """
+        The Browser Steps for this check, without the 'setup' ones when the session was restored
+        :return: (step_n, operation, selector, optional_value) with Jinja2 rendered, step_n counts from the first valid step
+        """
         from changedetectionio.safe_jinja import render as jinja_render
 
         step_n = 0
+        for step in self.browser_steps_get_valid_steps() or []:
+            step_n += 1
+            if self.skip_setup_steps and step.get('setup'):
+                logger.debug(f">> Iterating check - browser Step n {step_n} - {step['operation']} skipped, the session was restored")
+                continue
 
-        if self.browser_steps is not None and len(self.browser_steps):
-            interface = steppable_browser_interface()
-            interface.page = self.page
-            valid_steps = self.browser_steps_get_valid_steps()
+            optional_value = step['optional_value']
+            selector = step['selector']
+            # Support for jinja2 template in step values, with date module added
+            if '{%' in step['optional_value'] or '{{' in step['optional_value']:
+                optional_value = jinja_render(template_str=step['optional_value'])
+            if '{%' in step['selector'] or '{{' in step['selector']:
+                selector = jinja_render(template_str=step['selector'])
 
-            for step in valid_steps:
-                step_n += 1
-                logger.debug(f">> Iterating check - browser Step n {step_n} - {step['operation']}...")
+            yield step_n, step['operation'], selector, optional_value
+
+    @property
+    def capture_all_browser_steps(self):
+        # Every step is normally only captured when it fails
+        return strtobool(os.getenv('BROWSER_STEPS_DEBUG', 'false'))
+
+    def iterate_browser_steps(self):
+        from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
+        from playwright._impl._errors import TimeoutError, Error
+
+        interface = steppable_browser_interface()
+        interface.page = self.page
+        capture_all_steps = self.capture_all_browser_steps
+
+        for step_n, operation, selector, optional_value in self.browser_steps_to_run():
+            logger.debug(f">> Iterating check - browser Step n {step_n} - {operation}...")
+            if capture_all_steps:
                 self.screenshot_step("before-" + str(step_n))
                 self.save_step_html("before-" + str(step_n))
-                try:
-                    optional_value = step['optional_value']
-                    selector = step['selector']
-                    # Support for jinja2 template in step values, with date module added
-                    if '{%' in step['optional_value'] or '{{' in step['optional_value']:
-                        optional_value = jinja_render(template_str=step['optional_value'])
-                    if '{%' in step['selector'] or '{{' in step['selector']:
-                        selector = jinja_render(template_str=step['selector'])
-
-                    getattr(interface, "call_action")(action_name=step['operation'],
-                                                      selector=selector,
-                                                      optional_value=optional_value)
+            try:
+                interface.call_action(action_name=operation,
+                                      selector=selector,
+                                      optional_value=optional_value)
+                if capture_all_steps:
                     self.screenshot_step(step_n)
                     self.save_step_html(step_n)
-                except (Error, TimeoutError) as e:
-                    logger.debug(str(e))
-                    # Stop processing here
-                    raise BrowserStepsStepException(step_n=step_n, original_e=e)
+            except (Error, TimeoutError) as e:
+                logger.debug(str(e))
+                # What the page looked like when it failed, for the Browser Steps UI
+                if not capture_all_steps:
+                    try:
+                        self.screenshot_step("before-" + str(step_n))
+                        self.save_step_html("before-" + str(step_n))
+                    except Exception as screenshot_e:
+                        logger.debug(f"Could not capture the failed browser step {step_n} - {str(screenshot_e)}")
+                # Stop processing here
+                raise BrowserStepsStepException(step_n=step_n, original_e=e)
+
+    def browser_steps_setup_hash(self):
+        """
+        :return: Checksum of the Browser Steps marked as 'setup', so a saved session is not used after they were edited, None when there are none
+        """
+        setup_steps = [s for s in self.browser_steps_get_valid_steps() or [] if s.get('setup')]
+        if not setup_steps:
+            return None
+        return hashlib.md5(json.dumps(setup_steps, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def browser_session_load(self):
+        """
+        The session saved after the last full run of the Browser Steps, when it can be used instead of running the
+        'setup' steps again, at most BROWSER_STEPS_SESSION_MAX_AGE_SECONDS old
+        :return: Playwright storage state (cookies, origins/localStorage) or None
+        """
+        setup_hash = self.browser_steps_setup_hash()
+        if not self.browser_session_path or not setup_hash or not os.path.isfile(self.browser_session_path):
+            return None
+
+        try:
+            with open(self.browser_session_path, 'r') as f:
+                session = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the browser session {self.browser_session_path} - {str(e)}")
+            return None
+
+        if session.get('setup_steps') != setup_hash:
+            logger.debug(f"Browser session {self.browser_session_path} is from other setup steps, not using it")
+            return None
+
+        max_age = int(os.getenv('BROWSER_STEPS_SESSION_MAX_AGE_SECONDS', 86400))
+        if max_age and time.time() - session.get('saved', 0) > max_age:
+            logger.debug(f"Browser session {self.browser_session_path} is older than {max_age}s, not using it")
+            return None
+
+        return session.get('storage_state')
+
+    def browser_session_save(self, storage_state):
+        setup_hash = self.browser_steps_setup_hash()
+        if not self.browser_session_path or not setup_hash:
+            return
+
+        os.makedirs(os.path.dirname(self.browser_session_path), exist_ok=True)
+        # Watches sharing the session of a tag can be checked at the same time
+        tmp_path = f"{self.browser_session_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved': int(time.time()), 'setup_steps': setup_hash, 'storage_state': storage_state}, f)
+        os.replace(tmp_path, self.browser_session_path)
+        logger.debug(f"Saved browser session to {self.browser_session_path}")
+
+    def browser_session_forget(self):
+        if self.browser_session_path and os.path.isfile(self.browser_session_path):
+            os.unlink(self.browser_session_path)
 
     # It's always good to reset these
     def delete_browser_steps_screenshots(self):
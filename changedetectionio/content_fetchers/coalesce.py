@@ -0,0 +1,125 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+
+from loguru import logger
+
+
+def fetch_signature(fetcher_obj, proxy_url, custom_browser_connection_url, url, request_headers, request_body,
+                    request_method, ignore_status_codes, is_binary, browser_steps=None, webdriver_js_execute_code=None,
+                    render_extract_delay=0, content_ready_strategy=None, fetch_plan=None,
+                    block_rules=None):
+    """
+    Checksum of everything that goes into a fetch, watches with the same signature would receive the same reply
+    Filters, triggers and notifications are not part of it, those are applied per-watch after the fetch
+    """
+    inputs = [
+        f"{fetcher_obj.__module__}.{fetcher_obj.__name__}",
+        proxy_url,
+        custom_browser_connection_url,
+        url,
+        sorted((str(k).lower(), str(v)) for k, v in (request_headers or {}).items()),
+        request_body,
+        (request_method or 'GET').upper(),
+        bool(ignore_status_codes),
+        bool(is_binary),
+        browser_steps or [],
+        webdriver_js_execute_code,
+        render_extract_delay,
+        content_ready_strategy,
+        fetch_plan,
+        block_rules,
+    ]
+    return hashlib.md5(json.dumps(inputs, default=str).encode('utf-8')).hexdigest()
+
+
+class FetchCoalescer():
+    """
+    Shares one fetch between watches that have the same fetch signature and are checked within a few seconds of each other.
+    The first worker does the real fetch, other workers with the same signature wait for it and get a copy of the
+    finished fetcher (or the same exception), then each one runs its own processor on it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # signature -> (time finished, fetcher, exception)
+        self.results = {}
+        # signature -> threading.Event set when the fetch finishes
+        self.in_flight = {}
+        # watch uuid -> signature of its last fetch, the ticker uses it to find watches that would share a fetch
+        self.watch_signatures = {}
+
+    # Set in place by processors (headers, xpath data, restock data), so each copy gets its own
+    mutable_attributes = ['headers', 'instock_data', 'xpath_data']
+
+    def _expire(self, window_seconds):
+        now = time.time()
+        for signature in [s for s, r in self.results.items() if now - r[0] > window_seconds]:
+            del self.results[signature]
+
+    def _copy(self, fetcher):
+        # Processors replace .content etc on their own fetcher, so each watch gets its own copy
+        fetcher = copy.copy(fetcher)
+        for attr in self.mutable_attributes:
+            setattr(fetcher, attr, copy.deepcopy(getattr(fetcher, attr, None)))
+        return fetcher
+
+    def _reply(self, result):
+        (finished, fetcher, exception) = result
+        if exception is not None:
+            raise exception
+        return self._copy(fetcher)
+
+    def set_watch_signature(self, uuid, signature):
+        with self.lock:
+            self.watch_signatures[uuid] = signature
+
+    def get_watch_signature(self, uuid):
+        """
+        :return: The signature of the last fetch of this watch, None when it was not fetched with coalescing yet
+        """
+        return self.watch_signatures.get(uuid)
+
+    def fetch(self, signature, window_seconds, fetch_function):
+        """
+        Return the fetcher from fetch_function(), or a copy of one fetched with the same signature in the last window_seconds
+        """
+        with self.lock:
+            self._expire(window_seconds)
+            result = self.results.get(signature)
+            if result:
+                logger.debug(f"Re-using fetch {signature} finished {time.time() - result[0]:.2f}s ago")
+                return self._reply(result)
+            event = self.in_flight.get(signature)
+            if not event:
+                self.in_flight[signature] = threading.Event()
+
+        if event:
+            # Someone else is already fetching exactly this, wait for them
+            logger.debug(f"Waiting for fetch {signature} already in progress")
+            event.wait()
+            with self.lock:
+                result = self.results.get(signature)
+            if result:
+                return self._reply(result)
+            # Probably expired already, do our own fetch
+            return fetch_function()
+
+        fetcher = None
+        exception = None
+        try:
+            fetcher = fetch_function()
+            return fetcher
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            with self.lock:
+                # Keep a copy, the first worker's processor is already changing its fetcher while the others copy it
+                self.results[signature] = (time.time(), self._copy(fetcher) if fetcher is not None else None, exception)
+                self.in_flight.pop(signature).set()
+
+
+fetch_coalescer = FetchCoalescer()
@@ -21,6 +21,14 @@ class checksumFromPreviousCheckWasTheSame(Exception):
         return
 
 
+class NotModified(checksumFromPreviousCheckWasTheSame):
+    # The server replied "304 Not Modified" to a conditional request (ETag/Last-Modified), nothing to process
+    def __init__(self, status_code, url):
+        self.status_code = status_code
+        self.url = url
+        return
+
+
 class JSActionExceptions(Exception):
     def __init__(self, status_code, url, screenshot, message=''):
         self.status_code = status_code
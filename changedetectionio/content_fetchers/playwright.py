@@ -1,10 +1,14 @@
+import contextlib
 import json
 import os
+import time
 from urllib.parse import urlparse
 
 from loguru import logger
 
+from changedetectionio.content_fetchers import resource_blocking
 from changedetectionio.content_fetchers.base import Fetcher, manage_user_agent
+from changedetectionio.content_fetchers import BrowserStepsStepException
 from changedetectionio.content_fetchers.exceptions import PageUnloadable, Non200ErrorCodeReceived, EmptyReply, ScreenshotUnavailable
 
 class fetcher(Fetcher):
@@ -58,7 +62,8 @@ class fetcher(Fetcher):
                 self.proxy['password'] = parsed.password
 
     def screenshot_step(self, step_n=''):
-        screenshot = self.page.screenshot(type='jpeg', full_page=True, quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
+        # What is in view is enough to see what the step did
+        screenshot = self.page.screenshot(**self.screenshot_options(full_page=False))
 
         if self.browser_steps_screenshot_path is not None:
             destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.jpeg'.format(step_n))
@@ -66,6 +71,82 @@ class fetcher(Fetcher):
             with open(destination, 'wb') as f:
                 f.write(screenshot)
 
+    def wait_for_content_ready(self, max_seconds, include_filters):
+        """
+        Wait for the page to be ready (per the watch's content_ready_strategy), at most max_seconds
+        """
+        if self.content_ready_strategy == 'fixed':
+            self.page.wait_for_timeout(max_seconds * 1000)
+            return
+
+        import playwright._impl._errors
+        started = time.time()
+        try:
+            self.page.wait_for_function(**self.content_ready_wait_args(max_seconds=max_seconds, include_filters=include_filters))
+        except playwright._impl._errors.Error as e:
+            remaining = self.content_ready_wait_failed(e, max_seconds=max_seconds, started=started)
+            if remaining:
+                self.page.wait_for_timeout(remaining * 1000)
+        else:
+            logger.debug(f"Content Fetcher > Page ready ({self.content_ready_strategy}) after {time.time() - started:.2f}s")
+
+    async def async_wait_for_content_ready(self, page, max_seconds, include_filters):
+        """
+        wait_for_content_ready() for async_run()
+        """
+        if self.content_ready_strategy == 'fixed':
+            await page.wait_for_timeout(max_seconds * 1000)
+            return
+
+        import playwright._impl._errors
+        started = time.time()
+        try:
+            await page.wait_for_function(**self.content_ready_wait_args(max_seconds=max_seconds, include_filters=include_filters))
+        except playwright._impl._errors.Error as e:
+            remaining = self.content_ready_wait_failed(e, max_seconds=max_seconds, started=started)
+            if remaining:
+                await page.wait_for_timeout(remaining * 1000)
+        else:
+            logger.debug(f"Content Fetcher > Page ready ({self.content_ready_strategy}) after {time.time() - started:.2f}s")
+
+    def content_ready_wait_args(self, max_seconds, include_filters):
+        return dict(expression=self.content_ready_js,
+                    arg=self.content_ready_options(include_filters),
+                    polling=100,
+                    timeout=max_seconds * 1000)
+
+    def content_ready_wait_failed(self, e, max_seconds, started):
+        """
+        Waiting for the page to be ready raised a Playwright error
+        :return: How many seconds are still to wait
+        """
+        import playwright._impl._errors
+        if isinstance(e, playwright._impl._errors.TimeoutError):
+            logger.debug(f"Content Fetcher > Page not '{self.content_ready_strategy}' after {max_seconds}s, continuing anyway")
+            return 0
+
+        # Navigated away by itself etc, wait what is left of the delay like before
+        logger.debug(f"Content Fetcher > Could not check if the page is ready - {str(e)}")
+        return max(0, max_seconds - (time.time() - started))
+
+    def should_block_request(self, request, counter):
+        if resource_blocking.should_block(rules=self.block_rules, url=request.url, resource_type=request.resource_type):
+            counter.count_blocked(request.resource_type)
+            return True
+        return False
+
+    def route_request(self, route, request, counter):
+        if self.should_block_request(request, counter):
+            route.abort('blockedbyclient')
+        else:
+            route.continue_()
+
+    async def async_route_request(self, route, request, counter):
+        if self.should_block_request(request, counter):
+            await route.abort('blockedbyclient')
+        else:
+            await route.continue_()
+
     def save_step_html(self, step_n):
         content = self.page.content()
         destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.html'.format(step_n))
@@ -73,136 +154,281 @@ class fetcher(Fetcher):
         with open(destination, 'w') as f:
             f.write(content)
 
-    def run(self,
-            url,
-            timeout,
-            request_headers,
-            request_body,
-            request_method,
-            ignore_status_codes=False,
-            current_include_filters=None,
-            is_binary=False):
+    def screenshot_options(self, full_page=True):
+        # JPEG is better here because the screenshots can be very very large, they also travel base64 encoded over
+        # the ws:// (websocket) connection, it's recommended to use the lowest acceptable screenshot quality here
+        return dict(type='jpeg', full_page=full_page, quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
 
-        from playwright.sync_api import sync_playwright
+    def console_message_handler(self, url):
+        return lambda msg: print(f"Playwright console: Watch URL: {url} {msg.type}: {msg.text} {msg.args}")
+
+    def response_counter(self, counter):
+        return lambda response: counter.count_allowed(response.headers.get('content-length'))
+
+    def check_response(self, response, url):
+        if response is None:
+            logger.debug("Content Fetcher > Response object was none")
+            raise EmptyReply(url=url, status_code=None)
+
+    def custom_js_failed(self, e, url):
         import playwright._impl._errors
+        if isinstance(e, playwright._impl._errors.TimeoutError):
+            # This can be ok, we will try to grab what we could retrieve
+            return
+        logger.debug(f"Content Fetcher > Other exception when executing custom JS code {str(e)}")
+        raise PageUnloadable(url=url, status_code=None, message=str(e))
+
+    def set_status_code(self, response, url):
+        try:
+            self.status_code = response.status
+        except Exception as e:
+            # https://github.com/dgtlmoon/changedetection.io/discussions/2122#discussioncomment-8241962
+            logger.critical(f"Response from the browser/Playwright did not have a status_code! Response follows.")
+            logger.critical(response)
+            raise PageUnloadable(url=url, status_code=None, message=str(e))
+
+    def check_content(self, content, url):
+        if len(content.strip()) == 0:
+            logger.debug("Content Fetcher > Content was empty")
+            raise EmptyReply(url=url, status_code=self.status_code)
+
+    def extra_wait_seconds(self):
+        return int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay
+
+    def include_filters_js(self, include_filters):
+        # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
+        if include_filters is not None:
+            return "var include_filters={}".format(json.dumps(include_filters))
+        return "var include_filters=''"
+
+    def xpath_data_js(self):
         from changedetectionio.content_fetchers import visualselector_xpath_selectors
-        self.delete_browser_steps_screenshots()
-        response = None
+        return "async () => {" + self.xpath_element_js.replace('%ELEMENTS%', visualselector_xpath_selectors) + "}"
+
+    def new_context_args(self, request_headers):
+        # SOCKS5 with authentication is not supported (yet)
+        # https://github.com/microsoft/playwright/issues/10567
+
+        # Set user agent to prevent Cloudflare from blocking the browser
+        # Use the default one configured in the App.py model that's passed from fetch_site_status.py
+        return dict(
+            accept_downloads=False,  # Should never be needed
+            bypass_csp=True,  # This is needed to enable JavaScript execution on GitHub and others
+            extra_http_headers=request_headers,
+            ignore_https_errors=True,
+            proxy=self.proxy,
+            service_workers=os.getenv('PLAYWRIGHT_SERVICE_WORKERS', 'allow'), # Should be `allow` or `block` - sites like YouTube can transmit large amounts of data via Service Workers
+            user_agent=manage_user_agent(headers=request_headers),
+        )
+
+    @contextlib.contextmanager
+    def get_browser(self):
+        """
+        Connected browser for this check, the context (cookies, pages etc) is created by the check and closed again,
+        the browser connection and Playwright driver are re-used (see playwright_pool.py) unless PLAYWRIGHT_CONNECTION_POOL=false
+        """
+        from changedetectionio.content_fetchers import playwright_pool
+
+        if playwright_pool.enabled():
+            with playwright_pool.get_pool().browser(browser_type=self.browser_type, url=self.browser_connection_url) as browser:
+                yield browser
+            return
 
+        from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
             browser_type = getattr(p, self.browser_type)
-
             # Seemed to cause a connection Exception even tho I can see it connect
             # self.browser = browser_type.connect(self.command_executor, timeout=timeout*1000)
             # 60,000 connection timeout only
             browser = browser_type.connect_over_cdp(self.browser_connection_url, timeout=60000)
+            try:
+                yield browser
+            finally:
+                browser.close()
 
-            # SOCKS5 with authentication is not supported (yet)
-            # https://github.com/microsoft/playwright/issues/10567
-
-            # Set user agent to prevent Cloudflare from blocking the browser
-            # Use the default one configured in the App.py model that's passed from fetch_site_status.py
-            context = browser.new_context(
-                accept_downloads=False,  # Should never be needed
-                bypass_csp=True,  # This is needed to enable JavaScript execution on GitHub and others
-                extra_http_headers=request_headers,
-                ignore_https_errors=True,
-                proxy=self.proxy,
-                service_workers=os.getenv('PLAYWRIGHT_SERVICE_WORKERS', 'allow'), # Should be `allow` or `block` - sites like YouTube can transmit large amounts of data via Service Workers
-                user_agent=manage_user_agent(headers=request_headers),
-            )
-
-            self.page = context.new_page()
-
-            # Listen for all console events and handle errors
-            self.page.on("console", lambda msg: print(f"Playwright console: Watch URL: {url} {msg.type}: {msg.text} {msg.args}"))
+    def run(self,
+            url,
+            timeout,
+            request_headers,
+            request_body,
+            request_method,
+            ignore_status_codes=False,
+            current_include_filters=None,
+            is_binary=False):
 
-            # Re-use as much code from browser steps as possible so its the same
-            from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
-            browsersteps_interface = steppable_browser_interface()
-            browsersteps_interface.page = self.page
+        self.delete_browser_steps_screenshots()
 
-            response = browsersteps_interface.action_goto_url(value=url)
-            self.headers = response.all_headers()
+        from changedetectionio.content_fetchers import playwright_async
 
-            if response is None:
-                context.close()
-                browser.close()
-                logger.debug("Content Fetcher > Response object was none")
-                raise EmptyReply(url=url, status_code=None)
+        if playwright_async.enabled() and not self.browser_steps_get_valid_steps():
+            # Shared event loop and browser connections, see playwright_async.py
+            playwright_async.get_engine().fetch(self,
+                                                url=url,
+                                                request_headers=request_headers,
+                                                ignore_status_codes=ignore_status_codes,
+                                                current_include_filters=current_include_filters)
+            return
 
+        with self.get_browser() as browser:
+            # Logged in etc by the 'setup' Browser Steps of an earlier check
+            storage_state = self.browser_session_load()
             try:
-                if self.webdriver_js_execute_code is not None and len(self.webdriver_js_execute_code):
-                    browsersteps_interface.action_execute_js(value=self.webdriver_js_execute_code, selector=None)
-            except playwright._impl._errors.TimeoutError as e:
-                context.close()
-                browser.close()
-                # This can be ok, we will try to grab what we could retrieve
-                pass
+                self.run_with_new_context(browser=browser,
+                                          url=url,
+                                          request_headers=request_headers,
+                                          ignore_status_codes=ignore_status_codes,
+                                          current_include_filters=current_include_filters,
+                                          storage_state=storage_state)
+            except BrowserStepsStepException as e:
+                if not storage_state:
+                    raise
+                # Session expired or logged out, all the steps again from the start
+                logger.debug(f"Browser step {e.step_n} failed with the restored session, running all the Browser Steps again")
+                self.browser_session_forget()
+                self.run_with_new_context(browser=browser,
+                                          url=url,
+                                          request_headers=request_headers,
+                                          ignore_status_codes=ignore_status_codes,
+                                          current_include_filters=current_include_filters)
+
+    def run_with_new_context(self, browser, url, request_headers, ignore_status_codes, current_include_filters, storage_state=None):
+        self.skip_setup_steps = bool(storage_state)
+        context = browser.new_context(storage_state=storage_state, **self.new_context_args(request_headers=request_headers))
+
+        counter = resource_blocking.request_counter()
+        if self.block_rules:
+            context.route("**/*", lambda route, request: self.route_request(route, request, counter))
+        context.on("response", self.response_counter(counter))
+
+        # Only the context is closed afterwards, the browser connection may be used by the next check
+        try:
+            self.run_in_context(context=context,
+                                url=url,
+                                ignore_status_codes=ignore_status_codes,
+                                current_include_filters=current_include_filters)
+        finally:
+            context.close()
+            counter.finish(url=url)
+
+    def run_in_context(self, context, url, ignore_status_codes, current_include_filters):
+        self.page = context.new_page()
+
+        # Listen for all console events and handle errors
+        self.page.on("console", self.console_message_handler(url))
+
+        # Re-use as much code from browser steps as possible so its the same
+        from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
+        browsersteps_interface = steppable_browser_interface()
+        browsersteps_interface.page = self.page
+
+        response = browsersteps_interface.action_goto_url(value=url)
+        self.check_response(response, url=url)
+        self.headers = response.all_headers()
+
+        if self.webdriver_js_execute_code is not None and len(self.webdriver_js_execute_code):
+            try:
+                browsersteps_interface.action_execute_js(value=self.webdriver_js_execute_code, selector=None)
             except Exception as e:
-                logger.debug(f"Content Fetcher > Other exception when executing custom JS code {str(e)}")
-                context.close()
-                browser.close()
-                raise PageUnloadable(url=url, status_code=None, message=str(e))
-
-            extra_wait = int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay
+                self.custom_js_failed(e, url=url)
+
+        extra_wait = self.extra_wait_seconds()
+        self.wait_for_content_ready(max_seconds=extra_wait, include_filters=current_include_filters)
+
+        self.set_status_code(response, url=url)
+        if self.status_code != 200 and not ignore_status_codes:
+            # Only what is in view, enough to see the error page
+            raise Non200ErrorCodeReceived(url=url, status_code=self.status_code,
+                                          screenshot=self.page.screenshot(**self.screenshot_options(full_page=False)))
+
+        self.check_content(self.page.content(), url=url)
+
+        # Run Browser Steps here
+        if self.browser_steps_get_valid_steps():
+            self.iterate_browser_steps()
+            if not self.skip_setup_steps:
+                # So the next check can start from here
+                self.browser_session_save(storage_state=context.storage_state())
+            self.wait_for_content_ready(max_seconds=extra_wait, include_filters=current_include_filters)
+        elif self.content_ready_strategy == 'fixed':
+            # Always waited twice
             self.page.wait_for_timeout(extra_wait * 1000)
 
-            try:
-                self.status_code = response.status
-            except Exception as e:
-                # https://github.com/dgtlmoon/changedetection.io/discussions/2122#discussioncomment-8241962
-                logger.critical(f"Response from the browser/Playwright did not have a status_code! Response follows.")
-                logger.critical(response)
-                context.close()
-                browser.close()
-                raise PageUnloadable(url=url, status_code=None, message=str(e))
+        # Only what the processor will use, see fetch_plan
+        if self.fetch_plan.get('xpath_data'):
+            self.page.evaluate(self.include_filters_js(current_include_filters))
+            self.xpath_data = self.page.evaluate(self.xpath_data_js())
+        if self.fetch_plan.get('instock_data'):
+            self.instock_data = self.page.evaluate("async () => {" + self.instock_data_js + "}")
 
+        self.content = self.page.content()
+        if not self.fetch_plan.get('screenshot'):
+            return
+
+        try:
+            # The actual screenshot - this always base64 and needs decoding! horrible! huge CPU usage
+            self.screenshot = self.page.screenshot(**self.screenshot_options())
+        except Exception as e:
+            # It's likely the screenshot was too long/big and something crashed
+            raise ScreenshotUnavailable(url=url, status_code=self.status_code)
+
+    async def async_run(self, browser, url, request_headers, ignore_status_codes, current_include_filters):
+        """
+        run_with_new_context() and run_in_context() with the async API, called on the event loop of
+        playwright_async.py, Browser Steps are not supported here
+        """
+        context = await browser.new_context(**self.new_context_args(request_headers=request_headers))
+
+        counter = resource_blocking.request_counter()
+        if self.block_rules:
+            async def route_request(route, request):
+                await self.async_route_request(route, request, counter)
+            await context.route("**/*", route_request)
+        context.on("response", self.response_counter(counter))
+
+        try:
+            page = await context.new_page()
+            page.on("console", self.console_message_handler(url))
+
+            now = time.time()
+            response = await page.goto(url, timeout=0, wait_until='load')
+            logger.debug(f"Time to goto URL {time.time() - now:.2f}s")
+            self.check_response(response, url=url)
+            self.headers = await response.all_headers()
+
+            if self.webdriver_js_execute_code is not None and len(self.webdriver_js_execute_code):
+                try:
+                    await page.evaluate(self.webdriver_js_execute_code)
+                except Exception as e:
+                    self.custom_js_failed(e, url=url)
+
+            extra_wait = self.extra_wait_seconds()
+            await self.async_wait_for_content_ready(page=page, max_seconds=extra_wait, include_filters=current_include_filters)
+
+            self.set_status_code(response, url=url)
             if self.status_code != 200 and not ignore_status_codes:
-                screenshot = self.page.screenshot(type='jpeg', full_page=True,
-                                                  quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
+                raise Non200ErrorCodeReceived(url=url, status_code=self.status_code,
+                                              screenshot=await page.screenshot(**self.screenshot_options(full_page=False)))
 
-                raise Non200ErrorCodeReceived(url=url, status_code=self.status_code, screenshot=screenshot)
+            self.check_content(await page.content(), url=url)
 
-            if len(self.page.content().strip()) == 0:
-                context.close()
-                browser.close()
-                logger.debug("Content Fetcher > Content was empty")
-                raise EmptyReply(url=url, status_code=response.status)
+            if self.content_ready_strategy == 'fixed':
+                # Always waited twice
+                await page.wait_for_timeout(extra_wait * 1000)
 
-            # Run Browser Steps here
-            if self.browser_steps_get_valid_steps():
-                self.iterate_browser_steps()
+            if self.fetch_plan.get('xpath_data'):
+                await page.evaluate(self.include_filters_js(current_include_filters))
+                self.xpath_data = await page.evaluate(self.xpath_data_js())
+            if self.fetch_plan.get('instock_data'):
+                self.instock_data = await page.evaluate("async () => {" + self.instock_data_js + "}")
 
-            self.page.wait_for_timeout(extra_wait * 1000)
-
-            # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
-            if current_include_filters is not None:
-                self.page.evaluate("var include_filters={}".format(json.dumps(current_include_filters)))
-            else:
-                self.page.evaluate("var include_filters=''")
-
-            self.xpath_data = self.page.evaluate(
-                "async () => {" + self.xpath_element_js.replace('%ELEMENTS%', visualselector_xpath_selectors) + "}")
-            self.instock_data = self.page.evaluate("async () => {" + self.instock_data_js + "}")
+            self.content = await page.content()
+            if not self.fetch_plan.get('screenshot'):
+                return
 
-            self.content = self.page.content()
-            # Bug 3 in Playwright screenshot handling
-            # Some bug where it gives the wrong screenshot size, but making a request with the clip set first seems to solve it
-            # JPEG is better here because the screenshots can be very very large
-
-            # Screenshots also travel via the ws:// (websocket) meaning that the binary data is base64 encoded
-            # which will significantly increase the IO size between the server and client, it's recommended to use the lowest
-            # acceptable screenshot quality here
             try:
-                # The actual screenshot - this always base64 and needs decoding! horrible! huge CPU usage
-                self.screenshot = self.page.screenshot(type='jpeg',
-                                                       full_page=True,
-                                                       quality=int(os.getenv("SCREENSHOT_QUALITY", 72)),
-                                                       )
+                self.screenshot = await page.screenshot(**self.screenshot_options())
             except Exception as e:
-                # It's likely the screenshot was too long/big and something crashed
                 raise ScreenshotUnavailable(url=url, status_code=self.status_code)
-            finally:
-                context.close()
-                browser.close()
+        finally:
+            await context.close()
+            counter.finish(url=url)
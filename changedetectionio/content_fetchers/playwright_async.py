@@ -0,0 +1,141 @@
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# Optional, one event loop thread and one Playwright driver shared by all Playwright fetches, instead of a driver per
+# update_worker thread (playwright_pool.py). Each check gets a new context (and page) on one of a few browser
+# connections per browser URL, many pages are open at once on the same connection, so how many checks run in the
+# browser at once is limited by PLAYWRIGHT_ASYNC_PAGES_PER_CONNECTION and the browser, not by the worker threads.
+# Watches with Browser Steps still use the sync API (the steps are written for it).
+
+engine = None
+engine_lock = threading.Lock()
+
+
+def enabled():
+    return strtobool(os.getenv('PLAYWRIGHT_ASYNC_ENGINE', 'false'))
+
+
+class browser_connection():
+
+    def __init__(self, browser, max_pages):
+        self.browser = browser
+        # Checks using it (or waiting for it), and how many it has done
+        self.active = 0
+        self.uses = 0
+        # No new checks, closed when the last one finishes
+        self.retiring = False
+        self.semaphore = asyncio.Semaphore(max_pages)
+
+    async def close(self):
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.debug(f"Async Playwright - closing a browser connection {str(e)}")
+
+
+class async_playwright_engine():
+
+    def __init__(self):
+        self.max_connections = int(os.getenv('PLAYWRIGHT_ASYNC_CONNECTIONS_PER_URL', 2))
+        self.max_pages = int(os.getenv('PLAYWRIGHT_ASYNC_PAGES_PER_CONNECTION', 10))
+        self.max_uses = int(os.getenv('PLAYWRIGHT_CONNECTION_MAX_USES', 100))
+        self.fetch_timeout = int(os.getenv('PLAYWRIGHT_ASYNC_FETCH_TIMEOUT_SECONDS', 300))
+        # (browser type, browser url) -> [browser_connection]
+        self.connections = {}
+        self.stats = {'checks': 0, 'connections_made': 0, 'connections_recycled': 0, 'timeouts': 0}
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name='async-playwright-fetcher').start()
+        self.playwright = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        atexit.register(self.close)
+
+    async def _start(self):
+        from playwright.async_api import async_playwright
+        self.connect_lock = asyncio.Lock()
+        return await async_playwright().start()
+
+    def close(self):
+        async def _close():
+            for connection in [c for connections in self.connections.values() for c in connections]:
+                await connection.close()
+            await self.playwright.stop()
+        try:
+            asyncio.run_coroutine_threadsafe(_close(), self.loop).result(timeout=10)
+        except Exception as e:
+            logger.debug(f"Async Playwright - shutting down {str(e)}")
+
+    async def _get_connection(self, browser_type, url):
+        """
+        The least busy connection to the browser, a new one while there are fewer than max_connections and the others are full
+        :return: browser_connection, with the check already counted in 'active'
+        """
+        async with self.connect_lock:
+            connections = self.connections.setdefault((browser_type, url), [])
+            for c in list(connections):
+                # Browser crashed/restarted, or done enough checks (memory leaks in long running browsers)
+                if not c.retiring and (not c.browser.is_connected() or c.uses >= self.max_uses):
+                    c.retiring = True
+                    self.stats['connections_recycled'] += 1
+                if c.retiring:
+                    connections.remove(c)
+                    if not c.active:
+                        await c.close()
+
+            connection = min(connections, key=lambda c: c.active, default=None)
+            if not connection or (connection.active >= self.max_pages and len(connections) < self.max_connections):
+                browser = await getattr(self.playwright, browser_type).connect_over_cdp(url, timeout=60000)
+                connection = browser_connection(browser=browser, max_pages=self.max_pages)
+                connections.append(connection)
+                self.stats['connections_made'] += 1
+
+            connection.active += 1
+            connection.uses += 1
+            return connection
+
+    async def _fetch(self, fetcher, **kwargs):
+        connection = await self._get_connection(browser_type=fetcher.browser_type, url=fetcher.browser_connection_url)
+        try:
+            async with connection.semaphore:
+                self.stats['checks'] += 1
+                await fetcher.async_run(browser=connection.browser, **kwargs)
+        finally:
+            connection.active -= 1
+            if connection.retiring and not connection.active:
+                await connection.close()
+
+    def fetch(self, fetcher, **kwargs):
+        """
+        Called from the update_worker threads, waits for fetcher.async_run() to finish on the shared event loop
+        """
+        from changedetectionio.content_fetchers.exceptions import BrowserFetchTimedOut
+
+        future = asyncio.run_coroutine_threadsafe(self._fetch(fetcher, **kwargs), self.loop)
+        try:
+            return future.result(timeout=self.fetch_timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancelling closes the context (and the page) of this check
+            future.cancel()
+            self.stats['timeouts'] += 1
+            raise BrowserFetchTimedOut(msg=f"Browser did not finish the page within {self.fetch_timeout} seconds")
+
+    def get_stats(self):
+        connections = [c for connections in self.connections.values() for c in connections]
+        return {**self.stats,
+                'connections': len(connections),
+                'pages_open': sum(c.active for c in connections)}
+
+
+def get_engine():
+    global engine
+    with engine_lock:
+        if engine is None:
+            logger.info("Starting the async Playwright fetch engine")
+            engine = async_playwright_engine()
+        return engine
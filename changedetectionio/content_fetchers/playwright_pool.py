@@ -0,0 +1,176 @@
+import contextlib
+import os
+import threading
+import time
+
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# Long-lived Playwright drivers (the Node.js process that sync_playwright() starts) and CDP browser connections, so that
+# a check only needs a new browser context instead of starting the driver and connecting to the browser every time.
+#
+# Playwright's sync API objects can only be used from the thread that created them, so each update_worker thread keeps
+# its own driver and one connection per browser URL, here is what is shared between them, the limit of how many
+# checks use the same browser URL at once, the stats and the list of drivers to close at shutdown.
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def enabled():
+    return strtobool(os.getenv('PLAYWRIGHT_CONNECTION_POOL', 'true'))
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = playwright_pool(max_uses=int(os.getenv('PLAYWRIGHT_CONNECTION_MAX_USES', 100)),
+                                   max_idle_seconds=int(os.getenv('PLAYWRIGHT_CONNECTION_IDLE_SECONDS', 300)),
+                                   max_per_url=int(os.getenv('PLAYWRIGHT_MAX_CONCURRENT_PER_URL', 10)))
+        return pool
+
+
+def close_thread():
+    """
+    Called by a worker thread that is exiting, its driver and connections go with it
+    """
+    if pool is not None:
+        pool.close_thread()
+
+
+class pooled_connection():
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.created = time.time()
+        self.last_used = time.time()
+        self.uses = 0
+
+    def close(self):
+        try:
+            self.browser.close()
+        except Exception as e:
+            logger.debug(f"Playwright pool - closing a browser connection {str(e)}")
+
+
+class playwright_pool():
+
+    def __init__(self, max_uses, max_idle_seconds, max_per_url):
+        """
+        :param max_uses: Checks per browser connection before it is closed and a new one made (memory leaks in long running browsers)
+        :param max_idle_seconds: Unused connections older than this are not trusted to still work (proxies, load balancers)
+        :param max_per_url: How many checks can use the same browser URL at the same time (all threads together)
+        """
+        self.max_uses = max_uses
+        self.max_idle_seconds = max_idle_seconds
+        self.max_per_url = max_per_url
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.url_semaphores = {}
+        # Per thread, {'playwright': .., 'connections': {browser url: pooled_connection}}
+        self.thread_states = {}
+        self.stats = {'checks': 0, 'drivers_started': 0, 'connections_made': 0, 'connections_reused': 0, 'connections_recycled': 0, 'connection_failures': 0}
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _thread_state(self):
+        state = getattr(self.local, 'state', None)
+        if state is None:
+            state = {'playwright': None, 'connections': {}}
+            self.local.state = state
+            with self.lock:
+                self.thread_states[threading.get_ident()] = state
+        if state['playwright'] is None:
+            from playwright.sync_api import sync_playwright
+            state['playwright'] = sync_playwright().start()
+            self._count('drivers_started')
+        return state
+
+    def _stop_driver(self, state):
+        for connection in state['connections'].values():
+            connection.close()
+        state['connections'] = {}
+        if state['playwright'] is not None:
+            try:
+                state['playwright'].stop()
+            except Exception as e:
+                logger.debug(f"Playwright pool - stopping the driver {str(e)}")
+            state['playwright'] = None
+
+    def _connect(self, state, browser_type, url):
+        browser = getattr(state['playwright'], browser_type).connect_over_cdp(url, timeout=60000)
+        self._count('connections_made')
+        return pooled_connection(browser)
+
+    def _get_connection(self, browser_type, url):
+        state = self._thread_state()
+        connection = state['connections'].get(url)
+
+        if connection:
+            # Health check, also recycle it after so many checks or when it was unused for a long time
+            healthy = connection.browser.is_connected()
+            if not healthy or connection.uses >= self.max_uses or time.time() - connection.last_used > self.max_idle_seconds:
+                logger.debug(f"Playwright pool - new connection to {url}, {'disconnected' if not healthy else 'recycled'} after {connection.uses} checks")
+                self._count('connections_recycled')
+                connection.close()
+                connection = None
+            else:
+                self._count('connections_reused')
+
+        if not connection:
+            try:
+                connection = self._connect(state, browser_type, url)
+            except Exception as e:
+                # The driver process itself may have died, start over once
+                logger.warning(f"Playwright pool - connecting to {url} failed, restarting the driver - {str(e)}")
+                self._count('connection_failures')
+                self._stop_driver(state)
+                state = self._thread_state()
+                connection = self._connect(state, browser_type, url)
+            state['connections'][url] = connection
+
+        return connection
+
+    @contextlib.contextmanager
+    def browser(self, browser_type, url):
+        """
+        A connected Browser for one check, create a new context in it and close the context when done (not the browser)
+        """
+        from changedetectionio.content_fetchers.exceptions import BrowserConnectError
+
+        with self.lock:
+            semaphore = self.url_semaphores.setdefault(url, threading.BoundedSemaphore(self.max_per_url))
+        if not semaphore.acquire(timeout=60):
+            raise BrowserConnectError(msg=f"Waited too long for a free browser connection, already {self.max_per_url} checks using the browser")
+
+        try:
+            connection = self._get_connection(browser_type, url)
+            connection.uses += 1
+            self._count('checks')
+            try:
+                yield connection.browser
+            finally:
+                connection.last_used = time.time()
+                if not connection.browser.is_connected():
+                    # Browser crashed or was restarted, don't give it to the next check
+                    self.local.state['connections'].pop(url, None)
+                    self._count('connection_failures')
+        finally:
+            semaphore.release()
+
+    def close_thread(self):
+        state = getattr(self.local, 'state', None)
+        if state:
+            self._stop_driver(state)
+            with self.lock:
+                self.thread_states.pop(threading.get_ident(), None)
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats,
+                    'drivers': len([s for s in self.thread_states.values() if s['playwright']]),
+                    'connections': sum(len(s['connections']) for s in self.thread_states.values())}
@@ -1,11 +1,13 @@
 import asyncio
 import json
 import os
+import time
 import websockets.exceptions
 from urllib.parse import urlparse
 
 from loguru import logger
 
+from changedetectionio.content_fetchers import BrowserStepsStepException, resource_blocking
 from changedetectionio.content_fetchers.base import Fetcher, manage_user_agent
 from changedetectionio.content_fetchers.exceptions import PageUnloadable, Non200ErrorCodeReceived, EmptyReply, BrowserFetchTimedOut, BrowserConnectError
 
@@ -52,21 +54,81 @@ class fetcher(Fetcher):
                 proxy_url += f"{parsed.hostname}{port}{parsed.path}{q}"
                 self.browser_connection_url += f"{r}--proxy-server={proxy_url}"
 
-    # def screenshot_step(self, step_n=''):
-    #     screenshot = self.page.screenshot(type='jpeg', full_page=True, quality=85)
-    #
-    #     if self.browser_steps_screenshot_path is not None:
-    #         destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.jpeg'.format(step_n))
-    #         logger.debug(f"Saving step screenshot to {destination}")
-    #         with open(destination, 'wb') as f:
-    #             f.write(screenshot)
-    #
-    # def save_step_html(self, step_n):
-    #     content = self.page.content()
-    #     destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.html'.format(step_n))
-    #     logger.debug(f"Saving step HTML to {destination}")
-    #     with open(destination, 'w') as f:
-    #         f.write(content)
+    async def screenshot_step(self, step_n=''):
+        # What is in view is enough to see what the step did
+        screenshot = await self.page.screenshot(type_='jpeg', fullPage=False, quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
+
+        if self.browser_steps_screenshot_path is not None:
+            destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.jpeg'.format(step_n))
+            logger.debug(f"Saving step screenshot to {destination}")
+            with open(destination, 'wb') as f:
+                f.write(screenshot)
+
+    async def save_step_html(self, step_n):
+        content = await self.page.content
+        destination = os.path.join(self.browser_steps_screenshot_path, 'step_{}.html'.format(step_n))
+        logger.debug(f"Saving step HTML to {destination}")
+        with open(destination, 'w') as f:
+            f.write(content)
+
+    async def iterate_browser_steps(self):
+        """
+        Same as Fetcher.iterate_browser_steps() with the Puppeteer actions
+        """
+        import pyppeteer.errors
+        from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface_puppeteer
+
+        interface = steppable_browser_interface_puppeteer()
+        interface.page = self.page
+        capture_all_steps = self.capture_all_browser_steps
+
+        for step_n, operation, selector, optional_value in self.browser_steps_to_run():
+            logger.debug(f">> Iterating check - browser Step n {step_n} - {operation}...")
+            if capture_all_steps:
+                await self.screenshot_step("before-" + str(step_n))
+                await self.save_step_html("before-" + str(step_n))
+            try:
+                await interface.call_action(action_name=operation,
+                                            selector=selector,
+                                            optional_value=optional_value)
+                if capture_all_steps:
+                    await self.screenshot_step(step_n)
+                    await self.save_step_html(step_n)
+            except (pyppeteer.errors.PyppeteerError, pyppeteer.errors.TimeoutError) as e:
+                logger.debug(str(e))
+                # What the page looked like when it failed, for the Browser Steps UI
+                if not capture_all_steps:
+                    try:
+                        await self.screenshot_step("before-" + str(step_n))
+                        await self.save_step_html("before-" + str(step_n))
+                    except Exception as screenshot_e:
+                        logger.debug(f"Could not capture the failed browser step {step_n} - {str(screenshot_e)}")
+                # Stop processing here
+                raise BrowserStepsStepException(step_n=step_n, original_e=e)
+
+    async def wait_for_content_ready(self, max_seconds, include_filters):
+        """
+        Wait for the page to be ready (per the watch's content_ready_strategy), at most max_seconds
+        """
+        if self.content_ready_strategy == 'fixed':
+            await asyncio.sleep(max_seconds)
+            return
+
+        started = time.time()
+        try:
+            await self.page.waitForFunction(self.content_ready_js, self.content_ready_options(include_filters), polling=100, timeout=max_seconds * 1000)
+        except Exception as e:
+            # Timeout (or navigated away by itself etc), carry on with what is there
+            logger.debug(f"Content Fetcher > Page not '{self.content_ready_strategy}' after {time.time() - started:.2f}s, continuing anyway - {str(e)}")
+        else:
+            logger.debug(f"Content Fetcher > Page ready ({self.content_ready_strategy}) after {time.time() - started:.2f}s")
+
+    async def intercept_request(self, request, counter):
+        if resource_blocking.should_block(rules=self.block_rules, url=request.url, resource_type=request.resourceType):
+            counter.count_blocked(request.resourceType)
+            await request.abort('blockedbyclient')
+        else:
+            await request.continue_()
 
     async def fetch_page(self,
                          url,
@@ -76,7 +138,8 @@ class fetcher(Fetcher):
                          request_method,
                          ignore_status_codes,
                          current_include_filters,
-                         is_binary
+                         is_binary,
+                         storage_state=None
                          ):
 
         from changedetectionio.content_fetchers import visualselector_xpath_selectors
@@ -118,12 +181,18 @@ class fetcher(Fetcher):
             # https://cri.dev/posts/2020-03-30-How-to-solve-Puppeteer-Chrome-Error-ERR_INVALID_ARGUMENT/
             await self.page.authenticate(self.proxy)
 
-        # Re-use as much code from browser steps as possible so its the same
-        # from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
+        # Logged in etc by the 'setup' Browser Steps of an earlier check, only the cookies are kept for Puppeteer
+        self.skip_setup_steps = bool(storage_state)
+        if storage_state and storage_state.get('cookies'):
+            cookie_keys = ['name', 'value', 'domain', 'path', 'expires', 'httpOnly', 'secure', 'sameSite']
+            await self.page.setCookie(*[{k: v for k, v in c.items() if k in cookie_keys and not (k == 'expires' and v < 0)}
+                                        for c in storage_state['cookies']])
 
-        # not yet used here, we fallback to playwright when browsersteps is required
-        #            browsersteps_interface = steppable_browser_interface()
-        #            browsersteps_interface.page = self.page
+        counter = resource_blocking.request_counter()
+        if self.block_rules:
+            await self.page.setRequestInterception(True)
+            self.page.on('request', lambda request: asyncio.ensure_future(self.intercept_request(request, counter)))
+        self.page.on('response', lambda response: counter.count_allowed(response.headers.get('content-length')))
 
         response = await self.page.goto(url, waitUntil="load")
 
@@ -158,8 +227,9 @@ class fetcher(Fetcher):
             raise PageUnloadable(url=url, status_code=None, message=str(e))
 
         if self.status_code != 200 and not ignore_status_codes:
+            # Only what is in view, enough to see the error page
             screenshot = await self.page.screenshot(type_='jpeg',
-                                                    fullPage=True,
+                                                    fullPage=False,
                                                     quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
 
             raise Non200ErrorCodeReceived(url=url, status_code=self.status_code, screenshot=screenshot)
@@ -171,23 +241,33 @@ class fetcher(Fetcher):
             raise EmptyReply(url=url, status_code=response.status)
 
         # Run Browser Steps here
-        # @todo not yet supported, we switch to playwright in this case
-        #            if self.browser_steps_get_valid_steps():
-        #                self.iterate_browser_steps()
-
-        await asyncio.sleep(1 + extra_wait)
-
-        # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
-        # Setup the xPath/VisualSelector scraper
-        if current_include_filters is not None:
-            js = json.dumps(current_include_filters)
-            await self.page.evaluate(f"var include_filters={js}")
-        else:
-            await self.page.evaluate(f"var include_filters=''")
-
-        self.xpath_data = await self.page.evaluate(
-            "async () => {" + self.xpath_element_js.replace('%ELEMENTS%', visualselector_xpath_selectors) + "}")
-        self.instock_data = await self.page.evaluate("async () => {" + self.instock_data_js + "}")
+        if self.browser_steps_get_valid_steps():
+            try:
+                await self.iterate_browser_steps()
+            except BrowserStepsStepException:
+                await self.page.close()
+                await browser.close()
+                raise
+            if not self.skip_setup_steps:
+                # So the next check can start from here
+                self.browser_session_save(storage_state={'cookies': await self.page.cookies(), 'origins': []})
+
+        await self.wait_for_content_ready(max_seconds=1 + extra_wait, include_filters=current_include_filters)
+
+        # Only what the processor will use, see fetch_plan
+        if self.fetch_plan.get('xpath_data'):
+            # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
+            # Setup the xPath/VisualSelector scraper
+            if current_include_filters is not None:
+                js = json.dumps(current_include_filters)
+                await self.page.evaluate(f"var include_filters={js}")
+            else:
+                await self.page.evaluate(f"var include_filters=''")
+
+            self.xpath_data = await self.page.evaluate(
+                "async () => {" + self.xpath_element_js.replace('%ELEMENTS%', visualselector_xpath_selectors) + "}")
+        if self.fetch_plan.get('instock_data'):
+            self.instock_data = await self.page.evaluate("async () => {" + self.instock_data_js + "}")
 
         self.content = await self.page.content
         # Bug 3 in Playwright screenshot handling
@@ -198,9 +278,10 @@ class fetcher(Fetcher):
         # which will significantly increase the IO size between the server and client, it's recommended to use the lowest
         # acceptable screenshot quality here
         try:
-            self.screenshot = await self.page.screenshot(type_='jpeg',
-                                                         fullPage=True,
-                                                         quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
+            if self.fetch_plan.get('screenshot'):
+                self.screenshot = await self.page.screenshot(type_='jpeg',
+                                                             fullPage=True,
+                                                             quality=int(os.getenv("SCREENSHOT_QUALITY", 72)))
         except Exception as e:
             logger.error("Error fetching screenshot")
             # // May fail on very large pages with 'WARNING: tile memory limits exceeded, some content may not draw'
@@ -219,10 +300,20 @@ class fetcher(Fetcher):
             await self.page.close()
             logger.success(f"Fetching '{url}' complete, closing browser")
             await browser.close()
+        counter.finish(url=url)
         logger.success(f"Fetching '{url}' complete, exiting puppeteer fetch.")
 
     async def main(self, **kwargs):
-        await self.fetch_page(**kwargs)
+        storage_state = self.browser_session_load()
+        try:
+            await self.fetch_page(storage_state=storage_state, **kwargs)
+        except BrowserStepsStepException as e:
+            if not storage_state:
+                raise
+            # Session expired or logged out, all the steps again from the start
+            logger.debug(f"Browser step {e.step_n} failed with the restored session, running all the Browser Steps again")
+            self.browser_session_forget()
+            await self.fetch_page(**kwargs)
 
     def run(self, url, timeout, request_headers, request_body, request_method, ignore_status_codes=False,
             current_include_filters=None, is_binary=False):
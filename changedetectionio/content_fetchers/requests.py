@@ -1,16 +1,19 @@
 import hashlib
 import os
+from urllib.parse import urlparse
 
 import chardet
 import requests
 
-from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived, NotModified
 from changedetectionio.content_fetchers.base import Fetcher
+from changedetectionio.content_fetchers import async_http, session_pool
 
 
 # "html_requests" is listed as the default fetcher in store.py!
 class fetcher(Fetcher):
     fetcher_description = "Basic fast Plaintext/HTTP Client"
+    supports_conditional_requests = True
 
     def __init__(self, proxy_override=None, custom_browser_connection_url=None):
         super().__init__()
@@ -50,13 +53,25 @@ class fetcher(Fetcher):
             if self.system_https_proxy:
                 proxies['https'] = self.system_https_proxy
 
-        r = requests.request(method=request_method,
-                             data=request_body,
-                             url=url,
-                             headers=request_headers,
-                             timeout=timeout,
-                             proxies=proxies,
-                             verify=False)
+        # Shared event loop and connection pool when enabled, otherwise (or for socks:// proxies) one blocking request
+        proxy_url = proxies.get(urlparse(url).scheme)
+        if async_http.enabled() and async_http.supports_proxy(proxy_url):
+            r = async_http.get_engine().request(method=request_method or 'GET',
+                                                data=request_body,
+                                                url=url,
+                                                headers=request_headers,
+                                                timeout=timeout,
+                                                proxy=proxy_url)
+        else:
+            # Kept-alive connections from the process-wide session pool, or a new connection every time
+            session = session_pool.get_pool().get(proxies=proxies, verify=False) if session_pool.enabled() else requests
+            r = session.request(method=request_method,
+                                data=request_body,
+                                url=url,
+                                headers=request_headers,
+                                timeout=timeout,
+                                proxies=proxies,
+                                verify=False)
 
         # If the response did not tell us what encoding format to expect, Then use chardet to override what `requests` thinks.
         # For example - some sites don't tell us it's utf-8, but return utf-8 content
@@ -71,6 +86,11 @@ class fetcher(Fetcher):
 
         self.headers = r.headers
 
+        # Only possible when If-None-Match/If-Modified-Since was sent, the content is the same as last time
+        if r.status_code == 304:
+            self.status_code = r.status_code
+            raise NotModified(url=url, status_code=r.status_code)
+
         if not r.content or not len(r.content):
             raise EmptyReply(url=url, status_code=r.status_code)
 
@@ -0,0 +1,43 @@
+// Is the page ready for the content to be extracted? the browser fetchers call this again and again (with the same
+// options) until it returns true or the delay, which is then the most it will wait, is over.
+//
+// options.strategy
+//   network_idle - The page finished loading and no new resources (XHR, images, scripts..) for options.quiet_ms
+//   dom_quiet    - Nothing in the page changed for options.quiet_ms
+//   filters      - Every one of options.filters (CSS or xPath) is found in the page, dom_quiet when there are none
+(options) => {
+    const now = Date.now();
+    let state = window.__changedetection_content_ready;
+    if (!state) {
+        state = window.__changedetection_content_ready = {last_mutation: now, last_resource: now, resources: 0};
+        new MutationObserver(() => {
+            state.last_mutation = Date.now();
+        }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    }
+
+    if (options.strategy === 'network_idle') {
+        const resources = performance.getEntriesByType('resource').length;
+        if (resources !== state.resources) {
+            state.resources = resources;
+            state.last_resource = now;
+        }
+        return document.readyState === 'complete' && now - state.last_resource >= options.quiet_ms;
+    }
+
+    if (options.strategy === 'filters' && options.filters.length) {
+        return options.filters.every((filter) => {
+            try {
+                if (filter.startsWith('/') || filter.startsWith('xpath:') || filter.startsWith('xpath1:')) {
+                    const xpath = filter.replace(/^xpath1?:/, '');
+                    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;
+                }
+                return document.querySelector(filter) !== null;
+            } catch (e) {
+                // Not something the browser understands (xPath 2.0 functions etc), don't wait for it
+                return true;
+            }
+        });
+    }
+
+    return now - state.last_mutation >= options.quiet_ms;
+}
@@ -0,0 +1,101 @@
+import fnmatch
+import threading
+from urllib.parse import urlparse
+
+from loguru import logger
+
+# Browser fetches (Playwright, Puppeteer) can skip downloading what change detection doesn't need (video, trackers..),
+# by the resource type the browser gives the request and by domain or URL pattern. Nothing is blocked by default, with
+# any rule every request of the page goes through the fetcher and the browser cache is not used, so it only pays off
+# for pages that download a lot of what is blocked.
+
+resource_type_choices = [
+    ('image', 'Images'),
+    ('media', 'Video and audio'),
+    ('font', 'Fonts'),
+    ('stylesheet', 'Stylesheets (CSS)'),
+    ('script', 'Scripts (JavaScript)'),
+    ('texttrack', 'Subtitles'),
+    ('manifest', 'Manifests'),
+    ('other', 'Other'),
+]
+
+stats_lock = threading.Lock()
+# The bytes of blocked requests are never known, 'allowed_bytes' is what was downloaded by the requests that were not blocked
+stats = {'blocked_requests': 0, 'blocked_by_type': {}, 'allowed_requests': 0, 'allowed_bytes': 0}
+
+
+def get_rules(application_settings, watch):
+    """
+    The global rules plus the ones of the watch (or only those when block_resources_override is set)
+    :return: dict of resource_types and url_patterns, None when there is nothing to block
+    """
+    resource_types = set(watch.get('block_resource_types') or [])
+    url_patterns = [p.strip().lower() for p in watch.get('block_url_patterns') or [] if p.strip()]
+    if not watch.get('block_resources_override'):
+        resource_types.update(application_settings.get('block_resource_types') or [])
+        url_patterns += [p.strip().lower() for p in application_settings.get('block_url_patterns') or [] if p.strip()]
+
+    if not resource_types and not url_patterns:
+        return None
+    return {'resource_types': sorted(resource_types), 'url_patterns': sorted(set(url_patterns))}
+
+
+def should_block(rules, url, resource_type):
+    """
+    :param rules: From get_rules(), url_patterns like 'example.com' block the domain and its sub-domains, with a '/' or '*' it's matched against the whole URL
+    """
+    if not rules or resource_type == 'document':
+        # Never the page itself (or its frames)
+        return False
+
+    if resource_type in rules['resource_types']:
+        return True
+
+    url = url.lower()
+    host = urlparse(url).hostname or ''
+    for pattern in rules['url_patterns']:
+        if '/' in pattern or '*' in pattern:
+            if fnmatch.fnmatch(url, pattern if '*' in pattern else f"*{pattern}*"):
+                return True
+        elif host == pattern or host.endswith('.' + pattern):
+            return True
+
+    return False
+
+
+class request_counter():
+    """
+    What was blocked and what was downloaded during one fetch, the bytes of a blocked request are never known because
+    it's never requested, the downloaded bytes are from the Content-Length of the replies
+    """
+
+    def __init__(self):
+        self.blocked = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def count_blocked(self, resource_type):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    def count_allowed(self, content_length):
+        self.allowed_requests += 1
+        try:
+            self.allowed_bytes += int(content_length or 0)
+        except ValueError:
+            pass
+
+    def finish(self, url):
+        if self.blocked:
+            logger.debug(f"Blocked {sum(self.blocked.values())} requests {self.blocked} while fetching {url}, downloaded {self.allowed_bytes} bytes in {self.allowed_requests} requests")
+        with stats_lock:
+            stats['blocked_requests'] += sum(self.blocked.values())
+            for resource_type, n in self.blocked.items():
+                stats['blocked_by_type'][resource_type] = stats['blocked_by_type'].get(resource_type, 0) + n
+            stats['allowed_requests'] += self.allowed_requests
+            stats['allowed_bytes'] += self.allowed_bytes
+
+
+def get_stats():
+    with stats_lock:
+        return {**stats, 'blocked_by_type': dict(stats['blocked_by_type'])}
@@ -0,0 +1,179 @@
+import atexit
+import contextlib
+import os
+import threading
+import time
+
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# Long-lived remote WebDriver sessions, on a Selenium grid creating the session (starting a browser on a node) takes
+# most of the time of a check. A session is given to one check at a time, reset afterwards (cookies, storage, other
+# windows, about:blank) and goes back to the pool. Unlike Playwright's sync API a WebDriver session is only HTTP
+# requests, so the sessions are shared by all the update_worker threads.
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def enabled():
+    return strtobool(os.getenv('WEBDRIVER_SESSION_POOL', 'true'))
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = selenium_pool(max_uses=int(os.getenv('WEBDRIVER_SESSION_MAX_USES', 50)),
+                                 max_idle_seconds=int(os.getenv('WEBDRIVER_SESSION_IDLE_SECONDS', 240)),
+                                 max_idle_sessions=int(os.getenv('WEBDRIVER_SESSION_POOL_SIZE', 5)))
+            # Don't leave them holding slots on the grid until it times them out
+            atexit.register(pool.close_all)
+        return pool
+
+
+def reset_session(driver):
+    """
+    Make the session look new for the next check
+    :return: True when the session still works
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    try:
+        # Other windows/tabs the page opened
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        # All the cookies with Chrome (CDP), else only the ones of the current page's domain
+        try:
+            driver.execute('executeCdpCommand', {'cmd': 'Network.clearBrowserCookies', 'params': {}})
+        except WebDriverException:
+            driver.delete_all_cookies()
+        try:
+            driver.execute_script("window.localStorage && localStorage.clear(); window.sessionStorage && sessionStorage.clear();")
+        except WebDriverException:
+            # No storage on some pages (about:blank, data: etc)
+            pass
+
+        driver.get('about:blank')
+    except WebDriverException as e:
+        logger.debug(f"Selenium pool - could not reset the session {str(e)}")
+        return False
+
+    return True
+
+
+class pooled_session():
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created = time.time()
+        self.last_used = time.time()
+        self.uses = 0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Selenium pool - closing a session {str(e)}")
+
+
+class selenium_pool():
+
+    def __init__(self, max_uses, max_idle_seconds, max_idle_sessions):
+        """
+        :param max_uses: Checks per session before it is closed and a new one made (memory leaks in long running browsers)
+        :param max_idle_seconds: Unused sessions older than this are closed, should be less than the grid's session timeout
+        :param max_idle_sessions: How many unused sessions to keep per grid URL and proxy, each one holds a slot on the grid
+        """
+        self.max_uses = max_uses
+        self.max_idle_seconds = max_idle_seconds
+        self.max_idle_sessions = max_idle_sessions
+        self.lock = threading.Lock()
+        # (grid url, proxy) -> [pooled_session]
+        self.idle = {}
+        self.stats = {'checks': 0, 'sessions_created': 0, 'sessions_reused': 0, 'sessions_recycled': 0, 'session_failures': 0}
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def _checkout(self, key):
+        """
+        :return: An unused session that still works, or None
+        """
+        while True:
+            with self.lock:
+                sessions = self.idle.get(key, [])
+                # Most recently used first
+                session = sessions.pop() if sessions else None
+            if not session:
+                return None
+
+            if time.time() - session.last_used > self.max_idle_seconds:
+                session.quit()
+                continue
+
+            # Health check, the grid may have timed out or lost the session
+            try:
+                session.driver.current_url
+            except Exception as e:
+                logger.debug(f"Selenium pool - session not usable anymore {str(e)}")
+                self._count('session_failures')
+                session.quit()
+                continue
+
+            return session
+
+    def _checkin(self, key, session):
+        with self.lock:
+            sessions = self.idle.setdefault(key, [])
+            if len(sessions) < self.max_idle_sessions:
+                sessions.append(session)
+                return
+        session.quit()
+
+    @contextlib.contextmanager
+    def session(self, url, proxy, create_driver):
+        """
+        :param url: WebDriver/grid URL
+        :param proxy: The proxy settings, a session is only re-used with the same ones
+        :param create_driver: Makes a new remote WebDriver session when there is none to re-use
+        """
+        key = (url, repr(proxy.to_capabilities() if proxy else None))
+        session = self._checkout(key)
+        if session:
+            self._count('sessions_reused')
+        else:
+            session = pooled_session(create_driver())
+            self._count('sessions_created')
+
+        self._count('checks')
+        try:
+            yield session.driver
+        finally:
+            session.uses += 1
+            session.last_used = time.time()
+            if session.uses >= self.max_uses:
+                self._count('sessions_recycled')
+                session.quit()
+            elif reset_session(session.driver):
+                self._checkin(key, session)
+            else:
+                self._count('session_failures')
+                session.quit()
+
+    def close_all(self):
+        with self.lock:
+            sessions = [s for sessions in self.idle.values() for s in sessions]
+            self.idle = {}
+        for session in sessions:
+            session.quit()
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, 'idle_sessions': sum(len(s) for s in self.idle.values())}
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from loguru import logger
+
+from changedetectionio.strtobool import strtobool
+
+# Process-wide pool of requests.Session's for the 'html_requests' fetcher, keyed by (proxy, verify), so that watches
+# on the same host (or through the same proxy tunnel) can re-use a kept-alive connection instead of a new TCP/TLS handshake
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def enabled():
+    return strtobool(os.getenv('REQUESTS_SESSION_POOL', 'true'))
+
+
+class counting_adapter(requests.adapters.HTTPAdapter):
+    """
+    HTTPAdapter that tells the pool if the connection used was a new one or was re-used
+    """
+
+    def __init__(self, session_pool, **kwargs):
+        self.session_pool = session_pool
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        r = super().send(request, **kwargs)
+        # The body is not read yet so the urllib3 connection is still attached to the response
+        self.session_pool.count_connection(getattr(r.raw, '_connection', None))
+        return r
+
+
+class session_pool():
+
+    def __init__(self, max_sessions, max_hosts, per_host, idle_seconds):
+        self.max_sessions = max_sessions
+        self.max_hosts = max_hosts
+        self.per_host = per_host
+        self.idle_seconds = idle_seconds
+        self.lock = threading.Lock()
+        # (proxies, verify) -> [session, last used]
+        self.sessions = OrderedDict()
+        self.stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0, 'sessions_created': 0, 'sessions_evicted': 0}
+
+    def _new_session(self, verify):
+        session = requests.Session()
+        session.verify = verify
+        # Never share cookies between watches (same as a new requests.request() every time)
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = counting_adapter(session_pool=self, pool_connections=self.max_hosts, pool_maxsize=self.per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _evict(self, key):
+        (session, last_used) = self.sessions.pop(key)
+        session.close()
+        self.stats['sessions_evicted'] += 1
+        logger.debug(f"Closed requests session {key}, idle for {time.time() - last_used:.0f}s")
+
+    def get(self, proxies, verify=False):
+        key = (tuple(sorted((proxies or {}).items())), verify)
+        with self.lock:
+            for k in [k for k, v in self.sessions.items() if time.time() - v[1] > self.idle_seconds]:
+                self._evict(k)
+
+            if key in self.sessions:
+                self.sessions.move_to_end(key)
+            else:
+                self.sessions[key] = [self._new_session(verify=verify), None]
+                self.stats['sessions_created'] += 1
+                # Bounded, the least recently used goes first
+                while len(self.sessions) > self.max_sessions:
+                    self._evict(next(iter(self.sessions)))
+
+            self.sessions[key][1] = time.time()
+            return self.sessions[key][0]
+
+    def count_connection(self, connection):
+        with self.lock:
+            self.stats['requests'] += 1
+            if connection is None:
+                return
+            if getattr(connection, 'used_by_session_pool', False):
+                self.stats['reused_connections'] += 1
+            else:
+                connection.used_by_session_pool = True
+                self.stats['new_connections'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, 'sessions': len(self.sessions)}
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = session_pool(max_sessions=int(os.getenv('REQUESTS_POOL_MAX_SESSIONS', 20)),
+                                max_hosts=int(os.getenv('REQUESTS_POOL_MAX_HOSTS', 100)),
+                                per_host=int(os.getenv('REQUESTS_POOL_CONNECTIONS_PER_HOST', 10)),
+                                idle_seconds=int(os.getenv('REQUESTS_POOL_IDLE_SECONDS', 300)))
+        return pool
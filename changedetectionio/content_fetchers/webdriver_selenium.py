@@ -58,25 +58,42 @@ class fetcher(Fetcher):
             current_include_filters=None,
             is_binary=False):
 
-        from selenium import webdriver
-        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from changedetectionio.content_fetchers import selenium_pool
         from selenium.common.exceptions import WebDriverException
         # request_body, request_method unused for now, until some magic in the future happens.
 
+        if not selenium_pool.enabled():
+            self.driver = self.create_driver()
+            try:
+                self.run_in_session(url=url, current_include_filters=current_include_filters)
+            except WebDriverException as e:
+                # Be sure we close the session window
+                self.quit()
+                raise
+            return
+
+        # The session goes back to the pool afterwards, not quit()
+        with selenium_pool.get_pool().session(url=self.browser_connection_url, proxy=self.proxy, create_driver=self.create_driver) as driver:
+            self.driver = driver
+            try:
+                self.run_in_session(url=url, current_include_filters=current_include_filters)
+            finally:
+                self.driver = None
+
+    def create_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+
         options = ChromeOptions()
         if self.proxy:
             options.proxy = self.proxy
 
-        self.driver = webdriver.Remote(
+        return webdriver.Remote(
             command_executor=self.browser_connection_url,
             options=options)
 
-        try:
-            self.driver.get(url)
-        except WebDriverException as e:
-            # Be sure we close the session window
-            self.quit()
-            raise
+    def run_in_session(self, url, current_include_filters):
+        self.driver.get(url)
 
         self.driver.set_window_size(1280, 1024)
         self.driver.implicitly_wait(int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)))
@@ -91,12 +108,34 @@ class fetcher(Fetcher):
         # @todo somehow we should try to get this working for WebDriver
         # raise EmptyReply(url=url, status_code=r.status_code)
 
-        # @todo - dom wait loaded?
-        time.sleep(int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay)
+        self.wait_for_content_ready(max_seconds=int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay,
+                                    include_filters=current_include_filters)
         self.content = self.driver.page_source
         self.headers = {}
 
-        self.screenshot = self.driver.get_screenshot_as_png()
+        if self.fetch_plan.get('screenshot'):
+            self.screenshot = self.driver.get_screenshot_as_png()
+
+    def wait_for_content_ready(self, max_seconds, include_filters):
+        """
+        Wait for the page to be ready (per the watch's content_ready_strategy), at most max_seconds
+        """
+        if self.content_ready_strategy == 'fixed':
+            time.sleep(max_seconds)
+            return
+
+        from selenium.common.exceptions import WebDriverException
+        started = time.time()
+        script = f"return ({self.content_ready_js})(arguments[0]);"
+        options = self.content_ready_options(include_filters)
+        while time.time() - started < max_seconds:
+            try:
+                if self.driver.execute_script(script, options):
+                    logger.debug(f"Content Fetcher > Page ready ({self.content_ready_strategy}) after {time.time() - started:.2f}s")
+                    return
+            except WebDriverException as e:
+                logger.debug(f"Content Fetcher > Could not check if the page is ready - {str(e)}")
+            time.sleep(0.1)
 
     # Does the connection to the webdriver work? run a test connection.
     def is_ready(self):
@@ -0,0 +1,378 @@
+#!/usr/bin/python3
+
+# Distributed worker mode
+#
+# The main node still runs the ticker and the `update_worker` threads, but when REMOTE_WORKER_QUEUE is set
+# each check is written to a shared SQLite job queue instead of being fetched locally.
+# Worker nodes (this module, run as `python3 -m changedetectionio.distributed -q /shared/jobs.db -d /datastore`)
+# claim jobs, run the fetch and the processor, and return a compact result (update_obj, snapshot contents,
+# screenshot, changed flag or the exception), the waiting `update_worker` on the main node then applies it to
+# the store exactly like a local check (notifications, history, errors etc).
+#
+# Everything the processor needs from the datastore (watch, settings, proxies, headers) travels with the job,
+# the worker node only needs the datastore directory for the watch history (shared volume, can be read-mostly)
+
+import base64
+import contextlib
+import getopt
+import importlib
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from loguru import logger
+
+from changedetectionio.model import Watch
+
+# How long the main node waits for the result of a check
+remote_worker_timeout = int(os.getenv('REMOTE_WORKER_TIMEOUT', 300))
+# How long a claimed job can run before another worker node may take it over (the node probably died), longer than
+# the timeout so that a check that is only slow is not run twice
+job_lease_seconds = int(os.getenv('REMOTE_WORKER_LEASE_SECONDS', 2 * remote_worker_timeout))
+
+# Only exceptions of these modules are recreated from a job result, anyone who can write to the shared queue file
+# could otherwise have any class made on the main node, the others come back as a plain Exception
+result_exception_modules = ['changedetectionio.content_fetchers.exceptions',
+                            'changedetectionio.pdf_to_html',
+                            'changedetectionio.processors.restock_diff',
+                            'changedetectionio.processors.text_json_diff']
+
+# The parts of settings['application'] that the processors and fetchers read, only these go in the job, the password,
+# API token, notification URLs and tags stay on the main node
+job_application_settings = ['block_resource_types',
+                            'block_url_patterns',
+                            'empty_pages_are_a_change',
+                            'extract_title_as_title',
+                            'fetch_backend',
+                            'global_ignore_text',
+                            'global_subtractive_selectors',
+                            'ignore_whitespace',
+                            'render_anchor_tag_content',
+                            'webdriver_delay']
+
+
+def encode(value):
+    """
+    JSON friendly version of a result, bytes and exceptions (also nested ones, like BrowserStepsStepException.original_e)
+    are kept so they can be recreated on the main node
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, BaseException):
+        return {'__exception__': f"{value.__class__.__module__}.{value.__class__.__qualname__}",
+                'args': encode(list(value.args)),
+                'state': encode(dict(value.__dict__))}
+    if isinstance(value, dict):
+        return {str(k): encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def decode(value):
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__bytes__' in value:
+        return base64.b64decode(value['__bytes__'])
+    if '__exception__' in value:
+        (module_name, class_name) = value['__exception__'].rsplit('.', 1)
+        if module_name not in result_exception_modules:
+            return Exception(*decode(value['args']))
+        try:
+            cls = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError):
+            return Exception(*decode(value['args']))
+        if not isinstance(cls, type) or not issubclass(cls, Exception):
+            return Exception(*decode(value['args']))
+        # The exceptions in this app mostly have their own __init__ with required arguments, so skip it
+        e = cls.__new__(cls)
+        e.args = tuple(decode(value['args']))
+        e.__dict__.update(decode(value['state']))
+        return e
+    return {k: decode(v) for k, v in value.items()}
+
+
+class JobQueue():
+    """
+    Shared job queue in a SQLite file, safe to use from many threads and processes (one connection per call)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, uuid TEXT NOT NULL, priority INTEGER NOT NULL, '
+                       'job TEXT NOT NULL, claimed_by TEXT, claimed_at REAL)')
+            db.execute('CREATE TABLE IF NOT EXISTS results (job_id INTEGER PRIMARY KEY, result TEXT NOT NULL)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, uuid, priority, job):
+        with self._connect() as db:
+            return db.execute('INSERT INTO jobs (uuid, priority, job) VALUES (?, ?, ?)', (uuid, priority, json.dumps(job))).lastrowid
+
+    def claim(self, worker_id):
+        """
+        Take the most urgent job that nobody is working on (or whose worker went quiet for too long)
+        :return: (job_id, job) or None
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT id, job FROM jobs WHERE (claimed_at IS NULL OR claimed_at < ?) AND id NOT IN (SELECT job_id FROM results) '
+                             'ORDER BY priority, id LIMIT 1',
+                             (time.time() - job_lease_seconds,)).fetchone()
+            if row:
+                db.execute('UPDATE jobs SET claimed_by = ?, claimed_at = ? WHERE id = ?', (worker_id, time.time(), row[0]))
+            db.execute('COMMIT')
+
+        return (row[0], json.loads(row[1])) if row else None
+
+    def complete(self, job_id, result):
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO results (job_id, result) VALUES (?, ?)', (job_id, json.dumps(result)))
+
+    def wait_for_result(self, job_id, timeout, exit_event=None):
+        """
+        Wait for the result of a job, the job and result are removed from the queue once collected
+        :return: result or None on timeout
+        """
+        started = time.time()
+        while time.time() - started < timeout:
+            with self._connect() as db:
+                row = db.execute('SELECT result FROM results WHERE job_id = ?', (job_id,)).fetchone()
+            if row:
+                self.cancel(job_id)
+                return json.loads(row[0])
+            if exit_event and exit_event.is_set():
+                break
+            time.sleep(0.2)
+
+        self.cancel(job_id)
+        return None
+
+    def cancel(self, job_id):
+        with self._connect() as db:
+            db.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            db.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+
+    def qsize(self):
+        with self._connect() as db:
+            return db.execute('SELECT COUNT(*) FROM jobs WHERE id NOT IN (SELECT job_id FROM results)').fetchone()[0]
+
+
+def build_job(datastore, uuid, skip_when_checksum_same):
+    """
+    Everything a worker node needs to run the processor for this watch without access to the main datastore
+    """
+    return {
+        'uuid': uuid,
+        'skip_when_checksum_same': skip_when_checksum_same,
+        'watch': dict(datastore.data['watching'][uuid]),
+        'settings': {
+            'application': {k: v for k, v in datastore.data['settings']['application'].items() if k in job_application_settings},
+            'requests': datastore.data['settings']['requests'],
+        },
+        'preferred_proxy_id': datastore.get_preferred_proxy_for_watch(uuid=uuid),
+        'proxy_list': datastore.proxy_list,
+        'base_headers': datastore.get_all_base_headers(),
+        'textfile_headers': datastore.get_all_headers_in_textfile_for_watch(uuid=uuid),
+        'tag_overrides': {attr: datastore.get_tag_overrides_for_watch(uuid=uuid, attr=attr) for attr in ['include_filters', 'subtractive_selectors']},
+    }
+
+
+class job_datastore():
+    """
+    Read-only stand-in for ChangeDetectionStore built from a job, only what the processors use
+    """
+
+    def __init__(self, job, datastore_path):
+        self.datastore_path = datastore_path
+        self.job = job
+        watch = Watch.model(datastore_path=datastore_path, default=job['watch'])
+        watch.ensure_data_dir_exists()
+        self.data = {'settings': job['settings'], 'watching': {job['uuid']: watch}}
+
+    @property
+    def proxy_list(self):
+        return self.job['proxy_list']
+
+    def get_preferred_proxy_for_watch(self, uuid):
+        return self.job['preferred_proxy_id']
+
+    def get_all_base_headers(self):
+        return dict(self.job['base_headers'])
+
+    def get_all_headers_in_textfile_for_watch(self, uuid):
+        return dict(self.job['textfile_headers'])
+
+    def get_tag_overrides_for_watch(self, uuid, attr):
+        return self.job['tag_overrides'].get(attr, [])
+
+
+def run_job(job, datastore_path):
+    """
+    Run the fetch and the processor on a worker node
+    :return: encoded result for JobQueue.complete()
+    """
+    from changedetectionio.processors import text_json_diff, restock_diff
+
+    datastore = job_datastore(job=job, datastore_path=datastore_path)
+    uuid = job['uuid']
+    result = {}
+    update_handler = None
+    try:
+        if job['watch'].get('processor') == 'restock_diff':
+            update_handler = restock_diff.perform_site_check(datastore=datastore, watch_uuid=uuid)
+        else:
+            update_handler = text_json_diff.perform_site_check(datastore=datastore, watch_uuid=uuid)
+
+        update_handler.call_browser(skip_when_checksum_same=job['skip_when_checksum_same'])
+        changed_detected, update_obj, contents = update_handler.run_changedetection(uuid, skip_when_checksum_same=job['skip_when_checksum_same'])
+        result.update({'changed_detected': changed_detected, 'update_obj': update_obj, 'contents': contents})
+    except Exception as e:
+        logger.debug(f"Watch {uuid} job finished with exception {e.__class__.__name__}")
+        result['exception'] = e
+
+    if update_handler:
+        result['screenshot'] = update_handler.screenshot
+        result['xpath_data'] = update_handler.xpath_data
+        result['auto_fetch_update'] = update_handler.auto_fetch_update
+        if update_handler.fetcher:
+            result['headers'] = dict(update_handler.fetcher.headers or {})
+            result['conditional_request_validators'] = update_handler.fetcher.get_conditional_request_validators()
+
+    return encode(result)
+
+
+class remote_fetcher_reply():
+    """
+    The parts of the fetcher that update_worker looks at after a check
+    """
+
+    def __init__(self, headers, conditional_request_validators):
+        self.headers = headers or {}
+        self.conditional_request_validators = conditional_request_validators or {}
+
+    def get_conditional_request_validators(self):
+        return self.conditional_request_validators
+
+
+class remote_update_handler():
+    """
+    Used by update_worker in place of a processor when REMOTE_WORKER_QUEUE is set, same call_browser() and
+    run_changedetection() interface but the actual work happens on a worker node
+    """
+    auto_fetch_update = None
+    fetcher = None
+    screenshot = None
+    xpath_data = None
+
+    def __init__(self, datastore, watch_uuid, queue_path, priority, exit_event=None):
+        self.datastore = datastore
+        self.watch_uuid = watch_uuid
+        self.job_queue = JobQueue(queue_path)
+        self.priority = priority
+        self.exit_event = exit_event
+        self.result = {}
+
+    def call_browser(self, skip_when_checksum_same=False):
+        job = build_job(datastore=self.datastore, uuid=self.watch_uuid, skip_when_checksum_same=skip_when_checksum_same)
+        job_id = self.job_queue.submit(uuid=self.watch_uuid, priority=self.priority, job=job)
+
+        timeout = remote_worker_timeout
+        result = self.job_queue.wait_for_result(job_id, timeout=timeout, exit_event=self.exit_event)
+        if result is None:
+            raise Exception(f"No worker node finished the check within {timeout} seconds")
+
+        self.result = decode(result)
+        self.screenshot = self.result.get('screenshot')
+        self.xpath_data = self.result.get('xpath_data')
+        self.auto_fetch_update = self.result.get('auto_fetch_update')
+        self.fetcher = remote_fetcher_reply(headers=self.result.get('headers'),
+                                            conditional_request_validators=self.result.get('conditional_request_validators'))
+
+        if self.result.get('exception'):
+            raise self.result['exception']
+
+    def run_changedetection(self, uuid, skip_when_checksum_same=True):
+        return self.result['changed_detected'], self.result['update_obj'], self.result['contents']
+
+
+def worker_node(queue_path, datastore_path, n_threads=4, exit_event=None):
+    """
+    Claim and run jobs from the shared queue until exit_event is set
+    """
+    if exit_event is None:
+        exit_event = threading.Event()
+
+    job_queue = JobQueue(queue_path)
+    node_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    def work(thread_n):
+        worker_id = f"{node_id}-{thread_n}"
+        while not exit_event.is_set():
+            claimed = job_queue.claim(worker_id)
+            if not claimed:
+                exit_event.wait(1)
+                continue
+            (job_id, job) = claimed
+            now = time.time()
+            logger.info(f"Worker {worker_id} running job {job_id} for watch {job['uuid']} {job['watch'].get('url')}")
+            job_queue.complete(job_id, run_job(job=job, datastore_path=datastore_path))
+            logger.debug(f"Job {job_id} done in {time.time() - now:.2f}s")
+
+    threads = [threading.Thread(target=work, args=(n,), daemon=True) for n in range(n_threads)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def main():
+    queue_path = None
+    datastore_path = os.path.join(os.getcwd(), "../datastore")
+    n_threads = int(os.getenv("FETCH_WORKERS", 4))
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "q:d:w:")
+    except getopt.GetoptError:
+        print('distributed.py -q /shared/jobs.db [-d path/to/datastore] [-w number of threads]')
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-q':
+            queue_path = arg
+        if opt == '-d':
+            datastore_path = arg
+        if opt == '-w':
+            n_threads = int(arg)
+
+    if not queue_path:
+        print('Missing the path to the shared job queue, -q /shared/jobs.db')
+        sys.exit(2)
+
+    exit_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: exit_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: exit_event.set())
+
+    logger.info(f"Worker node starting {n_threads} threads on queue {queue_path}, datastore {datastore_path}")
+    for t in worker_node(queue_path=queue_path, datastore_path=datastore_path, n_threads=n_threads, exit_event=exit_event):
+        t.join()
+
+
+if __name__ == '__main__':
+    main()
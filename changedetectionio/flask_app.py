@@ -215,9 +215,14 @@ def login_optionally_required(func):
 def changedetection_app(config=None, datastore_o=None):
     logger.trace("TRACE log is enabled")
 
-    global datastore
+    global datastore, update_q
     datastore = datastore_o
 
+    # Optional durable queue, rechecks that were waiting in the queue are replayed after a restart
+    if strtobool(os.getenv('PERSISTENT_QUEUE', 'false')):
+        from changedetectionio.persistent_queue import PersistentPriorityQueue
+        update_q = PersistentPriorityQueue(path=os.path.join(config['datastore_path'], 'queue.db'))
+
     # so far just for read-only via tests, but this will be moved eventually to be the main source
     # (instead of the global var)
     app.config['DATASTORE'] = datastore_o
@@ -780,6 +785,8 @@ def changedetection_app(config=None, datastore_o=None):
                                      has_special_tag_options=_watch_has_tag_options_set(watch=watch),
                                      is_html_webdriver=is_html_webdriver,
                                      jq_support=jq_support,
+                                     next_check_time=watch.next_check_time(default_seconds=datastore.threshold_seconds,
+                                                                           schedule=datastore.get_schedule_for_watch(uuid)),
                                      playwright_enabled=os.getenv('PLAYWRIGHT_DRIVER_URL', False),
                                      settings_application=datastore.data['settings']['application'],
                                      using_global_webdriver_wait=default['webdriver_delay'] is None,
@@ -1248,13 +1255,22 @@ def changedetection_app(config=None, datastore_o=None):
             if datastore.data['settings']['application']['password'] and not flask_login.current_user.is_authenticated:
                 abort(403)
 
-            screenshot_filename = "last-screenshot.png" if not request.args.get('error_screenshot') else "last-error-screenshot.png"
+            from changedetectionio import screenshots
+            screenshot_name = "last-screenshot"
+            if request.args.get('error_screenshot'):
+                screenshot_name = "last-error-screenshot"
+            elif request.args.get('thumbnail'):
+                screenshot_name = "last-screenshot-thumbnail"
 
             # These files should be in our subdirectory
             try:
+                # Stored in SCREENSHOT_FORMAT (or .png from older versions)
+                screenshot_path = screenshots.find(os.path.join(datastore_o.datastore_path, filename), screenshot_name)
+                if not screenshot_path:
+                    raise FileNotFoundError
                 # set nocache, set content-type
-                response = make_response(send_from_directory(os.path.join(datastore_o.datastore_path, filename), screenshot_filename))
-                response.headers['Content-type'] = 'image/png'
+                response = make_response(send_from_directory(os.path.join(datastore_o.datastore_path, filename), os.path.basename(screenshot_path)))
+                response.headers['Content-type'] = screenshots.mimetypes[screenshot_path.rsplit('.', 1)[-1]]
                 response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
                 response.headers['Pragma'] = 'no-cache'
                 response.headers['Expires'] = 0
@@ -1668,21 +1684,44 @@ def notification_runner():
 
 # Thread runner to check every minute, look for new watches to feed into the Queue.
 def ticker_thread_check_time_launch_checks():
+    import math
     import random
-    from changedetectionio import update_worker
+    from changedetectionio import update_worker, worker_autoscaler
+    from changedetectionio.content_fetchers.coalesce import fetch_coalescer
 
     proxy_last_called_time = {}
 
+    # Startup ramp - after a restart or long pause, overdue watches are spread over a warm-up window
+    ramp_started = time.time()
+    ramp_rate_per_minute = None
+    ramp_dispatch_times = []
+    last_tick = time.time()
+
     recheck_time_minimum_seconds = int(os.getenv('MINIMUM_SECONDS_RECHECK_TIME', 20))
     logger.debug(f"System env MINIMUM_SECONDS_RECHECK_TIME {recheck_time_minimum_seconds}")
 
     # Spin up Workers that do the fetching
     # Can be overriden by ENV or use the default settings
     n_workers = int(os.getenv("FETCH_WORKERS", datastore.data['settings']['requests']['workers']))
-    for _ in range(n_workers):
-        new_worker = update_worker.update_worker(update_q, notification_q, app, datastore)
-        running_update_threads.append(new_worker)
-        new_worker.start()
+    # Optionally grows/shrinks between FETCH_WORKERS_MIN and FETCH_WORKERS_MAX
+    autoscaler = worker_autoscaler.worker_autoscaler(workers=running_update_threads,
+                                                     start_worker=lambda: update_worker.update_worker(update_q, notification_q, app, datastore),
+                                                     min_workers=int(os.getenv("FETCH_WORKERS_MIN", n_workers)),
+                                                     max_workers=int(os.getenv("FETCH_WORKERS_MAX", n_workers)))
+    autoscaler.scale_to(n_workers)
+    worker_autoscaler.autoscaler = autoscaler
+
+    # Hard deadline for a single check, after which the worker is replaced
+    watchdog_seconds = int(os.getenv("WORKER_WATCHDOG_SECONDS", 900))
+
+    def record_abandoned_check(uuid, seconds):
+        watch = datastore.data['watching'].get(uuid)
+        if watch:
+            datastore.update_watch(uuid=uuid, update_obj={
+                'last_error': f"Timed out - the check was still running after {seconds:.0f} seconds and was abandoned",
+                'last_checked': round(time.time()),
+                'consecutive_errors': watch.get('consecutive_errors', 0) + 1,
+            })
 
     while not app.config.exit.is_set():
 
@@ -1692,6 +1731,10 @@ def ticker_thread_check_time_launch_checks():
             if t.current_uuid:
                 running_uuids.append(t.current_uuid)
 
+        # Sharding, see who else is checking watches
+        if datastore.shard:
+            datastore.shard.heartbeat()
+
         # Re #232 - Deepcopy the data incase it changes while we're iterating through it all
         watch_uuid_list = []
         while True:
@@ -1710,10 +1753,50 @@ def ticker_thread_check_time_launch_checks():
         # Re #438 - Don't place more watches in the queue to be checked if the queue is already large
         while update_q.qsize() >= 2000:
             time.sleep(1)
+            last_tick = time.time()
 
 
         recheck_time_system_seconds = int(datastore.threshold_seconds)
 
+        ramp_seconds = datastore.data['settings']['requests'].get('startup_ramp_seconds', 0)
+        if time.time() - last_tick > 60:
+            # Machine was suspended or something stalled for a long time, everything is overdue again
+            logger.info(f"Ticker was paused for {time.time() - last_tick:.0f}s, restarting the warm-up window")
+            ramp_started = time.time()
+            ramp_rate_per_minute = None
+        last_tick = time.time()
+
+        ramping = ramp_seconds and time.time() - ramp_started < ramp_seconds
+        if ramping and ramp_rate_per_minute is None:
+            # Keep close to the normal checks-per-minute, unless the backlog needs more to be done within the window
+            steady_per_minute = 0
+            overdue = 0
+            for watch in list(datastore.data['watching'].values()):
+                if watch['paused'] or (datastore.shard and not datastore.shard.owns(watch.get('uuid'))):
+                    continue
+                schedule = datastore.get_schedule_for_watch(watch.get('uuid'))
+                threshold = max(watch.effective_threshold_seconds(default_seconds=recheck_time_system_seconds, schedule=schedule), recheck_time_minimum_seconds, 1)
+                steady_per_minute += 60 / threshold
+                if time.time() >= datastore.get_next_check_time(watch.get('uuid'), default_seconds=recheck_time_system_seconds):
+                    overdue += 1
+            ramp_rate_per_minute = max(1, math.ceil(max(steady_per_minute, overdue * 60 / ramp_seconds)))
+            ramp_dispatch_times = []
+            logger.info(f"Warm-up for {ramp_seconds}s, {overdue} watches overdue, queueing at most {ramp_rate_per_minute} per minute")
+
+        # Fetch signatures (URL, headers, method, body, proxy, fetcher..) currently queued or being fetched, nearly due
+        # watches that fetched with the same signature last time can join them and share the fetch
+        coalesce_fetch_seconds = datastore.data['settings']['requests'].get('coalesce_fetch_seconds', 0)
+        fetching_signatures = set()
+        if coalesce_fetch_seconds:
+            for fetching_uuid in running_uuids + [q_uuid.item['uuid'] for q_uuid in update_q.queue]:
+                signature = fetch_coalescer.get_watch_signature(fetching_uuid)
+                if signature:
+                    fetching_signatures.add(signature)
+
+        # For the autoscaler, how late is the most overdue watch and how long does a check take lately
+        oldest_due_seconds = 0
+        recent_check_seconds = []
+
         # Check for watches outside of the time threshold to put in the thread queue.
         for uuid in watch_uuid_list:
             now = time.time()
@@ -1726,10 +1809,13 @@ def ticker_thread_check_time_launch_checks():
             if watch['paused']:
                 continue
 
-            # If they supplied an individual entry minutes to threshold.
+            # Sharding, another instance checks this one
+            if datastore.shard and not datastore.shard.owns(uuid):
+                continue
 
-            watch_threshold_seconds = watch.threshold_seconds()
-            threshold = watch_threshold_seconds if watch_threshold_seconds > 0 else recheck_time_system_seconds
+            # If they supplied an individual entry minutes to threshold, the adaptive interval learnt from the history,
+            # or a cron expression/time window from the watch or its tag (only worked out again after the watch changed)
+            next_check = datastore.get_next_check_time(uuid, default_seconds=recheck_time_system_seconds)
 
             # #580 - Jitter plus/minus amount of time to make the check seem more random to the server
             jitter = datastore.data['settings']['requests'].get('jitter_seconds', 0)
@@ -1739,9 +1825,32 @@ def ticker_thread_check_time_launch_checks():
 
             seconds_since_last_recheck = now - watch['last_checked']
 
-            if seconds_since_last_recheck >= (threshold + watch.jitter_seconds) and seconds_since_last_recheck >= recheck_time_minimum_seconds:
+            if watch['last_checked']:
+                oldest_due_seconds = max(oldest_due_seconds, now - next_check)
+                if seconds_since_last_recheck < 600 and watch.get('fetch_time'):
+                    recent_check_seconds.append(watch.get('fetch_time'))
+            elif watch.get('date_created'):
+                # Never checked, due since it was added
+                oldest_due_seconds = max(oldest_due_seconds, now - watch.get('date_created'))
+
+            due = now >= (next_check + watch.jitter_seconds)
+            # Due soon anyway and the same fetch is already queued or running, check it now so the fetch can be shared
+            if not due and fetching_signatures and fetch_coalescer.get_watch_signature(uuid) in fetching_signatures:
+                due = now >= (next_check - coalesce_fetch_seconds)
+
+            # Overdue since before the warm-up started? wait for this watch's own slot in the window
+            if due and ramping and watch.waits_for_ramp_slot(now=now, ramp_started=ramp_started, ramp_seconds=ramp_seconds):
+                continue
+
+            if due and seconds_since_last_recheck >= recheck_time_minimum_seconds:
                 if not uuid in running_uuids and uuid not in [q_uuid.item['uuid'] for q_uuid in update_q.queue]:
 
+                    if ramping:
+                        ramp_dispatch_times = [t for t in ramp_dispatch_times if now - t < 60]
+                        if len(ramp_dispatch_times) >= ramp_rate_per_minute:
+                            # Enough for this minute, try again next time around
+                            continue
+
                     # Proxies can be set to have a limit on seconds between which they can be called
                     watch_proxy = datastore.get_preferred_proxy_for_watch(uuid=uuid)
                     if watch_proxy and watch_proxy in list(datastore.proxy_list.keys()):
@@ -1772,10 +1881,19 @@ def ticker_thread_check_time_launch_checks():
 
                     # Into the queue with you
                     update_q.put(queuedWatchMetaData.PrioritizedItem(priority=priority, item={'uuid': uuid, 'skip_when_checksum_same': True}))
+                    if coalesce_fetch_seconds and fetch_coalescer.get_watch_signature(uuid):
+                        fetching_signatures.add(fetch_coalescer.get_watch_signature(uuid))
+                    if ramping:
+                        ramp_dispatch_times.append(now)
 
                     # Reset for next time
                     watch.jitter_seconds = 0
 
+        autoscaler.reclaim_hung_workers(deadline_seconds=watchdog_seconds, on_abandoned=record_abandoned_check)
+        autoscaler.evaluate(queue_size=update_q.qsize(),
+                            oldest_due_seconds=oldest_due_seconds,
+                            average_check_seconds=sum(recent_check_seconds) / len(recent_check_seconds) if recent_check_seconds else 0)
+
         # Wait before checking the list again - saves CPU
         time.sleep(1)
 
@@ -28,6 +28,7 @@ from validators.url import url as url_validator
 from changedetectionio.blueprint.browser_steps.browser_steps import browser_step_ui_config
 
 from changedetectionio import html_tools, content_fetchers
+from changedetectionio.content_fetchers import resource_blocking
 
 from changedetectionio.notification import (
     valid_notification_formats,
@@ -49,6 +50,11 @@ valid_method = {
 default_method = 'GET'
 allow_simplehost = not strtobool(os.getenv('BLOCK_SIMPLEHOSTS', 'False'))
 
+class MultiCheckboxField(fields.SelectMultipleField):
+    widget = widgets.ListWidget(prefix_label=False)
+    option_widget = widgets.CheckboxInput()
+
+
 class StringListField(StringField):
     widget = widgets.TextArea()
 
@@ -308,6 +314,32 @@ class ValidateListRegex(object):
                     message = field.gettext('RegEx \'%s\' is not a valid regular expression.')
                     raise ValidationError(message % (line))
 
+class ValidateSchedule(object):
+    """
+    Validates a cron expression, time window ('mon-fri 09:00-18:00') or timezone name
+    """
+    def __init__(self, kind, message=None):
+        self.kind = kind
+        self.message = message
+
+    def __call__(self, form, field):
+        from changedetectionio import schedule
+        import pytz
+
+        if not field.data or not field.data.strip():
+            return
+        try:
+            if self.kind == 'cron':
+                schedule.validate_cron(field.data)
+            elif self.kind == 'time_window':
+                schedule.parse_time_window(field.data.strip())
+            elif self.kind == 'timezone':
+                schedule.get_timezone(field.data)
+        except pytz.exceptions.UnknownTimeZoneError:
+            raise ValidationError(self.message or f"'{field.data}' is not a known timezone, for example 'Europe/Berlin'")
+        except ValueError as e:
+            raise ValidationError(self.message or str(e))
+
 class ValidateCSSJSONXPATHInput(object):
     """
     Filter validation
@@ -425,6 +457,8 @@ class commonSettingsForm(Form):
     notification_body = TextAreaField('Notification Body', default='{{ watch_url }} had a change.', validators=[validators.Optional(), ValidateJinja2Template()])
     notification_format = SelectField('Notification format', choices=valid_notification_formats.keys())
     fetch_backend = RadioField(u'Fetch Method', choices=content_fetchers.available_fetchers(), validators=[ValidateContentFetcherIsReady()])
+    block_resource_types = MultiCheckboxField('Don\'t download these in the browser', choices=resource_blocking.resource_type_choices)
+    block_url_patterns = StringListField('Don\'t download from these domains or URLs', [validators.Optional()])
     extract_title_as_title = BooleanField('Extract <title> from document and use as watch title', default=False)
     webdriver_delay = IntegerField('Wait seconds before extracting text', validators=[validators.Optional(), validators.NumberRange(min=1,
                                                                                                                                     message="Should contain one or more seconds")])
@@ -443,6 +477,7 @@ class SingleBrowserStep(Form):
     # maybe better to set some <script>var..
     selector = StringField('Selector', [validators.Optional()], render_kw={"placeholder": "CSS or xPath selector"})
     optional_value = StringField('value', [validators.Optional()], render_kw={"placeholder": "Value"})
+    setup = BooleanField('Setup', default=False, render_kw={"title": "Setup step (login etc), skipped while the saved browser session still works"})
 #   @todo move to JS? ajax fetch new field?
 #    remove_button = SubmitField('-', render_kw={"type": "button", "class": "pure-button pure-button-primary", 'title': 'Remove'})
 #    add_button = SubmitField('+', render_kw={"type": "button", "class": "pure-button pure-button-primary", 'title': 'Add new step after'})
@@ -453,6 +488,10 @@ class watchForm(commonSettingsForm):
     tags = StringTagUUID('Group tag', [validators.Optional()], default='')
 
     time_between_check = FormField(TimeBetweenCheckForm)
+    adaptive_recheck = BooleanField('Adaptive recheck time', default=False)
+    schedule_cron = StringField('Cron schedule', [validators.Optional(), ValidateSchedule(kind='cron')], render_kw={"placeholder": "*/30 9-17 * * mon-fri"})
+    schedule_time_window = StringField('Only check during', [validators.Optional(), ValidateSchedule(kind='time_window')], render_kw={"placeholder": "mon-fri 08:00-18:00, sat 10:00-14:00"})
+    schedule_timezone = StringField('Timezone', [validators.Optional(), ValidateSchedule(kind='timezone')], render_kw={"placeholder": "Europe/Berlin"})
 
     include_filters = StringListField('CSS/JSONPath/JQ/XPath Filters', [ValidateCSSJSONXPATHInput()], default='')
 
@@ -467,6 +506,7 @@ class watchForm(commonSettingsForm):
     body = TextAreaField('Request body', [validators.Optional()])
     method = SelectField('Request method', choices=valid_method, default=default_method)
     ignore_status_codes = BooleanField('Ignore status codes (process non-2xx status codes as normal)', default=False)
+    use_conditional_requests = BooleanField('Skip unchanged downloads using ETag/Last-Modified', default=True)
     check_unique_lines = BooleanField('Only trigger when unique lines appear', default=False)
     sort_text_alphabetically =  BooleanField('Sort text alphabetically', default=False)
 
@@ -480,8 +520,19 @@ class watchForm(commonSettingsForm):
     trigger_text = StringListField('Trigger/wait for text', [validators.Optional(), ValidateListRegex()])
     if os.getenv("PLAYWRIGHT_DRIVER_URL"):
         browser_steps = FieldList(FormField(SingleBrowserStep), min_entries=10)
+        browser_steps_session_scope = RadioField('Keep the session of the setup steps for', default='watch', choices=[
+            ('watch', 'This watch'),
+            ('tag', 'All watches in the same (first) tag'),
+        ])
     text_should_not_be_present = StringListField('Block change-detection while text matches', [validators.Optional(), ValidateListRegex()])
     webdriver_js_execute_code = TextAreaField('Execute JavaScript before change detection', render_kw={"rows": "5"}, validators=[validators.Optional()])
+    block_resources_override = BooleanField('Use only the blocking rules here, not the ones from the settings', default=False)
+    content_ready_strategy = RadioField('Page is ready', default='fixed', choices=[
+        ('fixed', 'After the wait time'),
+        ('network_idle', 'When nothing more is loading'),
+        ('dom_quiet', 'When the page stops changing'),
+        ('filters', 'When the CSS/xPath filters are found'),
+    ])
 
     save_button = SubmitField('Save', render_kw={"class": "pure-button pure-button-primary"})
 
@@ -533,9 +584,34 @@ class globalSettingsRequestForm(Form):
     jitter_seconds = IntegerField('Random jitter seconds ± check',
                                   render_kw={"style": "width: 5em;"},
                                   validators=[validators.NumberRange(min=0, message="Should contain zero or more seconds")])
+    adaptive_recheck_min_seconds = IntegerField('Adaptive recheck minimum seconds',
+                                                render_kw={"style": "width: 8em;"},
+                                                validators=[validators.NumberRange(min=1, message="Should contain one or more seconds")])
+    adaptive_recheck_max_seconds = IntegerField('Adaptive recheck maximum seconds',
+                                                render_kw={"style": "width: 8em;"},
+                                                validators=[validators.NumberRange(min=1, message="Should contain one or more seconds")])
+    error_retry_attempts = IntegerField('Quick retries after a temporary error',
+                                        render_kw={"style": "width: 5em;"},
+                                        validators=[validators.NumberRange(min=0, message="Should contain zero or more attempts")])
+    error_retry_seconds = IntegerField('First retry after seconds',
+                                       render_kw={"style": "width: 5em;"},
+                                       validators=[validators.NumberRange(min=1, message="Should contain one or more seconds")])
+    error_backoff_max_seconds = IntegerField('Back-off for failing watches up to seconds',
+                                             render_kw={"style": "width: 8em;"},
+                                             validators=[validators.NumberRange(min=1, message="Should contain one or more seconds")])
+    coalesce_fetch_seconds = IntegerField('Share fetches between watches within seconds',
+                                          render_kw={"style": "width: 5em;"},
+                                          validators=[validators.NumberRange(min=0, message="Should contain zero or more seconds")])
+    startup_ramp_seconds = IntegerField('Warm-up seconds after a restart',
+                                        render_kw={"style": "width: 8em;"},
+                                        validators=[validators.NumberRange(min=0, message="Should contain zero or more seconds")])
     extra_proxies = FieldList(FormField(SingleExtraProxy), min_entries=5)
     extra_browsers = FieldList(FormField(SingleExtraBrowser), min_entries=5)
 
+    def validate_adaptive_recheck_max_seconds(self, field):
+        if self.adaptive_recheck_min_seconds.data and field.data and field.data < self.adaptive_recheck_min_seconds.data:
+            raise ValidationError('Should be the same or more than the minimum seconds')
+
     def validate_extra_proxies(self, extra_validators=None):
         for e in self.data['extra_proxies']:
             if e.get('proxy_name') or e.get('proxy_url'):
@@ -15,10 +15,17 @@ class model(dict):
                 'headers': {
                 },
                 'requests': {
+                    'adaptive_recheck_max_seconds': 86400,  # Upper bound for watches using the adaptive recheck interval
+                    'adaptive_recheck_min_seconds': 300,  # Lower bound for watches using the adaptive recheck interval
+                    'coalesce_fetch_seconds': int(getenv("DEFAULT_SETTINGS_REQUESTS_COALESCE_FETCH_SECONDS", "0")),  # Watches with identical fetch settings checked within this many seconds share one fetch, 0 is off
+                    'error_backoff_max_seconds': 86400,  # Watches that keep failing are checked less often, up to this interval
+                    'error_retry_attempts': 3,  # Quick retries after a temporary error (timeout, connection problem, 5xx), 0 is off
+                    'error_retry_seconds': 30,  # Wait before the first quick retry, doubled for each next one
                     'extra_proxies': [], # Configurable extra proxies via the UI
                     'extra_browsers': [],  # Configurable extra proxies via the UI
                     'jitter_seconds': 0,
                     'proxy': None, # Preferred proxy connection
+                    'startup_ramp_seconds': 0,  # Spread watches that are overdue after a restart or long pause over this many seconds, 0 is off
                     'time_between_check': {'weeks': None, 'days': None, 'hours': 3, 'minutes': None, 'seconds': None},
                     'timeout': int(getenv("DEFAULT_SETTINGS_REQUESTS_TIMEOUT", "45")),  # Default 45 seconds
                     'workers': int(getenv("DEFAULT_SETTINGS_REQUESTS_WORKERS", "10")),  # Number of threads, lower is better for slow connections
@@ -27,6 +34,8 @@ class model(dict):
                     # Custom notification content
                     'api_access_token_enabled': True,
                     'base_url' : None,
+                    'block_resource_types': [],  # Not downloaded by the browser fetchers, see content_fetchers/resource_blocking.py
+                    'block_url_patterns': [],
                     'empty_pages_are_a_change': False,
                     'extract_title_as_title': False,
                     'fetch_backend': getenv("DEFAULT_FETCH_BACKEND", "html_requests"),
@@ -1,6 +1,8 @@
 from changedetectionio.strtobool import strtobool
 from changedetectionio.safe_jinja import render as jinja_render
+from changedetectionio import schedule as schedule_lib
 
+import hashlib
 import os
 import re
 import time
@@ -13,6 +15,10 @@ from loguru import logger
 SAFE_PROTOCOL_REGEX='^(http|https|ftp|file):'
 
 minimum_seconds_recheck_time = int(os.getenv('MINIMUM_SECONDS_RECHECK_TIME', 60))
+# How many of the most recent snapshots are used to estimate how often a watch changes
+adaptive_recheck_history_samples = 10
+# Don't trust the change-rate estimate until the watch was checked atleast this many times
+adaptive_recheck_minimum_checks = 5
 mtable = {'seconds': 1, 'minutes': 60, 'hours': 3600, 'days': 86400, 'weeks': 86400 * 7}
 
 from changedetectionio.notification import (
@@ -20,12 +26,23 @@ from changedetectionio.notification import (
 )
 
 base_config = {
+    'adaptive_recheck': False,  # Learn the recheck interval from how often the watch actually changes
+    'adaptive_recheck_seconds': None,  # Last calculated adaptive recheck interval, None when not yet learnt
+    'auto_fetch_checks_since_probe': 0,  # Checks with Chrome since the plaintext/HTTP fetcher was last tried ('auto' fetch backend)
+    'auto_fetch_tier': None,  # Which fetcher the 'auto' fetch backend last found to work, html_requests or html_webdriver
+    'block_resource_types': [],  # Added to the global blocking rules, or only these with block_resources_override
+    'block_resources_override': False,
+    'block_url_patterns': [],
     'body': None,
     'browser_steps': [],
     'browser_steps_last_error_step': None,
+    'browser_steps_session_scope': 'watch',  # Whose session the steps marked 'setup' save and restore, 'watch' or 'tag' (its first tag)
     'check_unique_lines': False,  # On change-detected, compare against all history if its something new
     'check_count': 0,
     'date_created': None,
+    'consecutive_errors': 0,  # Every check that finished with an error, reset when a check ran OK.
+    'content_ready_strategy': 'fixed',  # How the Chrome fetchers know the page is ready, see content_fetchers/res/content_ready.js
+    'error_recheck_seconds': None,  # Quick retry or back-off interval used while the watch has an error
     'consecutive_filter_failures': 0,  # Every time the CSS/xPath filter cannot be located, reset when all is fine.
     'extract_text': [],  # Extract text by regex after filters
     'extract_title_as_title': False,
@@ -59,7 +76,12 @@ base_config = {
     'previous_md5': False,
     'previous_md5_before_filters': False,  # Used for skipping changedetection entirely
     'proxy': None,  # Preferred proxy connection
+    'remote_etag': None,  # From 'ETag' reply header of the last processed fetch, sent as If-None-Match
+    'remote_last_modified': None,  # From 'Last-Modified' reply header of the last processed fetch, sent as If-Modified-Since
     'remote_server_reply': None, # From 'server' reply header
+    'schedule_cron': None,  # Cron expression, used instead of time_between_check when set
+    'schedule_time_window': None,  # Only check during these times, like 'mon-fri 09:00-18:00'
+    'schedule_timezone': None,  # Timezone for the cron expression and time window, server local time when not set
     'sort_text_alphabetically': False,
     'subtractive_selectors': [],
     'tag': '', # Old system of text name for a tag, to be removed
@@ -72,6 +94,7 @@ base_config = {
     'title': None,
     'trigger_text': [],  # List of text or regex to wait for until a change is detected
     'url': '',
+    'use_conditional_requests': True,  # Send If-None-Match/If-Modified-Since, turn off for servers that lie about ETag/Last-Modified
     'uuid': str(uuid.uuid4()),
     'webdriver_delay': None,
     'webdriver_js_execute_code': None,  # Run before change-detection
@@ -96,6 +119,8 @@ def is_safe_url(test_url):
 class model(dict):
     __newest_history_key = None
     __history_n = 0
+    # ((default_seconds, schedule revision), timestamp) from cached_next_check_time(), forgotten on every change to the watch
+    __next_check = None
     jitter_seconds = 0
 
     def __init__(self, *arg, **kw):
@@ -117,6 +142,14 @@ class model(dict):
         # Goes at the end so we update the default object with the initialiser
         super(model, self).__init__(*arg, **kw)
 
+    def __setitem__(self, key, value):
+        self.__next_check = None
+        super(model, self).__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        self.__next_check = None
+        super(model, self).update(*args, **kwargs)
+
     @property
     def viewed(self):
         # Don't return viewed when last_viewed is 0 and newest_key is 0
@@ -255,6 +288,13 @@ class model(dict):
 
         return has_browser_steps
 
+    @property
+    def browser_session_file(self):
+        "Where the cookies/localStorage after the Browser Steps marked as 'setup' are kept (see content_fetchers/base.py)"
+        if self.get('browser_steps_session_scope') == 'tag' and self.get('tags'):
+            return os.path.join(self.__datastore_path, 'browser-sessions', f"{self['tags'][0]}.json")
+        return os.path.join(self.watch_data_dir, 'browser-session.json')
+
     # Returns the newest key, but if theres only 1 record, then it's counted as not being new, so return 0.
     @property
     def newest_history_key(self):
@@ -379,6 +419,125 @@ class model(dict):
                 seconds += x * n
         return seconds
 
+    def effective_threshold_seconds(self, default_seconds, schedule=None):
+        """
+        The recheck interval the scheduler should use for this watch
+        :param default_seconds: System wide default, used when the watch has no specific time set
+        :param schedule: From datastore.get_schedule_for_watch(), the cron expression (if any) replaces the interval
+        :return: seconds
+        """
+        seconds = self.threshold_seconds()
+        if not seconds:
+            seconds = default_seconds
+
+        if schedule and schedule.get('cron'):
+            seconds = schedule_lib.cron_interval_seconds(schedule['cron'], schedule.get('timezone')) or seconds
+        elif self.get('adaptive_recheck') and self.get('adaptive_recheck_seconds'):
+            seconds = self.get('adaptive_recheck_seconds')
+
+        if self.get('last_error') and self.get('error_recheck_seconds'):
+            seconds = self.get('error_recheck_seconds')
+
+        return seconds
+
+    @property
+    def schedule_phase(self):
+        """
+        Fraction between 0 and 1 derived from the UUID, the same on every restart and evenly spread across all watches
+        """
+        return int(hashlib.md5(self.get('uuid').encode('utf-8')).hexdigest()[:8], 16) / 2 ** 32
+
+    def waits_for_ramp_slot(self, now, ramp_started, ramp_seconds):
+        """
+        During the warm-up window after a restart, a watch that was already overdue when it started waits for its own
+        slot (schedule_phase) in the window, watches never checked yet (added during the warm-up etc) don't wait
+        """
+        return 0 < self.get('last_checked', 0) < ramp_started and now < ramp_started + (self.schedule_phase * ramp_seconds)
+
+    def next_check_time(self, default_seconds, schedule=None):
+        # Never checked, so it's due now
+        if not self.get('last_checked'):
+            return 0
+
+        if schedule:
+            interval_seconds = None
+            if not schedule.get('cron') or (self.get('last_error') and self.get('error_recheck_seconds')):
+                interval_seconds = self.effective_threshold_seconds(default_seconds=default_seconds, schedule=schedule)
+            next_time = schedule_lib.next_scheduled_time(cron=schedule.get('cron'),
+                                                         time_window=schedule.get('time_window'),
+                                                         timezone=schedule.get('timezone'),
+                                                         last_checked=int(self.get('last_checked')),
+                                                         interval_seconds=interval_seconds)
+            # Not valid? carry on with the time between checks
+            if next_time is not None:
+                if schedule.get('time_window') and next_time < time.time():
+                    # Missed it (paused, restarted, busy), but still only check when the window is open
+                    next_time = int(schedule_lib.next_in_time_window(schedule_lib.parse_time_window(schedule['time_window'].strip()),
+                                                                     time.time(),
+                                                                     schedule_lib.get_timezone(schedule.get('timezone'))))
+                return next_time
+
+        return int(self.get('last_checked') + self.effective_threshold_seconds(default_seconds=default_seconds))
+
+    def cached_next_check_time(self, default_seconds, schedule_revision, get_schedule):
+        """
+        next_check_time() only worked out again after the watch was changed (checked, edited) or the schedules of the
+        tags changed (schedule_revision), so the ticker just compares timestamps
+        :param get_schedule: Returns the schedule of the watch, only called when it is needed
+        """
+        key = (default_seconds, schedule_revision)
+        cached = self.__next_check
+        if not cached or cached[0] != key:
+            cached = (key, self.next_check_time(default_seconds=default_seconds, schedule=get_schedule()))
+            self.__next_check = cached
+        return cached[1]
+
+    def adaptive_threshold_seconds(self, base_seconds, minimum_seconds, maximum_seconds):
+        """
+        Estimate a recheck interval from how often this watch changed in the past
+
+        Uses the average time between the most recent snapshots in history.txt, or the time since the last change
+        when the page has been quiet for longer than usual, and aims to check twice per expected change.
+        The result is always kept within the bounds.
+
+        :param base_seconds: The configured (fixed) recheck interval, used until there is enough information
+        :param minimum_seconds: Lower bound
+        :param maximum_seconds: Upper bound
+        :return: seconds
+        """
+        seconds = base_seconds
+        timestamps = [int(k) for k in self.history.keys()][-adaptive_recheck_history_samples:]
+
+        if timestamps and self.get('check_count', 0) >= adaptive_recheck_minimum_checks:
+            expected_change_interval = time.time() - timestamps[-1]
+            if len(timestamps) >= 2:
+                average = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+                expected_change_interval = max(average, expected_change_interval)
+            seconds = expected_change_interval / 2
+
+        return int(max(minimum_seconds, min(seconds, maximum_seconds)))
+
+    def error_recheck_seconds(self, error_category, base_seconds, retry_seconds, retry_attempts, maximum_seconds):
+        """
+        Recheck interval after a check that finished with an error
+
+        A 'transient' error (timeout, connection problem, 5xx) is retried quickly a few times (retry_seconds, then
+        doubled each attempt), anything else or when the retries did not help doubles the normal interval
+        for each further error in a row (back-off), but never more than maximum_seconds.
+
+        :param error_category: 'transient' or 'persistent'
+        :param base_seconds: The normal recheck interval
+        :return: seconds
+        """
+        consecutive_errors = self.get('consecutive_errors', 0)
+        if error_category == 'transient':
+            if consecutive_errors <= retry_attempts:
+                return int(min(retry_seconds * 2 ** (consecutive_errors - 1), base_seconds))
+            consecutive_errors -= retry_attempts
+
+        seconds = base_seconds * 2 ** min(consecutive_errors - 1, 20)
+        return int(max(base_seconds, min(seconds, maximum_seconds)))
+
     # Iterate over all history texts and see if something new exists
     def lines_contain_something_unique_compared_to_history(self, lines: list):
         local_lines = set([l.decode('utf-8').strip().lower() for l in lines])
@@ -395,12 +554,18 @@ class model(dict):
         return not local_lines.issubset(existing_history)
 
     def get_screenshot(self):
-        fname = os.path.join(self.watch_data_dir, "last-screenshot.png")
-        if os.path.isfile(fname):
-            return fname
-
+        from changedetectionio import screenshots
         # False is not an option for AppRise, must be type None
-        return None
+        return screenshots.find(self.watch_data_dir, 'last-screenshot')
+
+    def get_screenshot_as_jpeg(self):
+        from changedetectionio import screenshots
+        # For notification attachments
+        return screenshots.as_jpeg(self.watch_data_dir, 'last-screenshot')
+
+    def get_screenshot_thumbnail(self):
+        from changedetectionio import screenshots
+        return screenshots.find(self.watch_data_dir, 'last-screenshot-thumbnail')
 
     def __get_file_ctime(self, filename):
         fname = os.path.join(self.watch_data_dir, filename)
@@ -422,11 +587,13 @@ class model(dict):
 
     @property
     def snapshot_screenshot_ctime(self):
-        return self.__get_file_ctime('last-screenshot.png')
+        fname = self.get_screenshot()
+        return self.__get_file_ctime(os.path.basename(fname)) if fname else False
 
     @property
     def snapshot_error_screenshot_ctime(self):
-        return self.__get_file_ctime('last-error-screenshot.png')
+        fname = self.get_error_snapshot()
+        return self.__get_file_ctime(os.path.basename(fname)) if fname else False
 
     @property
     def watch_data_dir(self):
@@ -443,10 +610,8 @@ class model(dict):
 
     def get_error_snapshot(self):
         """Return path to the screenshot that resulted in a non-200 error"""
-        fname = os.path.join(self.watch_data_dir, "last-error-screenshot.png")
-        if os.path.isfile(fname):
-            return fname
-        return False
+        from changedetectionio import screenshots
+        return screenshots.find(self.watch_data_dir, 'last-error-screenshot') or False
 
 
     def pause(self):
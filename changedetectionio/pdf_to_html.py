@@ -0,0 +1,131 @@
+import glob
+import hashlib
+import os
+import subprocess
+import threading
+
+from loguru import logger
+
+# PDF to HTML conversion with the `pdftohtml` tool (poppler-utils). The converted HTML is kept in the watch's data
+# directory keyed by the checksum of the PDF, so a PDF that did not change (manual recheck, editing the filters) is
+# not converted again, and only a few conversions run at the same time because each one can take a lot of memory.
+
+stats = {'conversions': 0, 'cache_hits': 0, 'timeouts': 0}
+stats_lock = threading.Lock()
+
+slots = None
+slots_lock = threading.Lock()
+
+
+class PDFToHTMLToolNotFound(ValueError):
+    def __init__(self, msg):
+        ValueError.__init__(self, msg)
+
+
+class PDFToHTMLFailed(ValueError):
+    def __init__(self, msg):
+        ValueError.__init__(self, msg)
+
+
+def _count(stat):
+    with stats_lock:
+        stats[stat] += 1
+
+
+def get_slots():
+    global slots
+    with slots_lock:
+        if slots is None:
+            slots = threading.BoundedSemaphore(max(1, int(os.getenv('PDF_TO_HTML_MAX_CONCURRENT', 2))))
+        return slots
+
+
+def get_stats():
+    with stats_lock:
+        return dict(stats)
+
+
+def cache_path(directory, checksum):
+    return os.path.join(directory, f"pdf-{checksum}.html")
+
+
+def cached(directory, checksum):
+    """
+    :return: The HTML converted from the PDF with this checksum, None when it was not converted before
+    """
+    if not directory:
+        return None
+    path = cache_path(directory, checksum)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _store(directory, checksum, html):
+    if not directory or not os.path.isdir(directory):
+        return
+    path = cache_path(directory, checksum)
+    # Only the last one is useful, the next check of a changed PDF has a new checksum
+    for old in glob.glob(os.path.join(directory, "pdf-*.html")):
+        if old != path:
+            os.unlink(old)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+
+
+def run_tool(pdf: bytes, tool, timeout):
+    """
+    Run the conversion, the PDF goes in on stdin and the HTML comes back on stdout
+    """
+    proc = subprocess.Popen([tool, '-stdout', '-', '-s', 'out.pdf', '-i'],
+                            stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    try:
+        # communicate() reads stdout while stdin is still being written, writing a large PDF first and then
+        # reading would block forever once the tool fills the stdout pipe
+        stdout, stderr = proc.communicate(input=pdf, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        _count('timeouts')
+        raise PDFToHTMLFailed(f"`{tool}` did not finish converting the PDF within {timeout} seconds")
+
+    if not stdout.strip():
+        raise PDFToHTMLFailed(f"`{tool}` could not convert the PDF (exit code {proc.returncode}) {stderr.decode('utf-8', errors='ignore').strip()}")
+    if proc.returncode:
+        # Damaged but mostly readable PDFs still give something
+        logger.warning(f"`{tool}` exited with {proc.returncode} converting the PDF - {stderr.decode('utf-8', errors='ignore').strip()}")
+
+    return stdout.decode('utf-8', errors='replace')
+
+
+def convert(pdf: bytes, cache_directory=None):
+    """
+    :param pdf: The PDF as downloaded
+    :param cache_directory: Where to keep the converted HTML (the watch's data directory), None for no cache
+    :return: The PDF as HTML
+    """
+    from shutil import which
+
+    checksum = hashlib.md5(pdf).hexdigest()
+    html = cached(cache_directory, checksum)
+    if html is not None:
+        _count('cache_hits')
+        logger.debug(f"PDF {checksum} was already converted, using the cached HTML")
+        return html
+
+    tool = os.getenv("PDF_TO_HTML_TOOL", "pdftohtml")
+    if not which(tool):
+        raise PDFToHTMLToolNotFound("Command-line `{}` tool was not found in system PATH, was it installed?".format(tool))
+
+    timeout = int(os.getenv('PDF_TO_HTML_TIMEOUT_SECONDS', 60))
+    with get_slots():
+        html = run_tool(pdf, tool=tool, timeout=timeout)
+    _count('conversions')
+
+    _store(cache_directory, checksum, html)
+    return html
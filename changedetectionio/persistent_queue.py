@@ -0,0 +1,100 @@
+import heapq
+import json
+import queue
+import sqlite3
+import time
+
+from loguru import logger
+
+from changedetectionio import queuedWatchMetaData
+
+
+class PersistentPriorityQueue(queue.PriorityQueue):
+    """
+    Drop-in replacement for the `update_q` PriorityQueue that keeps a copy of what is waiting in a SQLite file,
+    so queued rechecks (including priority 1 manual rechecks) are replayed in the same order after a restart.
+
+    A watch UUID is only ever queued once, putting it again keeps the most urgent priority and if any of the
+    requests wanted a full recheck (skip_when_checksum_same False) then that wins.
+
+    Items are removed from the file as soon as a worker takes them, a check that was interrupted by the restart
+    has not updated 'last_checked' so the ticker will queue it again anyway.
+    """
+
+    def __init__(self, path, maxsize=0):
+        super().__init__(maxsize=maxsize)
+        self.path = path
+        # All access happens under self.mutex (from _put/_get) so it's safe to share the connection between threads
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS queue (uuid TEXT PRIMARY KEY, priority INTEGER NOT NULL, item TEXT NOT NULL)')
+        self.db.commit()
+
+        for priority, item in self.db.execute('SELECT priority, item FROM queue ORDER BY priority, rowid').fetchall():
+            super()._put(queuedWatchMetaData.PrioritizedItem(priority=priority, item=json.loads(item)))
+        # Each replayed item is a task, the worker calls task_done() for it like any other
+        self.unfinished_tasks = len(self.queue)
+
+        if self.queue:
+            logger.info(f"Replayed {len(self.queue)} queued watches from {path}")
+
+    def _save(self, queued_item):
+        self.db.execute('INSERT OR REPLACE INTO queue (uuid, priority, item) VALUES (?, ?, ?)',
+                        (queued_item.item.get('uuid'), queued_item.priority, json.dumps(queued_item.item)))
+        self.db.commit()
+
+    def _merge(self, queued_item):
+        """
+        :return: True when the watch was already queued and queued_item was merged into it
+        """
+        uuid = queued_item.item.get('uuid')
+        for existing in self.queue:
+            if existing.item.get('uuid') == uuid:
+                if not queued_item.item.get('skip_when_checksum_same'):
+                    existing.item['skip_when_checksum_same'] = False
+                if queued_item.priority < existing.priority:
+                    existing.priority = queued_item.priority
+                    heapq.heapify(self.queue)
+                self._save(existing)
+                return True
+        return False
+
+    def put(self, item, block=True, timeout=None):
+        # Same as queue.Queue.put(), but an item merged into one already queued is not another task, there will
+        # only be one get() and task_done() for both
+        with self.not_full:
+            if self._merge(item):
+                return
+            if self.maxsize > 0:
+                if not block:
+                    if self._qsize() >= self.maxsize:
+                        raise queue.Full
+                elif timeout is None:
+                    while self._qsize() >= self.maxsize:
+                        self.not_full.wait()
+                elif timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+                else:
+                    endtime = time.monotonic() + timeout
+                    while self._qsize() >= self.maxsize:
+                        remaining = endtime - time.monotonic()
+                        if remaining <= 0.0:
+                            raise queue.Full
+                        self.not_full.wait(remaining)
+                # Queued by someone else while waiting for a free slot
+                if self._merge(item):
+                    return
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, queued_item):
+        super()._put(queued_item)
+        self._save(queued_item)
+
+    def _get(self):
+        queued_item = super()._get()
+        self.db.execute('DELETE FROM queue WHERE uuid = ?', (queued_item.item.get('uuid'),))
+        self.db.commit()
+        return queued_item
@@ -0,0 +1,118 @@
+import os
+import threading
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+from loguru import logger
+
+# Optional pool of processes for the CPU heavy part of a check (BeautifulSoup, inscriptis, XPath, ignore text, diff)
+# so that it does not compete for the GIL with the fetch threads and the UI, fetching stays in the update_worker threads.
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def processing_workers():
+    # 0 (default) means the processing runs in the update_worker thread like always
+    return int(os.getenv('PROCESSING_WORKERS', 0))
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            logger.info(f"Starting {processing_workers()} processes for change detection processing")
+            # 'spawn' because forking a process that has many threads running (Flask, workers, loguru) can deadlock
+            executor = ProcessPoolExecutor(max_workers=processing_workers(), mp_context=multiprocessing.get_context('spawn'))
+        return executor
+
+
+def shutdown(kill=False):
+    global executor
+    with executor_lock:
+        if executor is not None:
+            if kill:
+                # A stuck process (catastrophic regex etc) never finishes by itself
+                for process in list((executor._processes or {}).values()):
+                    process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+
+
+def _run_changedetection(job, fetcher_state, datastore_path):
+    """
+    Runs in the pool process, rebuilds the processor from the job (watch config, settings) and the fetched content
+    """
+    from changedetectionio.content_fetchers.base import Fetcher
+    from changedetectionio.distributed import job_datastore, encode
+    from changedetectionio.processors import text_json_diff, restock_diff
+
+    datastore = job_datastore(job=job, datastore_path=datastore_path)
+    uuid = job['uuid']
+    if job['watch'].get('processor') == 'restock_diff':
+        update_handler = restock_diff.perform_site_check(datastore=datastore, watch_uuid=uuid)
+    else:
+        update_handler = text_json_diff.perform_site_check(datastore=datastore, watch_uuid=uuid)
+
+    update_handler.fetcher = Fetcher()
+    for k, v in fetcher_state.items():
+        setattr(update_handler.fetcher, k, v)
+
+    try:
+        changed_detected, update_obj, contents = update_handler.run_changedetection(uuid, skip_when_checksum_same=job['skip_when_checksum_same'])
+    except Exception as e:
+        # Exceptions like Non200ErrorCodeReceived don't survive pickle (custom __init__), so encode them
+        return encode({'exception': e})
+
+    return encode({'changed_detected': changed_detected, 'update_obj': update_obj, 'contents': contents})
+
+
+def run_changedetection(update_handler, uuid, skip_when_checksum_same=True):
+    """
+    Same as update_handler.run_changedetection() but the work is done in the process pool
+    The fetch (call_browser()) must have already run in this process
+    """
+    from changedetectionio.distributed import build_job, decode
+
+    job = build_job(datastore=update_handler.datastore, uuid=uuid, skip_when_checksum_same=skip_when_checksum_same)
+    fetcher = update_handler.fetcher
+    # Only what the processors read, the screenshot and xpath data stay here
+    fetcher_state = {
+        'content': fetcher.content,
+        'headers': dict(fetcher.headers or {}),
+        'instock_data': fetcher.instock_data,
+        'status_code': fetcher.status_code,
+    }
+    if hasattr(fetcher, 'raw_content'):
+        fetcher_state['raw_content'] = fetcher.raw_content
+
+    timeout = int(os.getenv('PROCESSING_TIMEOUT_SECONDS', 300))
+    try:
+        future = get_executor().submit(_run_changedetection, job, fetcher_state, update_handler.datastore.datastore_path)
+        result = decode(future.result(timeout=timeout))
+    except concurrent.futures.TimeoutError:
+        # Not the builtin TimeoutError before Python 3.11
+        # Other checks running in the pool at the same time fail too, but the capacity comes back
+        logger.critical(f"Change detection processing for {uuid} took longer than {timeout}s, restarting the processing pool")
+        shutdown(kill=True)
+        raise Exception(f"Change detection processing did not finish within {timeout} seconds")
+    except BrokenProcessPool:
+        # A process died (out of memory?), start over with a new pool next time
+        logger.critical("Change detection processing pool is broken, restarting it")
+        shutdown()
+        raise Exception("Change detection processing process stopped unexpectedly")
+
+    update_handler.screenshot = fetcher.screenshot
+    update_handler.xpath_data = fetcher.xpath_data
+
+    if result.get('exception'):
+        e = result['exception']
+        # The screenshot and xpath data never went to the pool process, put them back for the handlers in update_worker
+        for attr in ['screenshot', 'xpath_data']:
+            if hasattr(e, attr) and getattr(e, attr) is None:
+                setattr(e, attr, getattr(fetcher, attr, None))
+        raise e
+
+    return result['changed_detected'], result['update_obj'], result['contents']
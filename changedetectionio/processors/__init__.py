@@ -2,16 +2,23 @@ from abc import abstractmethod
 import os
 import hashlib
 import re
+import time
 from copy import deepcopy
+from changedetectionio.content_fetchers import resource_blocking
 from changedetectionio.strtobool import strtobool
 from loguru import logger
 
 class difference_detection_processor():
 
+    # Watch fields to save after the check, which fetcher worked for the 'auto' fetch backend
+    auto_fetch_update = None
     browser_steps = None
     datastore = None
     fetcher = None
     screenshot = None
+    # What the processor uses from a browser fetch besides the HTML, see get_fetch_plan()
+    uses_instock_data = False
+    uses_visual_selector = False
     watch = None
     xpath_data = None
 
@@ -20,7 +27,7 @@ class difference_detection_processor():
         self.datastore = datastore
         self.watch = deepcopy(self.datastore.data['watching'].get(watch_uuid))
 
-    def call_browser(self):
+    def call_browser(self, skip_when_checksum_same=False, fetch_backend=None):
 
         # Protect against file:// access
         if re.search(r'^file://', self.watch.get('url', '').strip(), re.IGNORECASE):
@@ -32,7 +39,7 @@ class difference_detection_processor():
         url = self.watch.link
 
         # Requests, playwright, other browser via wss:// etc, fetch_extra_something
-        prefer_fetch_backend = self.watch.get('fetch_backend', 'system')
+        prefer_fetch_backend = fetch_backend or self.watch.get('fetch_backend', 'system')
 
         # Proxy ID "key"
         preferred_proxy_id = self.datastore.get_preferred_proxy_for_watch(uuid=self.watch.get('uuid'))
@@ -41,6 +48,9 @@ class difference_detection_processor():
         if not prefer_fetch_backend or prefer_fetch_backend == 'system':
             prefer_fetch_backend = self.datastore.data['settings']['application'].get('fetch_backend')
 
+        if prefer_fetch_backend == 'auto':
+            return self.call_browser_auto(skip_when_checksum_same=skip_when_checksum_same)
+
         # In the case that the preferred fetcher was a browser config with custom connection URL..
         # @todo - on save watch, if its extra_browser_ then it should be obvious it will use playwright (like if its requests now..)
         custom_browser_connection_url = None
@@ -61,14 +71,8 @@ class difference_detection_processor():
         # Grab the right kind of 'fetcher', (playwright, requests, etc)
         from changedetectionio import content_fetchers
         if hasattr(content_fetchers, prefer_fetch_backend):
-            # @todo TEMPORARY HACK - SWITCH BACK TO PLAYWRIGHT FOR BROWSERSTEPS
-            if prefer_fetch_backend == 'html_webdriver' and self.watch.has_browser_steps:
-                # This is never supported in selenium anyway
-                logger.warning("Using playwright fetcher override for possible puppeteer request in browsersteps, because puppetteer:browser steps is incomplete.")
-                from changedetectionio.content_fetchers.playwright import fetcher as playwright_fetcher
-                fetcher_obj = playwright_fetcher
-            else:
-                fetcher_obj = getattr(content_fetchers, prefer_fetch_backend)
+            # Browser Steps run in Playwright and Puppeteer (FAST_PUPPETEER_CHROME_FETCHER), never in selenium
+            fetcher_obj = getattr(content_fetchers, prefer_fetch_backend)
         else:
             # What it referenced doesnt exist, Just use a default
             fetcher_obj = getattr(content_fetchers, "html_requests")
@@ -91,9 +95,11 @@ class difference_detection_processor():
         if self.watch.has_browser_steps:
             self.fetcher.browser_steps = self.watch.get('browser_steps', [])
             self.fetcher.browser_steps_screenshot_path = os.path.join(self.datastore.datastore_path, self.watch.get('uuid'))
+            self.fetcher.browser_session_path = self.watch.browser_session_file
 
         # Tweak the base config with the per-watch ones
-        request_headers = self.watch.get('headers', [])
+        # A copy, the fetchers add to it (User-Agent, conditional request headers) and the 'auto' backend can fetch twice
+        request_headers = dict(self.watch.get('headers') or {})
         request_headers.update(self.datastore.get_all_base_headers())
         request_headers.update(self.datastore.get_all_headers_in_textfile_for_watch(uuid=self.watch.get('uuid')))
 
@@ -103,6 +109,14 @@ class difference_detection_processor():
         if 'Accept-Encoding' in request_headers and "br" in request_headers['Accept-Encoding']:
             request_headers['Accept-Encoding'] = request_headers['Accept-Encoding'].replace(', br', '')
 
+        # Ask the server to reply "304 Not Modified" when nothing changed since the last successful check
+        # Only when the check could be skipped anyway on the same checksum (not on a manual recheck or after editing)
+        if skip_when_checksum_same and self.fetcher.supports_conditional_requests and self.watch.get('use_conditional_requests'):
+            if self.watch.get('remote_etag'):
+                request_headers['If-None-Match'] = self.watch.get('remote_etag')
+            if self.watch.get('remote_last_modified'):
+                request_headers['If-Modified-Since'] = self.watch.get('remote_last_modified')
+
         timeout = self.datastore.data['settings']['requests'].get('timeout')
 
         request_body = self.watch.get('body')
@@ -116,21 +130,159 @@ class difference_detection_processor():
         elif system_webdriver_delay is not None:
             self.fetcher.render_extract_delay = system_webdriver_delay
 
+        self.fetcher.content_ready_strategy = self.watch.get('content_ready_strategy') or 'fixed'
+        self.fetcher.fetch_plan = self.get_fetch_plan(skip_when_checksum_same=skip_when_checksum_same)
+        self.fetcher.block_rules = resource_blocking.get_rules(application_settings=self.datastore.data['settings']['application'], watch=self.watch)
+
         if self.watch.get('webdriver_js_execute_code') is not None and self.watch.get('webdriver_js_execute_code').strip():
             self.fetcher.webdriver_js_execute_code = self.watch.get('webdriver_js_execute_code')
 
         # Requests for PDF's, images etc should be passwd the is_binary flag
         is_binary = self.watch.is_pdf
 
-        # And here we go! call the right browser with browser-specific settings
-        self.fetcher.run(url, timeout, request_headers, request_body, request_method, ignore_status_codes, self.watch.get('include_filters'),
-                    is_binary=is_binary)
+        def fetch():
+            # And here we go! call the right browser with browser-specific settings
+            self.fetcher.run(url, timeout, request_headers, request_body, request_method, ignore_status_codes, self.watch.get('include_filters'),
+                        is_binary=is_binary)
 
-        #@todo .quit here could go on close object, so we can run JS if change-detected
-        self.fetcher.quit()
+            #@todo .quit here could go on close object, so we can run JS if change-detected
+            self.fetcher.quit()
+            return self.fetcher
+
+        # Watches with exactly the same fetch inputs that are checked close together can share the one fetch
+        coalesce_fetch_seconds = self.datastore.data['settings']['requests'].get('coalesce_fetch_seconds', 0)
+        if coalesce_fetch_seconds:
+            from changedetectionio.content_fetchers.coalesce import fetch_coalescer, fetch_signature
+            signature = fetch_signature(fetcher_obj=fetcher_obj,
+                                        proxy_url=proxy_url,
+                                        custom_browser_connection_url=custom_browser_connection_url,
+                                        url=url,
+                                        request_headers=request_headers,
+                                        request_body=request_body,
+                                        request_method=request_method,
+                                        ignore_status_codes=ignore_status_codes,
+                                        is_binary=is_binary,
+                                        browser_steps=self.fetcher.browser_steps,
+                                        webdriver_js_execute_code=self.fetcher.webdriver_js_execute_code,
+                                        render_extract_delay=self.fetcher.render_extract_delay,
+                                        content_ready_strategy=self.fetcher.content_ready_strategy,
+                                        fetch_plan=self.fetcher.fetch_plan,
+                                        block_rules=self.fetcher.block_rules
+                                        )
+            fetch_coalescer.set_watch_signature(self.watch.get('uuid'), signature)
+            self.fetcher = fetch_coalescer.fetch(signature=signature, window_seconds=coalesce_fetch_seconds, fetch_function=fetch)
+        else:
+            fetch()
 
         # After init, call run_changedetection() which will do the actual change-detection
 
+    def get_fetch_plan(self, skip_when_checksum_same):
+        """
+        What the browser fetchers should collect besides the HTML, each of these costs browser CPU and websocket transfer.
+        The Visual Selector data (and its screenshot) is only refreshed when the user asked for the check (recheck
+        button, saving the watch), when there is none yet or once it is older than VISUALSELECTOR_DATA_MAX_AGE_SECONDS.
+        :return: dict of screenshot, xpath_data and instock_data True/False
+        """
+        def age(filename):
+            fname = os.path.join(self.datastore.datastore_path, self.watch.get('uuid'), filename)
+            return time.time() - os.path.getmtime(fname) if os.path.isfile(fname) else None
+
+        user_asked = not skip_when_checksum_same
+        xpath_data = False
+        if self.uses_visual_selector:
+            elements_age = age('elements.json')
+            xpath_data = user_asked or elements_age is None or elements_age > int(os.getenv('VISUALSELECTOR_DATA_MAX_AGE_SECONDS', 86400))
+
+        # 0 (default) is a new screenshot with every check
+        screenshot_max_age = int(os.getenv('SCREENSHOT_MAX_AGE_SECONDS', 0))
+        screenshot_file = self.watch.get_screenshot()
+        screenshot_age = time.time() - os.path.getmtime(screenshot_file) if screenshot_file else None
+        screenshot = bool(xpath_data or user_asked or self.watch.get('notification_screenshot') or not screenshot_max_age
+                          or screenshot_age is None or screenshot_age > screenshot_max_age)
+
+        return {'instock_data': self.uses_instock_data, 'screenshot': screenshot, 'xpath_data': xpath_data}
+
+    def call_browser_auto(self, skip_when_checksum_same=False):
+        """
+        The 'auto' fetch backend, use the Basic fast Plaintext/HTTP Client and only when the content is not good enough
+        fetch it again with Chrome. Which one worked is remembered for the watch, watches that needed Chrome try the
+        cheaper fetcher again every AUTO_FETCH_REPROBE_CHECKS checks in case the site changed.
+        """
+        from changedetectionio import content_fetchers
+
+        uuid = self.watch.get('uuid')
+        tier = self.watch.get('auto_fetch_tier') or 'html_requests'
+        checks_since_probe = self.watch.get('auto_fetch_checks_since_probe', 0) + 1
+
+        if self.watch.has_browser_steps:
+            tier = 'html_webdriver'
+        elif tier == 'html_webdriver' and checks_since_probe >= int(os.getenv('AUTO_FETCH_REPROBE_CHECKS', 20)):
+            logger.debug(f"Watch {uuid} trying the plaintext/HTTP fetcher again after {checks_since_probe} checks with Chrome")
+            tier = 'html_requests'
+
+        if tier == 'html_requests':
+            try:
+                self.call_browser(skip_when_checksum_same=skip_when_checksum_same, fetch_backend='html_requests')
+                reason = self.browser_needed_reason()
+            # Often bot protection or a page that only renders in a browser
+            except content_fetchers.exceptions.Non200ErrorCodeReceived as e:
+                if e.status_code != 403:
+                    raise
+                reason = f"{e.status_code} reply"
+            except content_fetchers.exceptions.EmptyReply:
+                reason = "empty reply"
+
+            if not reason:
+                self.auto_fetch_update = {'auto_fetch_tier': 'html_requests', 'auto_fetch_checks_since_probe': 0}
+                return
+
+            logger.info(f"Watch {uuid} needs Chrome/Javascript to fetch, {reason}")
+            checks_since_probe = 0
+
+        self.call_browser(skip_when_checksum_same=skip_when_checksum_same, fetch_backend='html_webdriver')
+        self.auto_fetch_update = {'auto_fetch_tier': 'html_webdriver', 'auto_fetch_checks_since_probe': checks_since_probe}
+
+    def browser_needed_reason(self):
+        """
+        Does the page fetched by the Basic fast Plaintext/HTTP Client need a real browser? (the 'auto' fetch backend)
+        :return: Why, or None when the content looks usable
+        """
+        from changedetectionio import html_tools
+
+        content_type = self.fetcher.get_all_headers().get('content-type', '').lower()
+        content = self.fetcher.content or ''
+        if 'html' not in content_type and not content.lstrip()[:100].lower().startswith(('<!doctype html', '<html')):
+            # JSON, RSS, plain text etc are the same with or without a browser
+            return None
+
+        text = html_tools.html_to_text(html_content=content).strip()
+        if not text:
+            return "no text found"
+
+        # Almost no text and an empty application container or a "please enable JavaScript" message
+        if len(text) < 500:
+            if re.search(r'<div[^>]+id=["\']?(root|app|__next|__nuxt)["\']?[^>]*>\s*</div>', content, re.IGNORECASE):
+                return "empty javascript application container"
+            if re.search(r'<noscript[^>]*>[^<]*(enable|requires?|turn on)[^<]*javascript', content, re.IGNORECASE):
+                return "page asks to enable javascript"
+
+        include_filters = list(dict.fromkeys(self.watch.get('include_filters', []) +
+                                             self.datastore.get_tag_overrides_for_watch(uuid=self.watch.get('uuid'), attr='include_filters')))
+        include_filters = [f for f in include_filters if f.strip() and not f.startswith(('json:', 'jq:'))]
+        if include_filters:
+            for filter_rule in include_filters:
+                if filter_rule[0] == '/' or filter_rule.startswith('xpath:'):
+                    found = html_tools.xpath_filter(xpath_filter=filter_rule.replace('xpath:', ''), html_content=content)
+                elif filter_rule.startswith('xpath1:'):
+                    found = html_tools.xpath1_filter(xpath_filter=filter_rule.replace('xpath1:', ''), html_content=content)
+                else:
+                    found = html_tools.include_filters(include_filters=filter_rule, html_content=content)
+                if found.strip():
+                    return None
+            return "filters not found"
+
+        return None
+
     @abstractmethod
     def run_changedetection(self, uuid, skip_when_checksum_same=True):
         update_obj = {'last_notification_error': False, 'last_error': False}
@@ -18,6 +18,7 @@ class UnableToExtractRestockData(Exception):
 
 class perform_site_check(difference_detection_processor):
     screenshot = None
+    uses_instock_data = True
     xpath_data = None
 
     def run_changedetection(self, uuid, skip_when_checksum_same=True):
@@ -2,13 +2,14 @@
 
 import hashlib
 import json
-import os
 import re
 import urllib3
 
 from . import difference_detection_processor
 from ..html_tools import PERL_STYLE_REGEX, cdata_in_document_to_text
-from changedetectionio import html_tools, content_fetchers
+from changedetectionio import html_tools, content_fetchers, pdf_to_html
+# Backward compatible re-export, it used to be defined here
+from changedetectionio.pdf_to_html import PDFToHTMLToolNotFound  # noqa: F401
 from changedetectionio.blueprint.price_data_follower import PRICE_DATA_TRACK_ACCEPT, PRICE_DATA_TRACK_REJECT
 import changedetectionio.content_fetchers
 from copy import deepcopy
@@ -25,14 +26,10 @@ class FilterNotFoundInResponse(ValueError):
         ValueError.__init__(self, msg)
 
 
-class PDFToHTMLToolNotFound(ValueError):
-    def __init__(self, msg):
-        ValueError.__init__(self, msg)
-
-
 # Some common stuff here that can be moved to a base class
 # (set_proxy_from_list)
 class perform_site_check(difference_detection_processor):
+    uses_visual_selector = True
 
     def run_changedetection(self, uuid, skip_when_checksum_same=True):
         changed_detected = False
@@ -90,20 +87,8 @@ class perform_site_check(difference_detection_processor):
 
         inline_pdf = self.fetcher.get_all_headers().get('content-disposition', '') and '%PDF-1' in self.fetcher.content[:10]
         if watch.is_pdf or 'application/pdf' in self.fetcher.get_all_headers().get('content-type', '').lower() or inline_pdf:
-            from shutil import which
-            tool = os.getenv("PDF_TO_HTML_TOOL", "pdftohtml")
-            if not which(tool):
-                raise PDFToHTMLToolNotFound("Command-line `{}` tool was not found in system PATH, was it installed?".format(tool))
-
-            import subprocess
-            proc = subprocess.Popen(
-                [tool, '-stdout', '-', '-s', 'out.pdf', '-i'],
-                stdout=subprocess.PIPE,
-                stdin=subprocess.PIPE)
-            proc.stdin.write(self.fetcher.raw_content)
-            proc.stdin.close()
-            self.fetcher.content = proc.stdout.read().decode('utf-8')
-            proc.wait(timeout=60)
+            # Converted once per PDF checksum, kept with the watch for rechecks and filter changes
+            self.fetcher.content = pdf_to_html.convert(self.fetcher.raw_content, cache_directory=watch.watch_data_dir)
 
             # Add a little metadata so we know if the file changes (like if an image changes, but the text is the same
             # @todo may cause problems with non-UTF8?
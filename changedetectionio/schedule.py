@@ -0,0 +1,168 @@
+import datetime
+import functools
+import re
+
+import pytz
+from croniter import croniter
+from loguru import logger
+
+# Cron expressions and "only check during" time windows for watches (and tags), in the watch's timezone or the
+# server local time. The results only depend on the arguments so they are cached, and the ticker uses the next run
+# time kept on each watch (Watch.cached_next_check_time()) which is only worked out again after the watch changed.
+
+day_names = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def get_schedule(watch):
+    """
+    :param watch: Watch or tag
+    :return: dict of the cron expression, time window and timezone or None when it has neither
+    """
+    if watch.get('schedule_cron') or watch.get('schedule_time_window'):
+        return {'cron': watch.get('schedule_cron') or None,
+                'time_window': watch.get('schedule_time_window') or None,
+                'timezone': watch.get('schedule_timezone') or None}
+    return None
+
+
+def get_timezone(name):
+    """
+    :return: pytz timezone, or None for the server local time
+    """
+    if not name:
+        return None
+    return pytz.timezone(name.strip())
+
+
+def _localize(naive_dt, tz):
+    return tz.localize(naive_dt) if tz else naive_dt
+
+
+def _parse_days(text):
+    days = set()
+    for part in text.split(','):
+        if '-' in part:
+            first, last = [day_names.index(d) for d in part.split('-')]
+            # Can wrap around the week, 'fri-mon'
+            days.update(d % 7 for d in range(first, first + ((last - first) % 7) + 1))
+        else:
+            days.add(day_names.index(part))
+    return days
+
+
+@functools.lru_cache(maxsize=1000)
+def parse_time_window(text):
+    """
+    'mon-fri 09:00-18:00, sat 10:00-14:00' or just '08:00-20:00' for every day, '22:00-06:00' continues into the next day
+    :return: tuple of (set of weekdays (0 is Monday), start minute of the day, end minute of the day)
+    :raises ValueError: when it's not understood
+    """
+    windows = []
+    for part in [p.strip().lower() for p in re.split(r'(?<=\d)\s*[,;\n]', text) if p.strip()]:
+        m = re.fullmatch(r'(?:([a-z,\-]+)\s+)?(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})', part)
+        if not m:
+            raise ValueError(f"'{part}' should look like 'mon-fri 09:00-18:00'")
+        try:
+            days = _parse_days(m.group(1)) if m.group(1) else set(range(7))
+        except ValueError:
+            raise ValueError(f"'{m.group(1)}' should be days like 'mon-fri' or 'sat,sun'")
+        start = int(m.group(2)) * 60 + int(m.group(3))
+        end = int(m.group(4)) * 60 + int(m.group(5))
+        if start >= 24 * 60 or end > 24 * 60 or int(m.group(3)) > 59 or int(m.group(5)) > 59:
+            raise ValueError(f"'{part}' is not a valid time")
+        windows.append((frozenset(days), start, end))
+
+    if not windows:
+        raise ValueError("No time window found")
+    return tuple(windows)
+
+
+def in_time_window(windows, dt):
+    minute = dt.hour * 60 + dt.minute
+    for days, start, end in windows:
+        if start <= end:
+            if dt.weekday() in days and start <= minute < end:
+                return True
+        # Overnight, from the start on one of the days until the end on the next morning
+        elif (dt.weekday() in days and minute >= start) or ((dt.weekday() - 1) % 7 in days and minute < end):
+            return True
+    return False
+
+
+def next_in_time_window(windows, timestamp, tz):
+    """
+    :return: timestamp itself when it's inside one of the windows, otherwise when the next window opens
+    """
+    dt = datetime.datetime.fromtimestamp(timestamp, tz)
+    if in_time_window(windows, dt):
+        return timestamp
+
+    starts = []
+    for offset in range(0, 8):
+        day = dt.date() + datetime.timedelta(days=offset)
+        for days, start, end in windows:
+            if day.weekday() in days:
+                start_dt = _localize(datetime.datetime.combine(day, datetime.time(start // 60, start % 60)), tz)
+                if start_dt.timestamp() > timestamp:
+                    starts.append(start_dt.timestamp())
+        if starts:
+            break
+
+    return min(starts) if starts else timestamp
+
+
+def validate_cron(expression):
+    if not croniter.is_valid(expression.strip()):
+        raise ValueError(f"'{expression}' is not a valid cron expression")
+
+
+@functools.lru_cache(maxsize=1000)
+def cron_interval_seconds(expression, timezone=None):
+    """
+    Average time between the next runs of a cron expression, used wherever a single recheck interval is needed
+    :return: seconds or None when the expression or timezone is not valid
+    """
+    try:
+        runs = croniter(expression.strip(), datetime.datetime.now(get_timezone(timezone)))
+        first = runs.get_next(float)
+        for n in range(10):
+            last = runs.get_next(float)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Invalid schedule '{expression}' '{timezone}' - {str(e)}")
+        return None
+    return max(1, int((last - first) / 10))
+
+
+@functools.lru_cache(maxsize=20000)
+def next_scheduled_time(cron, time_window, timezone, last_checked, interval_seconds):
+    """
+    When a watch that was last checked at last_checked should be checked again
+
+    :param cron: Cron expression or None
+    :param time_window: Time window text (see parse_time_window()) or None
+    :param interval_seconds: Check again this many seconds after last_checked, None to use the cron expression
+    :return: timestamp or None when the schedule is not valid (set by the API or an older version)
+    """
+    try:
+        tz = get_timezone(timezone)
+        windows = parse_time_window(time_window.strip()) if time_window else None
+        if cron and interval_seconds is None:
+            runs = croniter(cron.strip(), datetime.datetime.fromtimestamp(last_checked, tz))
+            next_time = runs.get_next(float)
+            # The next run of the cron expression that is also inside the time window
+            for n in range(1000):
+                if not windows or in_time_window(windows, datetime.datetime.fromtimestamp(next_time, tz)):
+                    break
+                next_time = runs.get_next(float)
+            else:
+                logger.warning(f"Cron expression '{cron}' never runs during '{time_window}'")
+        else:
+            next_time = last_checked + interval_seconds
+
+        if windows:
+            next_time = next_in_time_window(windows, next_time, tz)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Invalid schedule '{cron}' '{time_window}' '{timezone}' - {str(e)}")
+        return None
+
+    return int(next_time)
@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+
+from loguru import logger
+
+# Screenshots arrive as JPEG from the Chrome fetchers (PNG from WebDriver), they are stored re-encoded in a smaller
+# format (SCREENSHOT_FORMAT), not written again when the browser sent exactly the same picture, and the main screenshot
+# gets a small thumbnail of the top of the page for the watch list.
+
+# Older versions always wrote 'last-screenshot.png' (with JPEG data in it)
+extensions = ['webp', 'avif', 'jpeg', 'png']
+mimetypes = {'avif': 'image/avif', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+# The largest WebP picture possible, very long pages are kept as JPEG
+WEBP_MAX_DIMENSION = 16383
+THUMBNAIL_SIZE = (320, 240)
+
+
+def storage_format():
+    """
+    :return: SCREENSHOT_FORMAT (webp, avif or jpeg), or the next best one this Pillow can write
+    """
+    from PIL import features
+
+    image_format = os.getenv('SCREENSHOT_FORMAT', 'webp').strip().lower()
+    if image_format == 'avif' and not features.check('avif'):
+        image_format = 'webp'
+    if image_format == 'webp' and not features.check('webp'):
+        image_format = 'jpeg'
+    if image_format not in ('avif', 'jpeg', 'webp'):
+        image_format = 'jpeg'
+    return image_format
+
+
+def find(directory, name):
+    """
+    :param name: 'last-screenshot', 'last-error-screenshot' or 'last-screenshot-thumbnail'
+    :return: Path of the screenshot in whichever format it was stored, None when there is none
+    """
+    for extension in extensions:
+        path = os.path.join(directory, f"{name}.{extension}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def delete(directory, name):
+    for path in [os.path.join(directory, f"{name}.{extension}") for extension in extensions + ['md5']] + [os.path.join(directory, f"{name}-attachment.jpeg")]:
+        if os.path.isfile(path):
+            os.unlink(path)
+
+
+def _write(path, data):
+    # The UI could be reading the old one
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encode(image, image_format):
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), quality=int(os.getenv('SCREENSHOT_STORE_QUALITY', 72)))
+    return buffer.getvalue()
+
+
+def save(directory, name, screenshot: bytes, thumbnail=False):
+    """
+    Store the screenshot (JPEG/PNG bytes from the fetcher) in the storage format, with a thumbnail when asked
+    :return: False when it was the same picture as the one already stored (only its time is updated)
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    checksum = hashlib.md5(screenshot).hexdigest()
+    checksum_path = os.path.join(directory, f"{name}.md5")
+    current = find(directory, name)
+    if current and os.path.isfile(checksum_path):
+        with open(checksum_path, 'r') as f:
+            if f.read().strip() == checksum:
+                # Same picture, but it's still the screenshot of this check
+                os.utime(current)
+                return False
+
+    try:
+        image = Image.open(io.BytesIO(screenshot))
+        image_format = storage_format()
+        if image_format == 'webp' and max(image.size) > WEBP_MAX_DIMENSION:
+            image_format = 'jpeg'
+
+        if image.format == image_format.upper():
+            data = screenshot
+        else:
+            data = _encode(image, image_format)
+    except (Image.DecompressionBombError, UnidentifiedImageError, OSError) as e:
+        # Extremely long page (more pixels than Pillow will open) or not a picture Pillow can read, keep it as it came
+        logger.warning(f"Could not convert screenshot {name} in {directory}, storing it as received - {str(e)}")
+        image = None
+        image_format = 'png' if screenshot.startswith(b'\x89PNG') else 'jpeg'
+        data = screenshot
+
+    path = os.path.join(directory, f"{name}.{image_format}")
+    _write(path, data)
+    for extension in extensions:
+        if extension != image_format and os.path.isfile(os.path.join(directory, f"{name}.{extension}")):
+            os.unlink(os.path.join(directory, f"{name}.{extension}"))
+
+    if thumbnail:
+        delete(directory, f"{name}-thumbnail")
+    if thumbnail and image:
+        # The top of the page in the shape of the thumbnail, full page screenshots are very long
+        width, height = image.size
+        top = image.crop((0, 0, width, min(height, int(width * THUMBNAIL_SIZE[1] / THUMBNAIL_SIZE[0]))))
+        top.thumbnail(THUMBNAIL_SIZE)
+        thumbnail_format = storage_format()
+        _write(os.path.join(directory, f"{name}-thumbnail.{thumbnail_format}"), _encode(top, thumbnail_format))
+
+    with open(checksum_path, 'w') as f:
+        f.write(checksum)
+
+    logger.debug(f"Saved screenshot {path} ({len(screenshot)} bytes received, {len(data)} bytes stored)")
+    return True
+
+
+def as_jpeg(directory, name):
+    """
+    The screenshot as JPEG, for notification attachments (many email clients don't show WebP or AVIF)
+    :return: Path of the screenshot when it is JPEG/PNG already, otherwise of a JPEG copy made from it, None when there is none
+    """
+    from PIL import Image
+
+    path = find(directory, name)
+    if not path or path.endswith(('.jpeg', '.png')):
+        return path
+
+    jpeg_path = os.path.join(directory, f"{name}-attachment.jpeg")
+    if not os.path.isfile(jpeg_path) or os.path.getmtime(jpeg_path) < os.path.getmtime(path):
+        with Image.open(path) as image:
+            _write(jpeg_path, _encode(image, 'jpeg'))
+    return jpeg_path
@@ -0,0 +1,241 @@
+import bisect
+import hashlib
+import json
+import os
+import socket
+import time
+from copy import deepcopy
+
+from loguru import logger
+
+# Several instances sharing one (network mounted) datastore directory, each one checks only the watches that hash to
+# it on a consistent hash ring of the instances that are alive. Any instance can serve the UI and the API.
+#
+# Membership is a heartbeat file per instance in <datastore>/instances/, an instance that stops updating its file is
+# dropped from the ring after SHARD_MEMBER_TIMEOUT_SECONDS and its watches move to the others (and only those,
+# that is what the consistent hashing is for). url-watches.json is written with merge_shared_json() so that the
+# instances don't overwrite each other's changes.
+
+
+def from_env(datastore_path):
+    """
+    :return: shard_membership when SHARD_INSTANCE_ID (or SHARDING=true, using the hostname) is set, otherwise None
+    """
+    from changedetectionio.strtobool import strtobool
+
+    instance_id = os.getenv('SHARD_INSTANCE_ID')
+    if not instance_id and strtobool(os.getenv('SHARDING', 'false')):
+        instance_id = socket.gethostname()
+    if not instance_id:
+        return None
+
+    return shard_membership(datastore_path=datastore_path,
+                            instance_id=instance_id,
+                            heartbeat_seconds=int(os.getenv('SHARD_HEARTBEAT_SECONDS', 10)),
+                            member_timeout_seconds=int(os.getenv('SHARD_MEMBER_TIMEOUT_SECONDS', 60)))
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class hash_ring():
+    """
+    Consistent hash ring, each node is placed at many points so the watches are spread evenly
+    """
+
+    def __init__(self, nodes, virtual_nodes=100):
+        self.nodes = sorted(set(nodes))
+        self.points = sorted((_hash(f"{node}#{n}"), node) for node in self.nodes for n in range(virtual_nodes))
+        self.keys = [p[0] for p in self.points]
+
+    def get_node(self, key):
+        if not self.points:
+            return None
+        i = bisect.bisect(self.keys, _hash(key)) % len(self.points)
+        return self.points[i][1]
+
+
+class shard_membership():
+
+    def __init__(self, datastore_path, instance_id, heartbeat_seconds=10, member_timeout_seconds=60):
+        self.instance_id = instance_id
+        self.heartbeat_seconds = heartbeat_seconds
+        self.member_timeout_seconds = member_timeout_seconds
+        self.instances_path = os.path.join(datastore_path, 'instances')
+        self.last_heartbeat = 0
+        # Until the first heartbeat this instance is on its own
+        self.ring = hash_ring([instance_id])
+        logger.info(f"Sharding enabled, this is instance '{instance_id}'")
+
+    @property
+    def members(self):
+        return self.ring.nodes
+
+    def heartbeat(self, force=False):
+        """
+        Called from the ticker, writes this instance's heartbeat and rebuilds the ring when instances came or went
+        """
+        if not force and time.time() - self.last_heartbeat < self.heartbeat_seconds:
+            return
+        self.last_heartbeat = time.time()
+
+        os.makedirs(self.instances_path, exist_ok=True)
+        own_file = os.path.join(self.instances_path, f"{self.instance_id}.json")
+        with open(own_file + '.tmp', 'w') as f:
+            json.dump({'instance_id': self.instance_id, 'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time()}, f)
+        os.replace(own_file + '.tmp', own_file)
+
+        alive = {self.instance_id}
+        for filename in os.listdir(self.instances_path):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.instances_path, filename)) as f:
+                    member = json.load(f)
+            except (OSError, ValueError):
+                # Being written right now or removed, it will be there again next time
+                continue
+            # The time in the file not the file modification time, the clock of the file server may be different
+            if time.time() - member.get('time', 0) < self.member_timeout_seconds:
+                alive.add(member.get('instance_id'))
+
+        if sorted(alive) != self.members:
+            logger.info(f"Shard members changed from {self.members} to {sorted(alive)}, rebalancing watches")
+            self.ring = hash_ring(alive)
+
+    def leave(self):
+        """
+        On shutdown, so the others take over the watches straight away instead of after the timeout
+        """
+        try:
+            os.unlink(os.path.join(self.instances_path, f"{self.instance_id}.json"))
+        except FileNotFoundError:
+            pass
+
+    def owns(self, uuid):
+        return self.ring.get_node(uuid) == self.instance_id
+
+    def get_state(self, uuids):
+        return {
+            'instance_id': self.instance_id,
+            'members': self.members,
+            'owned_watches': len([uuid for uuid in uuids if self.owns(uuid)]),
+        }
+
+
+_missing = object()
+
+
+def _pick(k, base, local, disk):
+    # The local value when it changed since base (changed here), otherwise the one on disk
+    local_value = local.get(k, _missing)
+    return local_value if local_value != base.get(k, _missing) else disk.get(k, _missing)
+
+
+def _merge_fields(base, local, disk):
+    """
+    Three-way merge of two dicts, per key, a key removed here or on disk is removed
+    """
+    merged = {}
+    for k in set(base) | set(local) | set(disk):
+        value = _pick(k, base, local, disk)
+        if value is not _missing:
+            merged[k] = value
+    return merged
+
+
+def _merge_items(base, local, disk):
+    """
+    Per watch (or tag) UUID, added/removed like _merge_fields(), when it's in all three the fields are merged
+    """
+    merged = {}
+    for uuid in set(base) | set(local) | set(disk):
+        if uuid in base and uuid in local and uuid in disk:
+            merged[uuid] = _merge_fields(base[uuid], local[uuid], disk[uuid])
+            continue
+        value = _pick(uuid, base, local, disk)
+        if value is not _missing:
+            merged[uuid] = value
+    return merged
+
+
+def merge_shared_json(base, local, disk):
+    """
+    What to write to url-watches.json when other instances write to it too
+
+    :param base: What this instance last wrote or read (JSON types)
+    :param local: What this instance has now
+    :param disk: What is in the file now
+    :return: merged data, an instance only checks its own watches so a watch field is rarely changed in two places
+    """
+    merged = _merge_fields({k: v for k, v in base.items() if k not in ['watching', 'settings']},
+                           {k: v for k, v in local.items() if k not in ['watching', 'settings']},
+                           {k: v for k, v in disk.items() if k not in ['watching', 'settings']})
+    merged['watching'] = _merge_items(base.get('watching', {}), local.get('watching', {}), disk.get('watching', {}))
+
+    merged['settings'] = {}
+    for section in set(local.get('settings', {})) | set(disk.get('settings', {})):
+        s_base = base.get('settings', {}).get(section, {})
+        s_local = local.get('settings', {}).get(section, {})
+        s_disk = disk.get('settings', {}).get(section, {})
+        merged['settings'][section] = _merge_fields(s_base, s_local, s_disk)
+        if section == 'application':
+            merged['settings'][section]['tags'] = _merge_items(s_base.get('tags', {}), s_local.get('tags', {}), s_disk.get('tags', {}))
+
+    return merged
+
+
+def _unchanged(current, snapshot_value):
+    # Is the value in memory still the one in the snapshot (JSON types)
+    try:
+        return json.loads(json.dumps(current)) == snapshot_value
+    except (TypeError, ValueError):
+        return False
+
+
+def _apply_fields(memory, snapshot, merged, skip=()):
+    for k, v in merged.items():
+        if k in skip or v == snapshot.get(k):
+            continue
+        # Changed here after the snapshot was taken, keep it, it's written with the next sync
+        if not _unchanged(memory.get(k), snapshot.get(k)):
+            continue
+        memory[k] = deepcopy(v)
+
+
+def apply_shared_json(memory, snapshot, merged, new_watch):
+    """
+    Take what the other instances changed into the data in memory, but not over what was changed in memory since
+    the snapshot was taken
+
+    :param memory: The datastore data
+    :param snapshot: JSON copy of memory when the sync started (the 'local' of merge_shared_json())
+    :param merged: What url-watches.json has now
+    :param new_watch: Makes the Watch.model of a watch added by another instance, new_watch(uuid, watch_dict)
+    """
+    watching = memory['watching']
+    merged_watching = merged.get('watching', {})
+    for uuid, watch in merged_watching.items():
+        if uuid not in snapshot['watching']:
+            if uuid not in watching:
+                watching[uuid] = new_watch(uuid, deepcopy(watch))
+        elif uuid in watching:
+            _apply_fields(watching[uuid], snapshot['watching'][uuid], watch)
+    for uuid in snapshot['watching'].keys() - merged_watching.keys():
+        logger.info(f"Watch {uuid} was deleted by another instance")
+        watching.pop(uuid, None)
+
+    for section, values in merged.get('settings', {}).items():
+        _apply_fields(memory['settings'].setdefault(section, {}), snapshot['settings'].get(section, {}), values, skip=['tags'])
+
+    tags = memory['settings']['application'].setdefault('tags', {})
+    snapshot_tags = snapshot['settings']['application'].get('tags', {})
+    merged_tags = merged.get('settings', {}).get('application', {}).get('tags', {})
+    for uuid, tag in merged_tags.items():
+        if uuid not in snapshot_tags:
+            tags.setdefault(uuid, deepcopy(tag))
+        elif uuid in tags:
+            _apply_fields(tags[uuid], snapshot_tags[uuid], tag)
+    for uuid in snapshot_tags.keys() - merged_tags.keys():
+        tags.pop(uuid, None)
@@ -344,6 +344,7 @@ $(document).ready(function () {
     $('ul#browser_steps li .control .clear').click(function (element) {
         $("select", $(this).closest('li')).val("Choose one").change();
         $(":text", $(this).closest('li')).val('');
+        $(":checkbox", $(this).closest('li')).prop('checked', false);
     });
 
 
@@ -362,6 +363,7 @@ $(document).ready(function () {
                 $("select", $(this)).val($('select', next).val());
                 $('input', this)[0].value = $(n)[0].value;
                 $('input', this)[1].value = $(n)[1].value;
+                $(':checkbox', this).prop('checked', $(':checkbox', next).prop('checked'));
                 // Triggers reconfiguring the field based on the system config
                 $("select", $(this)).change();
             }
@@ -5,6 +5,8 @@ from flask import (
 )
 
 from . model import App, Watch
+from . import schedule as schedule_lib
+from . import sharding
 from copy import deepcopy, copy
 from os import path, unlink
 from threading import Lock
@@ -34,6 +36,9 @@ class ChangeDetectionStore:
     # For when we edit, we should write to disk
     needs_write_urgent = False
 
+    # Bumped when the schedule of a tag could have changed, the watches then work out their next check time again
+    schedule_revision = 0
+
     __version_check = True
 
     def __init__(self, datastore_path="/datastore", include_default_watches=True, version_tag="0.0.0"):
@@ -49,6 +54,11 @@ class ChangeDetectionStore:
         # Base definition for all watchers
         # deepcopy part of #569 - not sure why its needed exactly
         self.generic_definition = deepcopy(Watch.model(datastore_path = datastore_path, default={}))
+        # Other instances check some of the watches and write to the same url-watches.json (see sharding.py)
+        self.shard = sharding.from_env(datastore_path)
+        # What url-watches.json had when this instance last read or wrote it, and its mtime/size then
+        self.shared_json_base = {}
+        self.shared_json_last_version = None
 
         if path.isfile('changedetectionio/source.txt'):
             with open('changedetectionio/source.txt') as f:
@@ -60,6 +70,8 @@ class ChangeDetectionStore:
             # @todo retest with ", encoding='utf-8'"
             with open(self.json_store_path) as json_file:
                 from_disk = json.load(json_file)
+                if self.shard:
+                    self.shared_json_base = deepcopy(from_disk)
 
                 # @todo isnt there a way todo this dict.update recursively?
                 # Problem here is if the one on the disk is missing a sub-struct, it wont be present anymore.
@@ -244,8 +256,10 @@ class ChangeDetectionStore:
         import pathlib
 
         self.__data['watching'][uuid].update({
+                'adaptive_recheck_seconds': None,
                 'browser_steps_last_error_step' : None,
                 'check_count': 0,
+                'consecutive_errors': 0,
                 'fetch_time' : 0.0,
                 'has_ldjson_price_data': None,
                 'in_stock': None,
@@ -255,6 +269,8 @@ class ChangeDetectionStore:
                 'last_viewed': 0,
                 'previous_md5': False,
                 'previous_md5_before_filters': False,
+                'remote_etag': None,
+                'remote_last_modified': None,
                 'remote_server_reply': None,
                 'track_ldjson_price_data': None,
             })
@@ -369,9 +385,8 @@ class ChangeDetectionStore:
 
     def visualselector_data_is_ready(self, watch_uuid):
         output_path = "{}/{}".format(self.datastore_path, watch_uuid)
-        screenshot_filename = "{}/last-screenshot.png".format(output_path)
         elements_index_filename = "{}/elements.json".format(output_path)
-        if path.isfile(screenshot_filename) and  path.isfile(elements_index_filename) :
+        if self.data['watching'][watch_uuid].get_screenshot() and path.isfile(elements_index_filename) :
             return True
 
         return False
@@ -381,16 +396,14 @@ class ChangeDetectionStore:
         if not self.data['watching'].get(watch_uuid):
             return
 
-        if as_error:
-            target_path = os.path.join(self.datastore_path, watch_uuid, "last-error-screenshot.png")
-        else:
-            target_path = os.path.join(self.datastore_path, watch_uuid, "last-screenshot.png")
-
         self.data['watching'][watch_uuid].ensure_data_dir_exists()
 
-        with open(target_path, 'wb') as f:
-            f.write(screenshot)
-            f.close()
+        # Converted to SCREENSHOT_FORMAT, skipped when it's the same as the last one, see screenshots.py
+        from changedetectionio import screenshots
+        screenshots.save(directory=os.path.join(self.datastore_path, watch_uuid),
+                         name="last-error-screenshot" if as_error else "last-screenshot",
+                         screenshot=screenshot,
+                         thumbnail=not as_error)
 
 
     def save_error_text(self, watch_uuid, contents):
@@ -417,6 +430,10 @@ class ChangeDetectionStore:
 
 
     def sync_to_json(self):
+        if self.shard:
+            self.sync_to_shared_json()
+            return
+
         logger.info("Saving JSON..")
         try:
             data = deepcopy(self.__data)
@@ -427,7 +444,6 @@ class ChangeDetectionStore:
             self.sync_to_json()
             return
         else:
-
             try:
                 # Re #286  - First write to a temp file, then confirm it looks OK and rename it
                 # This is a fairly basic strategy to deal with the case that the file is corrupted,
@@ -441,6 +457,71 @@ class ChangeDetectionStore:
             self.needs_write = False
             self.needs_write_urgent = False
 
+    def shared_json_version(self):
+        try:
+            stat = os.stat(self.json_store_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def sync_to_shared_json(self):
+        """
+        Sharding, other instances write to the same url-watches.json, merge with what it has now and take their changes
+        (new or deleted watches, edits from their UI, their check results etc) into this instance.
+        Only written when this instance changed something, only read when another instance wrote it.
+        """
+        import fcntl
+
+        dirty = self.needs_write or self.needs_write_urgent
+        disk_version = self.shared_json_version()
+        if not dirty and disk_version == self.shared_json_last_version:
+            return
+
+        # Changes made from now on go out with the next sync
+        self.needs_write = False
+        self.needs_write_urgent = False
+        try:
+            local = json.loads(json.dumps(deepcopy(self.__data)))
+        except RuntimeError as e:
+            logger.error(f"! Data changed when writing to JSON, trying again.. {str(e)}")
+            self.needs_write = self.needs_write or dirty
+            return
+
+        try:
+            if dirty:
+                logger.info("Saving shared JSON..")
+                # Also locks between the instances when the network filesystem supports it (NFSv4, SMB, CephFS etc)
+                with open(self.json_store_path + ".lock", 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        with open(self.json_store_path) as json_file:
+                            disk = json.load(json_file)
+                    except FileNotFoundError:
+                        disk = {}
+
+                    merged = sharding.merge_shared_json(base=self.shared_json_base, local=local, disk=disk)
+                    with open(self.json_store_path + ".tmp", 'w') as json_file:
+                        json.dump(merged, json_file, indent=4)
+                    os.replace(self.json_store_path + ".tmp", self.json_store_path)
+                    disk_version = self.shared_json_version()
+            else:
+                # Nothing to write, only another instance's changes to take in, the file is always replaced whole
+                with open(self.json_store_path) as json_file:
+                    merged = sharding.merge_shared_json(base=self.shared_json_base, local=local, disk=json.load(json_file))
+        except Exception as e:
+            logger.error(f"Error writing shared JSON!! (Main JSON file save was skipped) : {str(e)}")
+            self.needs_write = self.needs_write or dirty
+            return
+
+        self.shared_json_base = merged
+        self.shared_json_last_version = disk_version
+
+        # Whatever is different from what this instance had came from another instance
+        sharding.apply_shared_json(memory=self.__data,
+                                   snapshot=local,
+                                   merged=merged,
+                                   new_watch=lambda uuid, watch: Watch.model(datastore_path=self.datastore_path, default={**watch, 'uuid': uuid}))
+
     # Thread runner, this helps with thread/write issues when there are many operations that want to update the JSON
     # by just running periodically in one thread, according to python, dict updates are threadsafe.
     def save_datastore(self):
@@ -459,7 +540,8 @@ class ChangeDetectionStore:
                 logger.critical("Shutting down datastore thread")
                 return
 
-            if self.needs_write or self.needs_write_urgent:
+            # Sharding, also to see what the other instances changed
+            if self.needs_write or self.needs_write_urgent or self.shard:
                 self.sync_to_json()
 
             # Once per minute is enough, more and it can cause high CPU usage
@@ -597,6 +679,32 @@ class ChangeDetectionStore:
 
         return headers
 
+    def get_schedule_for_watch(self, uuid):
+        """
+        Cron expression/time window for the watch, its own or else from the first of its tags that has one
+        :return: dict or None when the watch only uses the time between checks
+        """
+        watch = self.data['watching'].get(uuid)
+        if not watch:
+            return None
+
+        schedule = schedule_lib.get_schedule(watch)
+        if not schedule and watch.get('tags'):
+            for tag_uuid, tag in self.get_all_tags_for_watch(uuid=uuid).items():
+                schedule = schedule_lib.get_schedule(tag)
+                if schedule:
+                    break
+
+        return schedule
+
+    def get_next_check_time(self, uuid, default_seconds):
+        """
+        When the watch should be checked next, see Watch.cached_next_check_time()
+        """
+        return self.__data['watching'][uuid].cached_next_check_time(default_seconds=default_seconds,
+                                                                    schedule_revision=self.schedule_revision,
+                                                                    get_schedule=lambda: self.get_schedule_for_watch(uuid))
+
     def get_tag_overrides_for_watch(self, uuid, attr):
         tags = self.get_all_tags_for_watch(uuid=uuid)
         ret = []
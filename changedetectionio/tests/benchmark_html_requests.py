@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+# Compare the blocking requests.request() 'html_requests' fetch, the same with the pooled keep-alive sessions
+# and the shared async HTTP engine
+# against a local stand-in for many web hosts (127.0.0.x, each reply delayed like a real network)
+#
+# run from dir above changedetectionio/ dir
+# python3 -m changedetectionio.tests.benchmark_html_requests [fetches] [threads] [hosts] [reply delay ms]
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from changedetectionio.content_fetchers import async_http, session_pool
+from changedetectionio.content_fetchers.requests import fetcher
+
+PORT = 47231
+page = "<html><body>" + ("<p>Some text that could be changing</p>" * 200) + "</body></html>"
+
+
+def start_server(hosts, delay):
+    loop = asyncio.new_event_loop()
+
+    async def reply(request):
+        await asyncio.sleep(delay)
+        return web.Response(text=page, content_type='text/html', charset='utf-8')
+
+    async def setup():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', reply)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        for n in range(1, hosts + 1):
+            await web.TCPSite(runner, f"127.0.0.{n}", PORT, backlog=4096).start()
+
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(setup(), loop).result()
+
+
+def fetch(url):
+    f = fetcher()
+    f.run(url=url, timeout=30, request_headers={}, request_body=None, request_method='GET')
+    return len(f.content)
+
+
+def benchmark(fetches, threads, hosts):
+    urls = [f"http://127.0.0.{(n % hosts) + 1}:{PORT}/page-{n}" for n in range(fetches)]
+    now = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        assert all(executor.map(fetch, urls))
+    return time.time() - now
+
+
+if __name__ == '__main__':
+    fetches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    hosts = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    delay = (int(sys.argv[4]) if len(sys.argv) > 4 else 100) / 1000
+
+    start_server(hosts=hosts, delay=delay)
+    print(f"{fetches} fetches, {threads} threads, {hosts} hosts, {delay * 1000:.0f}ms reply delay")
+
+    # (name, ASYNC_HTTP_FETCHER, REQUESTS_SESSION_POOL)
+    for name, use_async, use_session_pool in [('requests.request()', 'false', 'false'),
+                                              ('pooled sessions', 'false', 'true'),
+                                              ('async engine', 'true', 'true')]:
+        os.environ['ASYNC_HTTP_FETCHER'] = use_async
+        os.environ['REQUESTS_SESSION_POOL'] = use_session_pool
+        assert async_http.enabled() == (use_async == 'true')
+        assert session_pool.enabled() == (use_session_pool == 'true')
+        # Warm up
+        benchmark(fetches=hosts, threads=threads, hosts=hosts)
+        took = benchmark(fetches=fetches, threads=threads, hosts=hosts)
+        print(f"{name:>20}: {took:.2f}s {fetches / took:.0f} fetches/s")
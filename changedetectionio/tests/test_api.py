@@ -98,6 +98,7 @@ def test_api_simple(client, live_server):
     before_recheck_info = res.json[watch_uuid]
 
     assert before_recheck_info['last_checked'] != 0
+    assert before_recheck_info['next_check'] > before_recheck_info['last_checked']
 
     #705 `last_changed` should be zero on the first check
     assert before_recheck_info['last_changed'] == 0
@@ -179,6 +180,8 @@ def test_api_simple(client, live_server):
     )
     assert res.json.get('watch_count') == 1
     assert res.json.get('uptime') > 0.5
+    assert res.json.get('requests_session_pool').get('requests') > 0, "Checks went through the requests session pool"
+    assert res.json.get('workers').get('count') > 0
 
     ######################################################
     # Mute and Pause, check it worked
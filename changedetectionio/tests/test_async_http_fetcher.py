@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+import os
+
+from flask import url_for
+from .util import set_original_response, live_server_setup, wait_for_all_checks, extract_UUID_from_client
+from changedetectionio.content_fetchers import async_http
+
+
+def test_setup(live_server):
+    live_server_setup(live_server)
+
+
+def test_async_http_fetcher(client, live_server):
+    set_original_response()
+    os.environ['ASYNC_HTTP_FETCHER'] = 'true'
+
+    try:
+        test_url = url_for('test_headers', _external=True)
+        res = client.post(
+            url_for("import_page"),
+            data={"urls": test_url},
+            follow_redirects=True
+        )
+        assert b"1 Imported" in res.data
+        wait_for_all_checks(client)
+        assert async_http.engine is not None, "Fetched via the shared event loop"
+
+        uuid = extract_UUID_from_client(client)
+        watch = live_server.app.config['DATASTORE'].data['watching'][uuid]
+        assert not watch.get('last_error')
+        assert 'custom' in watch.get('remote_server_reply'), "Reply headers are available like with requests"
+
+        # Custom headers, method and body are sent, no Content-Type is added
+        res = client.post(
+            url_for("edit_page", uuid=uuid),
+            data={"url": url_for('test_body', _external=True), "tags": "", "fetch_backend": "html_requests",
+                  "method": "POST", "body": "something something", "headers": "X-Custom: yes"},
+            follow_redirects=True
+        )
+        assert b"Updated watch." in res.data
+        wait_for_all_checks(client)
+        assert watch.get_history_snapshot(watch.newest_history_key).strip() == 'something something'
+
+        # Status codes are handled the same
+        res = client.post(
+            url_for("edit_page", uuid=uuid),
+            data={"url": url_for('test_endpoint', status_code=404, _external=True), "tags": "", "fetch_backend": "html_requests",
+                  "method": "GET", "body": ""},
+            follow_redirects=True
+        )
+        assert b"Updated watch." in res.data
+        wait_for_all_checks(client)
+        assert watch.get('last_error') == "Error - 404 (Page not found) received"
+
+    finally:
+        del os.environ['ASYNC_HTTP_FETCHER']
+
+    res = client.get(url_for("form_delete", uuid="all"), follow_redirects=True)
+    assert b'Deleted' in res.data
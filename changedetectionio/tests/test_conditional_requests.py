@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+from flask import url_for
+from .util import set_original_response, set_modified_response, live_server_setup, wait_for_all_checks, \
+    extract_api_key_from_UI, extract_UUID_from_client
+
+
+def test_setup(live_server):
+    live_server_setup(live_server)
+
+
+def get_last_conditional_request_headers():
+    with open("test-datastore/conditional-request-headers.txt", "r") as f:
+        return f.read().splitlines()[-1]
+
+
+def test_conditional_requests(client, live_server):
+    set_original_response()
+    api_key = extract_api_key_from_UI(client)
+
+    test_url = url_for('test_conditional_endpoint', _external=True)
+    res = client.post(
+        url_for("import_page"),
+        data={"urls": test_url},
+        follow_redirects=True
+    )
+    assert b"1 Imported" in res.data
+    wait_for_all_checks(client)
+
+    uuid = extract_UUID_from_client(client)
+    watch = live_server.app.config['DATASTORE'].data['watching'][uuid]
+    assert watch.get('remote_etag'), "ETag from the reply was stored"
+    assert watch.history_n == 1
+
+    # A recheck that can be skipped on the same checksum should send the validators and get a 304 back
+    client.get(url_for("watch", uuid=uuid, recheck='1'), headers={'x-api-key': api_key})
+    wait_for_all_checks(client)
+    assert get_last_conditional_request_headers() == f"If-None-Match:{watch.get('remote_etag')} If-Modified-Since:{watch.get('remote_last_modified')}"
+    assert watch.get('check_count') == 2
+    assert watch.history_n == 1
+    assert not watch.get('last_error')
+
+    # The endpoint keeps the same Last-Modified, like a server that lies about the content not changing
+    set_modified_response()
+    client.get(url_for("watch", uuid=uuid, recheck='1'), headers={'x-api-key': api_key})
+    wait_for_all_checks(client)
+    assert watch.history_n == 1, "Reply was '304 Not Modified' so nothing was processed"
+
+    # Turn it off for this watch, the change should be found
+    res = client.post(
+        url_for("edit_page", uuid=uuid),
+        data={"url": test_url, "tags": "", "fetch_backend": "html_requests"},
+        follow_redirects=True
+    )
+    assert b"Updated watch." in res.data
+    wait_for_all_checks(client)
+    assert watch.history_n == 2
+
+    client.get(url_for("watch", uuid=uuid, recheck='1'), headers={'x-api-key': api_key})
+    wait_for_all_checks(client)
+    assert get_last_conditional_request_headers() == "If-None-Match:None If-Modified-Since:None"
+
+    res = client.get(url_for("form_delete", uuid="all"), follow_redirects=True)
+    assert b'Deleted' in res.data
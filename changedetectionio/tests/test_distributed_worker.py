@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+import os
+import threading
+
+from flask import url_for
+from .util import set_original_response, set_modified_response, live_server_setup, wait_for_all_checks, \
+    extract_UUID_from_client
+from changedetectionio import content_fetchers
+from changedetectionio.distributed import build_job, encode, decode, worker_node
+
+
+def test_setup(live_server):
+    live_server_setup(live_server)
+
+
+def test_exception_survives_the_trip():
+    e = content_fetchers.exceptions.Non200ErrorCodeReceived(status_code=404, url='https://example.com', screenshot=b'\x89PNG')
+    copied = decode(encode({'exception': e}))['exception']
+    assert isinstance(copied, content_fetchers.exceptions.Non200ErrorCodeReceived)
+    assert copied.status_code == 404
+    assert copied.screenshot == b'\x89PNG'
+
+    # Only the app's own exceptions are recreated from what is in the shared queue
+    for name in ['subprocess.Popen', 'builtins.OSError', 'changedetectionio.content_fetchers.exceptions.os']:
+        copied = decode({'__exception__': name, 'args': ['ls'], 'state': {'args': 'x'}})
+        assert type(copied) is Exception
+        assert copied.args == ('ls',)
+
+
+def test_distributed_worker(client, live_server):
+    set_original_response()
+    datastore = live_server.app.config['DATASTORE']
+    queue_path = os.path.join(datastore.datastore_path, 'jobs.db')
+    os.environ['REMOTE_WORKER_QUEUE'] = queue_path
+
+    exit_event = threading.Event()
+    worker_node(queue_path=queue_path, datastore_path=datastore.datastore_path, n_threads=2, exit_event=exit_event)
+
+    try:
+        res = client.post(
+            url_for("import_page"),
+            data={"urls": url_for('test_endpoint', _external=True)},
+            follow_redirects=True
+        )
+        assert b"1 Imported" in res.data
+        wait_for_all_checks(client)
+
+        uuid = extract_UUID_from_client(client)
+        watch = datastore.data['watching'][uuid]
+        assert watch.history_n == 1, "First snapshot was saved from the worker node result"
+        assert not watch.get('last_error')
+
+        set_modified_response()
+        client.get(url_for("form_watch_checknow"), follow_redirects=True)
+        wait_for_all_checks(client)
+        assert watch.history_n == 2
+        assert b'which has this one new line' in watch.get_history_snapshot(watch.newest_history_key).encode('utf-8')
+
+        # Errors from the worker node end up on the watch like a local check
+        res = client.post(
+            url_for("edit_page", uuid=uuid),
+            data={"url": url_for('test_endpoint', status_code=403, _external=True), "tags": "", "fetch_backend": "html_requests"},
+            follow_redirects=True
+        )
+        assert b"Updated watch." in res.data
+        wait_for_all_checks(client)
+        assert '403' in watch.get('last_error')
+
+        # Only the settings the processors use travel with the job
+        job = build_job(datastore=datastore, uuid=uuid, skip_when_checksum_same=True)
+        assert job['settings']['requests'] == datastore.data['settings']['requests']
+        assert job['settings']['application']['fetch_backend'] == datastore.data['settings']['application']['fetch_backend']
+        for secret in ['password', 'api_access_token', 'notification_urls', 'tags']:
+            assert secret not in job['settings']['application']
+
+    finally:
+        exit_event.set()
+        del os.environ['REMOTE_WORKER_QUEUE']
+
+    res = client.get(url_for("form_delete", uuid="all"), follow_redirects=True)
+    assert b'Deleted' in res.data
@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+import os
+from concurrent.futures import Future
+from unittest import mock
+
+import pytest
+
+from flask import url_for
+from .util import set_original_response, set_modified_response, live_server_setup, wait_for_all_checks, \
+    extract_UUID_from_client
+from changedetectionio import processing_pool
+
+
+def test_setup(live_server):
+    live_server_setup(live_server)
+
+
+def test_processing_pool(client, live_server):
+    set_original_response()
+    os.environ['PROCESSING_WORKERS'] = '2'
+
+    try:
+        res = client.post(
+            url_for("import_page"),
+            data={"urls": url_for('test_endpoint', _external=True)},
+            follow_redirects=True
+        )
+        assert b"1 Imported" in res.data
+        wait_for_all_checks(client)
+
+        uuid = extract_UUID_from_client(client)
+        watch = live_server.app.config['DATASTORE'].data['watching'][uuid]
+        assert watch.history_n == 1
+        assert processing_pool.executor is not None, "Processing ran in the pool"
+
+        # Filters are applied in the pool process
+        set_modified_response()
+        res = client.post(
+            url_for("edit_page", uuid=uuid),
+            data={"include_filters": "p", "url": url_for('test_endpoint', _external=True), "tags": "", "fetch_backend": "html_requests"},
+            follow_redirects=True
+        )
+        assert b"Updated watch." in res.data
+        wait_for_all_checks(client)
+        assert watch.get_history_snapshot(watch.newest_history_key).strip() == 'which has this one new line'
+
+        # Exceptions come back from the pool process and are handled like always
+        res = client.post(
+            url_for("edit_page", uuid=uuid),
+            data={"include_filters": "#not-there", "url": url_for('test_endpoint', _external=True), "tags": "", "fetch_backend": "html_requests"},
+            follow_redirects=True
+        )
+        assert b"Updated watch." in res.data
+        wait_for_all_checks(client)
+        assert 'no filters were found' in watch.get('last_error')
+
+    finally:
+        del os.environ['PROCESSING_WORKERS']
+        processing_pool.shutdown()
+
+    res = client.get(url_for("form_delete", uuid="all"), follow_redirects=True)
+    assert b'Deleted' in res.data
+
+
+def test_exception_gets_the_screenshot():
+    from changedetectionio.content_fetchers.base import Fetcher
+    from changedetectionio.content_fetchers.exceptions import ReplyWithContentButNoText
+    from changedetectionio.distributed import encode
+
+    # As raised in the pool process, where there is no screenshot
+    future = Future()
+    future.set_result(encode({'exception': ReplyWithContentButNoText(url='http://example.com', status_code=200)}))
+    executor = mock.Mock()
+    executor.submit.return_value = future
+
+    update_handler = mock.Mock()
+    update_handler.fetcher = Fetcher()
+    update_handler.fetcher.screenshot = b'screenshot'
+    update_handler.fetcher.xpath_data = {'size_pos': []}
+
+    with mock.patch.object(processing_pool, 'get_executor', return_value=executor), \
+            mock.patch('changedetectionio.distributed.build_job', return_value={}):
+        with pytest.raises(ReplyWithContentButNoText) as e:
+            processing_pool.run_changedetection(update_handler, uuid='abc')
+    assert e.value.screenshot == b'screenshot'
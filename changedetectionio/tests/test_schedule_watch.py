@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+import datetime
+import time
+from flask import url_for
+from .util import live_server_setup, set_original_response, extract_api_key_from_UI, wait_for_all_checks
+
+
+def test_schedule_time_window(client, live_server):
+    live_server_setup(live_server)
+    set_original_response()
+
+    test_url = url_for('test_endpoint', _external=True)
+    res = client.post(
+        url_for("import_page"),
+        data={"urls": test_url},
+        follow_redirects=True
+    )
+    assert b"1 Imported" in res.data
+    wait_for_all_checks(client)
+
+    res = client.post(
+        url_for("edit_page", uuid="first"),
+        data={"url": test_url, "fetch_backend": "html_requests", "schedule_cron": "every tuesday"},
+        follow_redirects=True
+    )
+    assert b"is not a valid cron expression" in res.data
+
+    # A window that opens in two hours (server time)
+    start = datetime.datetime.now() + datetime.timedelta(hours=2)
+    end = start + datetime.timedelta(hours=1)
+    res = client.post(
+        url_for("edit_page", uuid="first"),
+        data={"url": test_url, "fetch_backend": "html_requests", "schedule_time_window": f"{start:%H:%M}-{end:%H:%M}"},
+        follow_redirects=True
+    )
+    assert b"Updated watch." in res.data
+
+    datastore = live_server.app.config['DATASTORE']
+    uuid = list(datastore.data['watching'].keys()).pop()
+    watch = datastore.data['watching'][uuid]
+    assert watch['schedule_time_window']
+
+    # Long overdue by the time between checks, but not allowed to be checked yet
+    watch['paused'] = True
+    watch['last_checked'] = int(time.time()) - (86400 * 2)
+
+    api_key = extract_api_key_from_UI(client)
+    res = client.get(url_for("systeminfo"), headers={'x-api-key': api_key})
+    assert uuid not in res.json.get('overdue_watches')
+    next_check = watch.next_check_time(default_seconds=datastore.threshold_seconds, schedule=datastore.get_schedule_for_watch(uuid))
+    assert next_check > time.time() + 3600
+
+    watch['schedule_time_window'] = None
+    res = client.get(url_for("systeminfo"), headers={'x-api-key': api_key})
+    assert uuid in res.json.get('overdue_watches')
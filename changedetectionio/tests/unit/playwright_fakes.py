@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+# Stand-ins for the Playwright driver and browser connections, shared by the connection pool (sync API) and the
+# async engine tests, the async ones only make the same calls awaitable
+
+
+class fake_browser():
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+class fake_async_browser(fake_browser):
+    async def close(self):
+        super().close()
+
+
+class fake_browser_type():
+    browser_class = fake_browser
+
+    def __init__(self):
+        self.connects = 0
+
+    def connect_over_cdp(self, url, timeout):
+        self.connects += 1
+        return self.browser_class()
+
+
+class fake_async_browser_type(fake_browser_type):
+    browser_class = fake_async_browser
+
+    async def connect_over_cdp(self, url, timeout):
+        return super().connect_over_cdp(url, timeout)
+
+
+class fake_playwright():
+    browser_type_class = fake_browser_type
+
+    def __init__(self):
+        self.chromium = self.browser_type_class()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class fake_async_playwright(fake_playwright):
+    browser_type_class = fake_async_browser_type
+
+    async def stop(self):
+        super().stop()
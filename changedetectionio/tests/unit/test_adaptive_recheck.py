@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_adaptive_recheck
+
+import time
+import unittest
+import uuid as uuid_builder
+
+from changedetectionio.model import Watch
+
+
+class TestAdaptiveRecheck(unittest.TestCase):
+
+    def _watch_with_changes(self, every_seconds, count):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.ensure_data_dir_exists()
+        now = int(time.time())
+        for i in reversed(range(count)):
+            watch.save_history_text(contents=b"hello world", timestamp=now - (i * every_seconds), snapshot_id=str(uuid_builder.uuid4()))
+        return watch
+
+    def test_not_enough_checks_uses_base(self):
+        watch = self._watch_with_changes(every_seconds=3600, count=3)
+        watch['check_count'] = 2
+        assert watch.adaptive_threshold_seconds(base_seconds=600, minimum_seconds=60, maximum_seconds=86400) == 600
+
+    def test_shrink_and_stretch(self):
+        # Changes every 10 minutes, checked every hour, should shrink towards checking twice per change
+        watch = self._watch_with_changes(every_seconds=600, count=6)
+        watch['check_count'] = 10
+        assert watch.adaptive_threshold_seconds(base_seconds=3600, minimum_seconds=60, maximum_seconds=86400) == 300
+
+        # Changes once a day, checked every hour, should stretch
+        watch = self._watch_with_changes(every_seconds=86400, count=4)
+        watch['check_count'] = 100
+        assert watch.adaptive_threshold_seconds(base_seconds=3600, minimum_seconds=60, maximum_seconds=86400) == 43200
+
+        # Never goes outside the bounds
+        assert watch.adaptive_threshold_seconds(base_seconds=3600, minimum_seconds=60, maximum_seconds=7200) == 7200
+
+    def test_effective_threshold(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        assert watch.effective_threshold_seconds(default_seconds=500) == 500
+        assert watch.next_check_time(default_seconds=500) == 0
+
+        watch['last_checked'] = 1000
+        watch['adaptive_recheck_seconds'] = 120
+        assert watch.next_check_time(default_seconds=500) == 1500, "Adaptive interval is ignored unless enabled"
+
+        watch['adaptive_recheck'] = True
+        assert watch.next_check_time(default_seconds=500) == 1120
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_auto_fetch
+
+import unittest
+from unittest import mock
+
+from changedetectionio import content_fetchers
+from changedetectionio.content_fetchers.base import Fetcher
+from changedetectionio.content_fetchers.exceptions import Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.requests import fetcher as requests_fetcher
+from changedetectionio.model import Watch
+from changedetectionio.processors import difference_detection_processor
+
+app_html = '<html><body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div></body></html>'
+text_html = '<html><body><h1>Prices</h1><div class="price">$10.00</div></body></html>'
+
+
+class fake_datastore():
+    def get_tag_overrides_for_watch(self, uuid, attr):
+        return []
+
+
+class fake_settings_datastore():
+    datastore_path = '/tmp'
+    data = {'settings': {'application': {'fetch_backend': 'auto'}, 'requests': {'timeout': 30}}}
+
+    def get_preferred_proxy_for_watch(self, uuid):
+        return None
+
+    def get_all_base_headers(self):
+        return {}
+
+    def get_all_headers_in_textfile_for_watch(self, uuid):
+        return {}
+
+
+class recording_requests_fetcher(requests_fetcher):
+    def run(self, url, timeout, request_headers, request_body, request_method, ignore_status_codes=False,
+            current_include_filters=None, is_binary=False):
+        self.sent_headers = dict(request_headers)
+        # Like the real one
+        request_headers['User-Agent'] = 'python-requests'
+        self.content = app_html
+        self.headers = {'content-type': 'text/html'}
+
+
+class recording_browser_fetcher(Fetcher):
+    sent_headers = None
+
+    def __init__(self, proxy_override=None, custom_browser_connection_url=None):
+        super().__init__()
+
+    def run(self, url, timeout, request_headers, request_body, request_method, ignore_status_codes=False,
+            current_include_filters=None, is_binary=False):
+        recording_browser_fetcher.sent_headers = dict(request_headers)
+        self.content = text_html
+        self.headers = {'content-type': 'text/html'}
+
+    def quit(self):
+        pass
+
+
+class auto_processor(difference_detection_processor):
+    """
+    Only the fetch tier logic, 'fetching' returns the pages given for each backend
+    """
+
+    def __init__(self, watch, pages):
+        self.datastore = fake_datastore()
+        self.watch = watch
+        self.pages = pages
+        self.fetched = []
+
+    def call_browser(self, skip_when_checksum_same=False, fetch_backend=None):
+        if not fetch_backend:
+            return self.call_browser_auto(skip_when_checksum_same=skip_when_checksum_same)
+        self.fetched.append(fetch_backend)
+        page = self.pages[fetch_backend]
+        if isinstance(page, Exception):
+            raise page
+        self.fetcher = requests_fetcher()
+        self.fetcher.content = page
+        self.fetcher.headers = {'content-type': 'text/html; charset=utf-8'}
+
+
+class TestAutoFetch(unittest.TestCase):
+
+    def _watch(self, **kwargs):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.update(kwargs)
+        return watch
+
+    def test_browser_needed_reason(self):
+        p = auto_processor(self._watch(), {})
+        for html, reason in [(text_html, None), (app_html, "empty javascript application container"),
+                             ('<html><body></body></html>', "no text found")]:
+            p.fetcher = requests_fetcher()
+            p.fetcher.content = html
+            p.fetcher.headers = {'content-type': 'text/html'}
+            assert p.browser_needed_reason() == reason
+
+        p.watch['include_filters'] = ['.price']
+        p.fetcher.content = text_html
+        assert p.browser_needed_reason() is None
+        p.watch['include_filters'] = ['.stock', '//div[@id="price"]']
+        assert p.browser_needed_reason() == "filters not found"
+
+        # Not HTML, nothing a browser would change
+        p.fetcher.content = '{}'
+        p.fetcher.headers = {'content-type': 'application/json'}
+        assert p.browser_needed_reason() is None
+
+    def test_escalation(self):
+        watch = self._watch()
+        p = auto_processor(watch, {'html_requests': text_html, 'html_webdriver': text_html})
+        p.call_browser()
+        assert p.fetched == ['html_requests']
+        assert p.auto_fetch_update == {'auto_fetch_tier': 'html_requests', 'auto_fetch_checks_since_probe': 0}
+
+        p = auto_processor(watch, {'html_requests': app_html, 'html_webdriver': text_html})
+        p.call_browser()
+        assert p.fetched == ['html_requests', 'html_webdriver']
+        assert p.auto_fetch_update == {'auto_fetch_tier': 'html_webdriver', 'auto_fetch_checks_since_probe': 0}
+
+        # 403 (bot protection?) also escalates, other errors are just errors
+        p = auto_processor(watch, {'html_requests': Non200ErrorCodeReceived(url='', status_code=403), 'html_webdriver': text_html})
+        p.call_browser()
+        assert p.auto_fetch_update['auto_fetch_tier'] == 'html_webdriver'
+        p = auto_processor(watch, {'html_requests': Non200ErrorCodeReceived(url='', status_code=404), 'html_webdriver': text_html})
+        with self.assertRaises(Non200ErrorCodeReceived):
+            p.call_browser()
+
+    def test_remembered_tier_and_reprobe(self):
+        watch = self._watch(auto_fetch_tier='html_webdriver', auto_fetch_checks_since_probe=5)
+        p = auto_processor(watch, {'html_requests': text_html, 'html_webdriver': text_html})
+        p.call_browser()
+        assert p.fetched == ['html_webdriver']
+        assert p.auto_fetch_update == {'auto_fetch_tier': 'html_webdriver', 'auto_fetch_checks_since_probe': 6}
+
+        # Every AUTO_FETCH_REPROBE_CHECKS (20) checks the cheaper fetcher is tried again
+        watch['auto_fetch_checks_since_probe'] = 19
+        p = auto_processor(watch, {'html_requests': text_html, 'html_webdriver': text_html})
+        p.call_browser()
+        assert p.fetched == ['html_requests']
+        assert p.auto_fetch_update == {'auto_fetch_tier': 'html_requests', 'auto_fetch_checks_since_probe': 0}
+
+    def test_browser_fetch_gets_its_own_headers(self):
+        watch = self._watch(url='https://example.com', headers={'Cookie': 'session=1'}, use_conditional_requests=True,
+                            remote_etag='"abc"', remote_last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        p = difference_detection_processor.__new__(difference_detection_processor)
+        p.datastore = fake_settings_datastore()
+        p.watch = watch
+
+        with mock.patch.object(content_fetchers, 'html_requests', recording_requests_fetcher), \
+                mock.patch.object(content_fetchers, 'html_webdriver', recording_browser_fetcher):
+            p.call_browser(skip_when_checksum_same=True)
+
+        assert p.auto_fetch_update['auto_fetch_tier'] == 'html_webdriver'
+        assert recording_browser_fetcher.sent_headers == {'Cookie': 'session=1'}, "No If-None-Match or requests User-Agent for Chrome"
+        assert watch['headers'] == {'Cookie': 'session=1'}
+
+
+if __name__ == '__main__':
+    unittest.main()
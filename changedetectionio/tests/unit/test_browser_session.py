@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_browser_session
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from changedetectionio.content_fetchers.base import Fetcher
+
+
+def steps(login_value='me@example.com'):
+    return [
+        {'operation': 'Goto site', 'selector': '', 'optional_value': '', 'setup': False},
+        {'operation': 'Enter text in field', 'selector': '#email', 'optional_value': login_value, 'setup': True},
+        {'operation': 'Click element', 'selector': '#login', 'optional_value': '', 'setup': True},
+        {'operation': 'Click element', 'selector': '#my-orders', 'optional_value': '', 'setup': False},
+    ]
+
+
+class TestBrowserSession(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fetcher = Fetcher()
+        self.fetcher.browser_steps = steps()
+        self.fetcher.browser_session_path = os.path.join(self.dir, 'sessions', 'browser-session.json')
+        self.storage_state = {'cookies': [{'name': 'sid', 'value': 'abc', 'domain': 'example.com'}], 'origins': []}
+
+    def test_save_and_load(self):
+        assert self.fetcher.browser_session_load() is None
+        self.fetcher.browser_session_save(storage_state=self.storage_state)
+        assert self.fetcher.browser_session_load() == self.storage_state
+
+        # Another watch with the same setup steps (tag scope)
+        other = Fetcher()
+        other.browser_steps = steps()
+        other.browser_session_path = self.fetcher.browser_session_path
+        assert other.browser_session_load() == self.storage_state
+
+        self.fetcher.browser_session_forget()
+        assert self.fetcher.browser_session_load() is None
+
+    def test_not_used(self):
+        self.fetcher.browser_session_save(storage_state=self.storage_state)
+
+        # Setup steps were edited
+        self.fetcher.browser_steps = steps(login_value='someone-else@example.com')
+        assert self.fetcher.browser_session_load() is None
+
+        # Too old
+        self.fetcher.browser_steps = steps()
+        with open(self.fetcher.browser_session_path) as f:
+            session = json.load(f)
+        session['saved'] = time.time() - 100000
+        with open(self.fetcher.browser_session_path, 'w') as f:
+            json.dump(session, f)
+        assert self.fetcher.browser_session_load() is None
+
+        # No steps are marked as setup, nothing to save
+        self.fetcher.browser_session_forget()
+        self.fetcher.browser_steps = [dict(s, setup=False) for s in steps()]
+        self.fetcher.browser_session_save(storage_state=self.storage_state)
+        assert not os.path.exists(self.fetcher.browser_session_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_browser_steps_puppeteer
+
+import asyncio
+import unittest
+
+from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface_puppeteer, xpath_literal
+from changedetectionio.content_fetchers.base import Fetcher
+
+
+class fake_element():
+    def __init__(self, selector):
+        self.selector = selector
+        self.checked = False
+        self.clicks = 0
+        self.typed = ''
+
+    async def click(self, delay=0, **kwargs):
+        self.clicks += 1
+        self.checked = not self.checked
+
+    async def type(self, text, **kwargs):
+        self.typed += text
+
+
+class fake_page():
+    def __init__(self):
+        self.elements = {}
+        self.waited_for = []
+
+    def _element(self, selector):
+        return self.elements.setdefault(selector, fake_element(selector))
+
+    async def waitForSelector(self, selector, timeout=None):
+        self.waited_for.append(('css', selector))
+        return self._element(selector)
+
+    async def waitForXPath(self, xpath, timeout=None):
+        self.waited_for.append(('xpath', xpath))
+        return self._element(xpath)
+
+    async def evaluate(self, js, *args):
+        if 'element.checked' in js:
+            return args[0].checked
+        return None
+
+
+class TestBrowserStepsPuppeteer(unittest.TestCase):
+
+    def setUp(self):
+        self.interface = steppable_browser_interface_puppeteer()
+        self.interface.page = fake_page()
+
+    def test_actions(self):
+        handler, selector, value = self.interface.get_action(action_name='Check checkbox', selector='#agree')
+        assert handler == self.interface.action_check_checkbox
+        assert self.interface.get_action(action_name='Choose one') is None
+
+        asyncio.run(self.interface.action_check_checkbox('#agree', ''))
+        asyncio.run(self.interface.action_check_checkbox('#agree', ''))
+        assert self.interface.page.elements['#agree'].clicks == 1, "Already checked, not clicked again"
+
+        asyncio.run(self.interface.action_enter_text_in_field('xpath://input[@name="q"]', 'hello'))
+        asyncio.run(self.interface.action_click_element('/html/body/button', ''))
+        assert self.interface.page.waited_for[-2:] == [('xpath', '//input[@name="q"]'), ('xpath', '/html/body/button')]
+        assert self.interface.page.elements['//input[@name="q"]'].typed == 'hello'
+
+    def test_xpath_literal(self):
+        assert xpath_literal("Add to cart") == "'Add to cart'"
+        assert xpath_literal("Don't") == '"Don\'t"'
+        assert xpath_literal("Don't \"stop\"") == "concat('Don', \"'\", 't \"stop\"')"
+
+    def test_steps_to_run(self):
+        fetcher = Fetcher()
+        fetcher.browser_steps = [
+            {'operation': 'Goto site', 'selector': '', 'optional_value': ''},
+            {'operation': 'Enter text in field', 'selector': '#email', 'optional_value': 'me@example.com', 'setup': True},
+            {'operation': 'Click element', 'selector': '#my-orders', 'optional_value': ''},
+            {'operation': 'Choose one', 'selector': '', 'optional_value': ''},
+        ]
+        assert [s[0] for s in fetcher.browser_steps_to_run()] == [1, 2]
+        fetcher.skip_setup_steps = True
+        # Step numbers stay the ones shown in the UI
+        assert list(fetcher.browser_steps_to_run()) == [(2, 'Click element', '#my-orders', '')]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_content_ready
+
+import time
+import unittest
+
+from changedetectionio.content_fetchers.webdriver_selenium import fetcher as webdriver_fetcher
+
+
+class fake_driver():
+    def __init__(self, ready_after):
+        self.calls = 0
+        self.ready_after = ready_after
+
+    def execute_script(self, script, options):
+        assert 'content_ready' in script
+        self.calls += 1
+        return self.calls >= self.ready_after
+
+
+class TestContentReady(unittest.TestCase):
+
+    def test_options(self):
+        f = webdriver_fetcher()
+        f.content_ready_strategy = 'filters'
+        options = f.content_ready_options(include_filters=['#price', 'json:$.price', '//div[@id="stock"]', ' '])
+        assert options['strategy'] == 'filters'
+        assert options['filters'] == ['#price', '//div[@id="stock"]']
+
+    def test_delay_is_the_limit(self):
+        f = webdriver_fetcher()
+        f.content_ready_strategy = 'dom_quiet'
+
+        # Ready on the third look
+        f.driver = fake_driver(ready_after=3)
+        started = time.time()
+        f.wait_for_content_ready(max_seconds=5, include_filters=None)
+        assert time.time() - started < 2
+        assert f.driver.calls == 3
+
+        # Never ready, gives up after max_seconds
+        f.driver = fake_driver(ready_after=1000)
+        started = time.time()
+        f.wait_for_content_ready(max_seconds=1, include_filters=None)
+        assert 0.9 < time.time() - started < 2
+
+
+if __name__ == '__main__':
+    unittest.main()
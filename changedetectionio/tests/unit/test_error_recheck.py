@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_error_recheck
+
+import unittest
+
+from changedetectionio.model import Watch
+
+
+class TestErrorRecheck(unittest.TestCase):
+
+    def _seconds(self, watch, category, errors):
+        watch['consecutive_errors'] = errors
+        return watch.error_recheck_seconds(error_category=category, base_seconds=3600, retry_seconds=30, retry_attempts=3, maximum_seconds=86400)
+
+    def test_transient_quick_retries_then_backoff(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        assert [self._seconds(watch, 'transient', n) for n in range(1, 8)] == [30, 60, 120, 3600, 7200, 14400, 28800]
+
+    def test_persistent_backoff_capped(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        assert [self._seconds(watch, 'persistent', n) for n in range(1, 5)] == [3600, 7200, 14400, 28800]
+        assert self._seconds(watch, 'persistent', 500) == 86400
+        # Never more often than the normal interval, even when that is above the cap
+        assert watch.error_recheck_seconds(error_category='persistent', base_seconds=172800, retry_seconds=30, retry_attempts=3, maximum_seconds=86400) == 172800
+
+    def test_quick_retry_never_later_than_normal(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch['consecutive_errors'] = 3
+        assert watch.error_recheck_seconds(error_category='transient', base_seconds=60, retry_seconds=30, retry_attempts=3, maximum_seconds=86400) == 60
+
+    def test_effective_threshold_only_while_error(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch['error_recheck_seconds'] = 30
+        assert watch.effective_threshold_seconds(default_seconds=500) == 500
+        watch['last_error'] = "Connection refused"
+        assert watch.effective_threshold_seconds(default_seconds=500) == 30
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_fetch_coalesce
+
+import threading
+import time
+import unittest
+
+from changedetectionio.content_fetchers.coalesce import FetchCoalescer, fetch_signature
+from changedetectionio.content_fetchers.exceptions import Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.requests import fetcher as requests_fetcher
+
+
+class TestFetchCoalesce(unittest.TestCase):
+
+    def _signature(self, **kwargs):
+        args = dict(fetcher_obj=requests_fetcher, proxy_url=None, custom_browser_connection_url=None,
+                    url='https://example.com', request_headers={'User-Agent': 'test'}, request_body=None,
+                    request_method='GET', ignore_status_codes=False, is_binary=False)
+        args.update(kwargs)
+        return fetch_signature(**args)
+
+    def test_signature(self):
+        assert self._signature() == self._signature(request_headers={'user-agent': 'test'}, request_method='get')
+        assert self._signature() != self._signature(url='https://example.com/other')
+        assert self._signature() != self._signature(proxy_url='http://proxy:3128')
+        assert self._signature() != self._signature(request_headers={'User-Agent': 'test', 'Cookie': 'a=b'})
+        assert self._signature() != self._signature(browser_steps=[{'operation': 'Click element', 'selector': '#x'}])
+
+    def test_concurrent_fetches_are_shared(self):
+        coalescer = FetchCoalescer()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.5)
+            f = requests_fetcher()
+            f.content = 'hello'
+            return f
+
+        def worker():
+            results.append(coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert len(results) == 5
+        assert all(r.content == 'hello' for r in results)
+        assert len(set(id(r) for r in results)) == 5, "Each watch gets its own copy of the fetcher"
+
+        # Within the window it's still re-used, a different signature is not
+        coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+        coalescer.fetch(signature='xyz', window_seconds=10, fetch_function=fetch)
+        assert len(calls) == 2
+
+        # Outside of the window it fetches again
+        coalescer.results['abc'] = (time.time() - 20, results[0], None)
+        coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+        assert len(calls) == 3
+
+    def test_copies_do_not_share_data(self):
+        coalescer = FetchCoalescer()
+
+        def fetch():
+            f = requests_fetcher()
+            f.content = 'hello'
+            f.headers = {'content-type': 'text/html'}
+            f.xpath_data = {'size_pos': [{'xpath': '/html'}]}
+            f.instock_data = 'In stock'
+            return f
+
+        first = coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+        # The first watch's processor changes its fetcher before the next watch gets a copy
+        first.headers['content-type'] = 'application/json'
+        first.xpath_data['size_pos'].append({'xpath': '/body'})
+        first.content = 'changed'
+
+        second = coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+        second.headers['x-other'] = 'yes'
+        third = coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+
+        for f in (second, third):
+            assert f.content == 'hello'
+            assert f.xpath_data == {'size_pos': [{'xpath': '/html'}]}
+            assert f.instock_data == 'In stock'
+        assert second.headers == {'content-type': 'text/html', 'x-other': 'yes'}
+        assert third.headers == {'content-type': 'text/html'}
+
+    def test_watch_signature(self):
+        coalescer = FetchCoalescer()
+        assert coalescer.get_watch_signature('watch-1') is None
+        coalescer.set_watch_signature('watch-1', self._signature())
+        coalescer.set_watch_signature('watch-2', self._signature(request_headers={'User-Agent': 'other'}))
+        assert coalescer.get_watch_signature('watch-1') == self._signature()
+        assert coalescer.get_watch_signature('watch-1') != coalescer.get_watch_signature('watch-2')
+
+    def test_exception_is_shared(self):
+        coalescer = FetchCoalescer()
+
+        def fetch():
+            raise Non200ErrorCodeReceived(url='https://example.com', status_code=500)
+
+        for _ in range(2):
+            with self.assertRaises(Non200ErrorCodeReceived):
+                coalescer.fetch(signature='abc', window_seconds=10, fetch_function=fetch)
+
+        assert not coalescer.in_flight
+
+
+if __name__ == '__main__':
+    unittest.main()
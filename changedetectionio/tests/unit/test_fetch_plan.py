@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_fetch_plan
+
+import os
+import tempfile
+import time
+import unittest
+
+from changedetectionio.model import Watch
+from changedetectionio.processors import restock_diff, text_json_diff
+
+
+class fake_datastore():
+    def __init__(self, datastore_path):
+        self.datastore_path = datastore_path
+
+
+def processor(processor_module, datastore_path, **watch_settings):
+    p = processor_module.perform_site_check.__new__(processor_module.perform_site_check)
+    p.datastore = fake_datastore(datastore_path)
+    p.watch = Watch.model(datastore_path=datastore_path, default=watch_settings)
+    return p
+
+
+class TestFetchPlan(unittest.TestCase):
+
+    def test_fetch_plan(self):
+        with tempfile.TemporaryDirectory() as datastore_path:
+            p = processor(text_json_diff, datastore_path)
+            # Nothing collected yet
+            assert p.get_fetch_plan(skip_when_checksum_same=True) == {'instock_data': False, 'screenshot': True, 'xpath_data': True}
+
+            os.makedirs(os.path.join(datastore_path, p.watch['uuid']))
+            for filename in ['elements.json', 'last-screenshot.png']:
+                with open(os.path.join(datastore_path, p.watch['uuid'], filename), 'w') as f:
+                    f.write('x')
+
+            assert p.get_fetch_plan(skip_when_checksum_same=True)['xpath_data'] is False
+            # Recheck button, saving the watch etc
+            assert p.get_fetch_plan(skip_when_checksum_same=False)['xpath_data'] is True
+
+            # Old Visual Selector data is refreshed
+            old = time.time() - 86400 * 2
+            os.utime(os.path.join(datastore_path, p.watch['uuid'], 'elements.json'), (old, old))
+            assert p.get_fetch_plan(skip_when_checksum_same=True)['xpath_data'] is True
+
+            # Restock only needs the stock text
+            p = processor(restock_diff, datastore_path)
+            assert p.get_fetch_plan(skip_when_checksum_same=True) == {'instock_data': True, 'screenshot': True, 'xpath_data': False}
+
+    def test_screenshot_max_age(self):
+        with tempfile.TemporaryDirectory() as datastore_path:
+            p = processor(restock_diff, datastore_path)
+            os.makedirs(os.path.join(datastore_path, p.watch['uuid']))
+            with open(os.path.join(datastore_path, p.watch['uuid'], 'last-screenshot.png'), 'w') as f:
+                f.write('x')
+
+            os.environ['SCREENSHOT_MAX_AGE_SECONDS'] = '3600'
+            try:
+                assert p.get_fetch_plan(skip_when_checksum_same=True)['screenshot'] is False
+                # Needed to attach to the notification
+                p.watch['notification_screenshot'] = True
+                assert p.get_fetch_plan(skip_when_checksum_same=True)['screenshot'] is True
+            finally:
+                del os.environ['SCREENSHOT_MAX_AGE_SECONDS']
+
+
+if __name__ == '__main__':
+    unittest.main()
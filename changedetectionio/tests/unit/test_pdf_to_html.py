@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_pdf_to_html
+
+import hashlib
+import os
+import stat
+import tempfile
+import unittest
+
+from changedetectionio import pdf_to_html
+
+
+def fake_tool(directory, script):
+    path = os.path.join(directory, 'fake-pdftohtml')
+    with open(path, 'w') as f:
+        f.write(f"#!/bin/sh\n{script}\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+class TestPDFToHTML(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in ('PDF_TO_HTML_TOOL', 'PDF_TO_HTML_TIMEOUT_SECONDS'):
+            os.environ.pop(name, None)
+
+    def test_large_pdf_and_cache(self):
+        # Echoes the "PDF" back, like pdftohtml it writes while it is still being given the input
+        os.environ['PDF_TO_HTML_TOOL'] = fake_tool(self.dir, 'cat')
+        pdf = b'%PDF-1.4 ' + b'x' * (5 * 1024 * 1024)
+
+        conversions = pdf_to_html.get_stats()['conversions']
+        assert pdf_to_html.convert(pdf, cache_directory=self.dir) == pdf.decode('utf-8'), "Bigger than the pipe buffers, doesn't block"
+        assert pdf_to_html.get_stats()['conversions'] == conversions + 1
+
+        # Tool gone, the same PDF comes from the cache
+        os.environ['PDF_TO_HTML_TOOL'] = 'no-such-pdftohtml'
+        assert pdf_to_html.convert(pdf, cache_directory=self.dir) == pdf.decode('utf-8')
+        assert pdf_to_html.get_stats()['conversions'] == conversions + 1
+
+        with self.assertRaises(pdf_to_html.PDFToHTMLToolNotFound):
+            pdf_to_html.convert(b'%PDF-1.4 changed', cache_directory=self.dir)
+
+        os.environ['PDF_TO_HTML_TOOL'] = fake_tool(self.dir, 'cat')
+        pdf_to_html.convert(b'%PDF-1.4 changed', cache_directory=self.dir)
+        cached = [f for f in os.listdir(self.dir) if f.startswith('pdf-')]
+        assert cached == [os.path.basename(pdf_to_html.cache_path(self.dir, hashlib.md5(b'%PDF-1.4 changed').hexdigest()))], "Only the last conversion is kept"
+
+    def test_timeout_and_failure(self):
+        os.environ['PDF_TO_HTML_TOOL'] = fake_tool(self.dir, 'exec sleep 10')
+        os.environ['PDF_TO_HTML_TIMEOUT_SECONDS'] = '1'
+        with self.assertRaises(pdf_to_html.PDFToHTMLFailed):
+            pdf_to_html.convert(b'%PDF-1.4 slow')
+
+        os.environ['PDF_TO_HTML_TOOL'] = fake_tool(self.dir, 'cat > /dev/null; echo "Syntax Error" >&2; exit 1')
+        with self.assertRaises(pdf_to_html.PDFToHTMLFailed):
+            pdf_to_html.convert(b'%PDF-1.4 broken')
+
+
+if __name__ == '__main__':
+    unittest.main()
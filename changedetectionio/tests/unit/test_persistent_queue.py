@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_persistent_queue
+
+import os
+import tempfile
+import unittest
+
+from changedetectionio import queuedWatchMetaData
+from changedetectionio.persistent_queue import PersistentPriorityQueue
+
+
+class TestPersistentQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'queue.db')
+
+    def _put(self, q, priority, uuid, skip_when_checksum_same=True):
+        q.put(queuedWatchMetaData.PrioritizedItem(priority=priority, item={'uuid': uuid, 'skip_when_checksum_same': skip_when_checksum_same}))
+
+    def test_dedupe_by_uuid(self):
+        q = PersistentPriorityQueue(path=self.path)
+        self._put(q, 1000, 'a')
+        self._put(q, 2000, 'b')
+        self._put(q, 1, 'b', skip_when_checksum_same=False)
+        self._put(q, 5000, 'a')
+        assert q.qsize() == 2
+
+        first = q.get(block=False)
+        assert first.item['uuid'] == 'b', "The more urgent priority is kept"
+        assert first.priority == 1
+        assert first.item['skip_when_checksum_same'] is False, "A full recheck request wins"
+
+        second = q.get(block=False)
+        assert second.item['uuid'] == 'a'
+        assert second.priority == 1000
+
+    def test_dedupe_is_one_task(self):
+        q = PersistentPriorityQueue(path=self.path)
+        for _ in range(3):
+            self._put(q, 1000, 'a')
+        assert q.qsize() == 1
+        assert q.unfinished_tasks == 1
+
+        q.get(block=False)
+        q.task_done()
+        assert q.unfinished_tasks == 0
+        with self.assertRaises(ValueError):
+            q.task_done()
+
+    def test_replayed_after_restart(self):
+        q = PersistentPriorityQueue(path=self.path)
+        self._put(q, 3000, 'c')
+        self._put(q, 1, 'manual')
+        self._put(q, 2000, 'b')
+        self._put(q, 2500, 'taken')
+        assert q.get(block=False).item['uuid'] == 'manual'
+        q.db.close()
+
+        q = PersistentPriorityQueue(path=self.path)
+        assert [q.get(block=False).item['uuid'] for _ in range(q.qsize())] == ['b', 'taken', 'c']
+        q.db.close()
+
+        q = PersistentPriorityQueue(path=self.path)
+        assert q.qsize() == 0, "Items are removed from disk once a worker takes them"
+
+    def test_replayed_items_are_tasks(self):
+        q = PersistentPriorityQueue(path=self.path)
+        self._put(q, 1000, 'a')
+        self._put(q, 2000, 'b')
+        q.db.close()
+
+        q = PersistentPriorityQueue(path=self.path)
+        assert q.unfinished_tasks == 2
+        q.get(block=False)
+        q.task_done()
+        q.get(block=False)
+        q.task_done()
+        assert q.unfinished_tasks == 0
+        # Put again once taken, a new task
+        self._put(q, 1000, 'a')
+        assert q.unfinished_tasks == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_playwright_async
+
+import asyncio
+import threading
+import unittest
+
+from changedetectionio.content_fetchers.exceptions import BrowserFetchTimedOut, Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.playwright import fetcher as playwright_fetcher
+from changedetectionio.content_fetchers.playwright_async import async_playwright_engine
+from changedetectionio.tests.unit.playwright_fakes import fake_async_playwright
+
+
+class fake_engine(async_playwright_engine):
+    async def _start(self):
+        self.connect_lock = asyncio.Lock()
+        return fake_async_playwright()
+
+
+class fake_fetcher():
+    browser_type = 'chromium'
+    browser_connection_url = 'ws://browser:3000'
+
+    def __init__(self, seconds=0):
+        self.seconds = seconds
+        self.browser = None
+
+    async def async_run(self, browser, url):
+        self.browser = browser
+        await asyncio.sleep(self.seconds)
+
+
+class fake_response():
+    headers = {'content-length': '100'}
+
+    def __init__(self, status):
+        self.status = status
+
+    def all_headers(self):
+        return {'content-type': 'text/html'}
+
+
+class fake_async_response(fake_response):
+    async def all_headers(self):
+        return super().all_headers()
+
+
+class fake_page():
+    """
+    Records what the fetcher does with the page, the same for the sync and the async API
+    """
+
+    def __init__(self, status=200):
+        self.status = status
+        self.calls = []
+
+    def on(self, event, handler):
+        pass
+
+    def goto(self, url, timeout, wait_until):
+        self.calls.append(('goto', url, wait_until))
+        return fake_response(self.status)
+
+    def evaluate(self, js):
+        self.calls.append(('evaluate', js[:30]))
+        return ['evaluated']
+
+    def wait_for_timeout(self, ms):
+        self.calls.append(('wait_for_timeout', ms))
+
+    def content(self):
+        return '<html><body>Hello</body></html>'
+
+    def screenshot(self, **kwargs):
+        self.calls.append(('screenshot', kwargs))
+        return b'jpeg'
+
+
+class fake_async_page(fake_page):
+    async def goto(self, url, timeout, wait_until):
+        super().goto(url, timeout, wait_until)
+        return fake_async_response(self.status)
+
+    async def evaluate(self, js):
+        return super().evaluate(js)
+
+    async def wait_for_timeout(self, ms):
+        return super().wait_for_timeout(ms)
+
+    async def content(self):
+        return super().content()
+
+    async def screenshot(self, **kwargs):
+        return super().screenshot(**kwargs)
+
+
+class fake_context():
+    def __init__(self, page):
+        self.page = page
+        self.closed = False
+
+    def new_page(self):
+        return self.page
+
+    def on(self, event, handler):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class fake_async_context(fake_context):
+    async def new_page(self):
+        return self.page
+
+    async def close(self):
+        self.closed = True
+
+
+class fake_context_browser():
+    def __init__(self, context):
+        self.context = context
+
+    def new_context(self, **kwargs):
+        return self.context
+
+
+class fake_async_context_browser(fake_context_browser):
+    async def new_context(self, **kwargs):
+        return self.context
+
+
+class TestPlaywrightAsync(unittest.TestCase):
+
+    def _engine(self, **env):
+        engine = fake_engine()
+        engine.max_connections = 2
+        engine.max_pages = 2
+        engine.max_uses = 100
+        for k, v in env.items():
+            setattr(engine, k, v)
+        return engine
+
+    def test_shared_connections(self):
+        engine = self._engine()
+        fetchers = [fake_fetcher(seconds=0.2) for n in range(6)]
+        threads = [threading.Thread(target=engine.fetch, args=(f,), kwargs={'url': 'https://example.com'}) for f in fetchers]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+
+        # 6 checks at once, 2 pages per connection, but never more than 2 connections
+        assert engine.playwright.chromium.connects == 2
+        assert len(set(id(f.browser) for f in fetchers)) == 2
+        stats = engine.get_stats()
+        assert stats['checks'] == 6
+        assert stats['pages_open'] == 0
+
+        # Next check re-uses them
+        engine.fetch(fake_fetcher(), url='https://example.com')
+        assert engine.playwright.chromium.connects == 2
+
+    def test_recycle(self):
+        engine = self._engine(max_uses=2)
+        first = fake_fetcher()
+        engine.fetch(first, url='https://example.com')
+        engine.fetch(fake_fetcher(), url='https://example.com')
+        # max_uses reached
+        second = fake_fetcher()
+        engine.fetch(second, url='https://example.com')
+        assert second.browser is not first.browser
+        assert first.browser.closed
+
+        # Browser crashed or restarted
+        second.browser.connected = False
+        third = fake_fetcher()
+        engine.fetch(third, url='https://example.com')
+        assert third.browser is not second.browser
+        assert engine.get_stats()['connections_recycled'] == 2
+
+    def test_timeout(self):
+        engine = self._engine(fetch_timeout=0.2)
+        with self.assertRaises(BrowserFetchTimedOut):
+            engine.fetch(fake_fetcher(seconds=5), url='https://example.com')
+        assert engine.get_stats()['timeouts'] == 1
+
+    def _both_engines(self, status=200, ignore_status_codes=False):
+        sync_page, async_page = fake_page(status), fake_async_page(status)
+        sync_fetcher, async_fetcher = playwright_fetcher(), playwright_fetcher()
+        for f in (sync_fetcher, async_fetcher):
+            f.webdriver_js_execute_code = 'window.scrollTo(0, 100)'
+            f.render_extract_delay = 0
+
+        errors = []
+        try:
+            sync_fetcher.run_with_new_context(browser=fake_context_browser(fake_context(sync_page)), url='https://example.com',
+                                              request_headers={}, ignore_status_codes=ignore_status_codes, current_include_filters=['#price'])
+        except Exception as e:
+            errors.append(e)
+        try:
+            asyncio.run(async_fetcher.async_run(browser=fake_async_context_browser(fake_async_context(async_page)), url='https://example.com',
+                                                request_headers={}, ignore_status_codes=ignore_status_codes, current_include_filters=['#price']))
+        except Exception as e:
+            errors.append(e)
+
+        assert sync_page.calls == async_page.calls, "Same steps with both APIs"
+        return sync_fetcher, async_fetcher, errors
+
+    def test_same_as_sync_engine(self):
+        sync_fetcher, async_fetcher, errors = self._both_engines()
+        assert not errors
+        for attr in ['content', 'headers', 'status_code', 'xpath_data', 'instock_data', 'screenshot']:
+            assert getattr(sync_fetcher, attr) == getattr(async_fetcher, attr), attr
+        assert sync_fetcher.screenshot == b'jpeg'
+
+        sync_fetcher, async_fetcher, errors = self._both_engines(status=500)
+        assert [type(e) for e in errors] == [Non200ErrorCodeReceived, Non200ErrorCodeReceived]
+        assert errors[0].screenshot == errors[1].screenshot == b'jpeg'
+
+
+if __name__ == '__main__':
+    unittest.main()
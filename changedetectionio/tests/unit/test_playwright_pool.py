@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_playwright_pool
+
+import unittest
+
+from changedetectionio.content_fetchers.playwright_pool import playwright_pool
+from changedetectionio.tests.unit.playwright_fakes import fake_playwright
+
+
+class TestPlaywrightPool(unittest.TestCase):
+
+    def _pool(self, **kwargs):
+        args = dict(max_uses=3, max_idle_seconds=300, max_per_url=2)
+        args.update(kwargs)
+        pool = playwright_pool(**args)
+        # As if this thread already started its driver
+        driver = fake_playwright()
+        pool.local.state = {'playwright': driver, 'connections': {}}
+        pool.thread_states[0] = pool.local.state
+        return pool, driver
+
+    def test_reuse_and_recycle(self):
+        pool, driver = self._pool()
+        browsers = []
+        for n in range(4):
+            with pool.browser(browser_type='chromium', url='ws://browser:3000') as browser:
+                browsers.append(browser)
+
+        assert browsers[0] is browsers[1] is browsers[2]
+        assert browsers[3] is not browsers[0], "Recycled after max_uses"
+        assert browsers[0].closed
+        assert driver.chromium.connects == 2
+        assert pool.get_stats()['connections_reused'] == 2
+
+    def test_disconnected(self):
+        pool, driver = self._pool()
+        with pool.browser(browser_type='chromium', url='ws://browser:3000') as browser:
+            # Browser crashed or restarted during the check
+            browser.connected = False
+        with pool.browser(browser_type='chromium', url='ws://browser:3000') as second:
+            assert second is not browser
+        assert pool.get_stats()['connection_failures'] == 1
+
+        pool.close_thread()
+        assert driver.stopped
+        assert second.closed
+        assert pool.get_stats()['drivers'] == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
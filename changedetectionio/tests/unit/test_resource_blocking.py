@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_resource_blocking
+
+import unittest
+
+from changedetectionio.content_fetchers import resource_blocking
+
+
+class TestResourceBlocking(unittest.TestCase):
+
+    def test_get_rules(self):
+        settings = {'block_resource_types': ['media'], 'block_url_patterns': ['Tracker.com']}
+        assert resource_blocking.get_rules(settings, {}) == {'resource_types': ['media'], 'url_patterns': ['tracker.com']}
+
+        watch = {'block_resource_types': ['image'], 'block_url_patterns': ['ads.example.com']}
+        assert resource_blocking.get_rules(settings, watch) == {'resource_types': ['image', 'media'], 'url_patterns': ['ads.example.com', 'tracker.com']}
+
+        # Only the watch's own rules, which can be nothing at all
+        assert resource_blocking.get_rules(settings, {**watch, 'block_resources_override': True}) == {'resource_types': ['image'], 'url_patterns': ['ads.example.com']}
+        assert resource_blocking.get_rules(settings, {'block_resources_override': True}) is None
+
+        # Nothing by default, the browser fetchers don't intercept requests at all then
+        from changedetectionio.model.App import model as App
+        assert resource_blocking.get_rules(App.base_config['settings']['application'], {}) is None
+
+    def test_should_block(self):
+        rules = {'resource_types': ['media'], 'url_patterns': ['tracker.com', 'https://example.com/*.woff2', 'example.org/big/']}
+        assert resource_blocking.should_block(rules, 'https://example.com/video.mp4', 'media')
+        assert resource_blocking.should_block(rules, 'https://cdn.tracker.com/t.js', 'script')
+        assert not resource_blocking.should_block(rules, 'https://nottracker.com/t.js', 'script')
+        assert resource_blocking.should_block(rules, 'https://example.com/fonts/a.WOFF2', 'font')
+        assert resource_blocking.should_block(rules, 'https://example.org/big/file.bin', 'other')
+        assert not resource_blocking.should_block(rules, 'https://example.com/logo.png', 'image')
+        # Never the page itself
+        assert not resource_blocking.should_block(rules, 'https://tracker.com/', 'document')
+        assert not resource_blocking.should_block(None, 'https://example.com/video.mp4', 'media')
+
+    def test_counter(self):
+        before = resource_blocking.get_stats()
+        counter = resource_blocking.request_counter()
+        counter.count_blocked('media')
+        counter.count_blocked('media')
+        counter.count_allowed('1000')
+        counter.count_allowed(None)
+        counter.finish(url='https://example.com')
+
+        after = resource_blocking.get_stats()
+        assert after['blocked_requests'] - before['blocked_requests'] == 2
+        assert after['blocked_by_type']['media'] - before['blocked_by_type'].get('media', 0) == 2
+        assert after['allowed_bytes'] - before['allowed_bytes'] == 1000
+        assert after['allowed_requests'] - before['allowed_requests'] == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
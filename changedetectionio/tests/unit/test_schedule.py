@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_schedule
+
+import datetime
+import time
+import unittest
+
+import pytz
+
+from changedetectionio import schedule
+from changedetectionio.model import Watch
+
+berlin = pytz.timezone('Europe/Berlin')
+
+
+def ts(*args):
+    return int(berlin.localize(datetime.datetime(*args)).timestamp())
+
+
+class TestSchedule(unittest.TestCase):
+
+    def test_parse_time_window(self):
+        windows = schedule.parse_time_window('mon-fri 09:00-18:00, sat,sun 10:00-14:00')
+        assert windows == ((frozenset({0, 1, 2, 3, 4}), 540, 1080), (frozenset({5, 6}), 600, 840))
+        assert schedule.parse_time_window('fri-mon 22:00-06:00') == ((frozenset({4, 5, 6, 0}), 1320, 360),)
+
+        for bad in ['09:00', 'weekdays 09:00-17:00', '25:00-26:00', 'mon-fri 09:61-10:00']:
+            with self.assertRaises(ValueError):
+                schedule.parse_time_window(bad)
+
+    def test_next_in_time_window(self):
+        windows = schedule.parse_time_window('mon-fri 09:00-18:00')
+        # Wednesday 2024-01-03 at noon is inside
+        assert schedule.next_in_time_window(windows, ts(2024, 1, 3, 12, 0), berlin) == ts(2024, 1, 3, 12, 0)
+        # Wednesday evening waits for Thursday morning
+        assert schedule.next_in_time_window(windows, ts(2024, 1, 3, 19, 0), berlin) == ts(2024, 1, 4, 9, 0)
+        # Friday evening waits for Monday morning
+        assert schedule.next_in_time_window(windows, ts(2024, 1, 5, 18, 0), berlin) == ts(2024, 1, 8, 9, 0)
+
+        # Overnight, the early morning after a Friday night is still inside
+        windows = schedule.parse_time_window('fri 22:00-06:00')
+        assert schedule.next_in_time_window(windows, ts(2024, 1, 6, 5, 0), berlin) == ts(2024, 1, 6, 5, 0)
+        assert schedule.next_in_time_window(windows, ts(2024, 1, 6, 7, 0), berlin) == ts(2024, 1, 12, 22, 0)
+
+    def test_cron(self):
+        # Every 30 minutes during office hours
+        assert schedule.next_scheduled_time('*/30 9-17 * * mon-fri', None, 'Europe/Berlin', ts(2024, 1, 3, 12, 10), None) == ts(2024, 1, 3, 12, 30)
+        assert schedule.next_scheduled_time('*/30 9-17 * * mon-fri', None, 'Europe/Berlin', ts(2024, 1, 5, 17, 45), None) == ts(2024, 1, 8, 9, 0)
+        assert schedule.cron_interval_seconds('*/15 * * * *') == 900
+
+        assert schedule.next_scheduled_time('not cron', None, None, ts(2024, 1, 3, 12, 10), None) is None
+        assert schedule.cron_interval_seconds('*/15 * * * *', 'Not/A_Timezone') is None
+
+    def test_watch_next_check_time(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        # In the future, a time in the past would be "missed" and moved to when the window is next open
+        watch['last_checked'] = ts(2035, 1, 5, 17, 30)
+        # Every hour, but only during office hours, so Monday morning
+        watch['schedule_time_window'] = 'mon-fri 09:00-18:00'
+        watch['schedule_timezone'] = 'Europe/Berlin'
+        assert watch.next_check_time(default_seconds=3600, schedule=schedule.get_schedule(watch)) == ts(2035, 1, 8, 9, 0)
+        assert watch.next_check_time(default_seconds=3600) == ts(2035, 1, 5, 18, 30), "Schedule is only used when given"
+
+        watch['schedule_cron'] = '0 12 * * *'
+        assert watch.next_check_time(default_seconds=3600, schedule=schedule.get_schedule(watch)) == ts(2035, 1, 8, 12, 0)
+        # About a day (the average can include a daylight saving change)
+        assert abs(watch.effective_threshold_seconds(default_seconds=3600, schedule=schedule.get_schedule(watch)) - 86400) <= 3600
+
+        # A quick retry after an error does not wait for the cron expression
+        watch['last_error'] = "Connection refused"
+        watch['error_recheck_seconds'] = 30
+        watch['schedule_time_window'] = None
+        assert watch.next_check_time(default_seconds=3600, schedule=schedule.get_schedule(watch)) == ts(2035, 1, 5, 17, 30, 30)
+
+        # Invalid (set via the API) falls back to the interval
+        watch['last_error'] = False
+        watch['schedule_cron'] = 'not cron'
+        assert watch.next_check_time(default_seconds=3600, schedule=schedule.get_schedule(watch)) == ts(2035, 1, 5, 18, 30)
+
+    def test_missed_window(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch['last_checked'] = int(time.time()) - 86400 * 10
+        watch['schedule_time_window'] = f"{datetime.datetime.now() + datetime.timedelta(hours=2):%H:%M}-{datetime.datetime.now() + datetime.timedelta(hours=3):%H:%M}"
+        assert watch.next_check_time(default_seconds=3600, schedule=schedule.get_schedule(watch)) > time.time() + 3600
+
+    def test_cached_next_check_time(self):
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch['last_checked'] = ts(2035, 1, 5, 17, 30)
+        tag_schedule = {'cron': None, 'time_window': 'mon-fri 09:00-18:00', 'timezone': 'Europe/Berlin'}
+        lookups = []
+
+        def get_schedule():
+            lookups.append(1)
+            return tag_schedule
+
+        for n in range(3):
+            assert watch.cached_next_check_time(default_seconds=3600, schedule_revision=0, get_schedule=get_schedule) == ts(2035, 1, 8, 9, 0)
+        assert len(lookups) == 1, "Worked out once, not every tick"
+
+        # Checked again
+        watch.update({'last_checked': ts(2035, 1, 8, 9, 0)})
+        assert watch.cached_next_check_time(default_seconds=3600, schedule_revision=0, get_schedule=get_schedule) == ts(2035, 1, 8, 10, 0)
+        assert len(lookups) == 2
+
+        # The tag's schedule was edited
+        tag_schedule = None
+        assert watch.cached_next_check_time(default_seconds=3600, schedule_revision=0, get_schedule=get_schedule) == ts(2035, 1, 8, 10, 0)
+        assert watch.cached_next_check_time(default_seconds=3600, schedule_revision=1, get_schedule=get_schedule) == ts(2035, 1, 8, 10, 0)
+        assert len(lookups) == 3
+        watch['time_between_check'] = {'minutes': 5}
+        assert watch.cached_next_check_time(default_seconds=3600, schedule_revision=1, get_schedule=get_schedule) == ts(2035, 1, 8, 9, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_schedule_phase
+
+import time
+import unittest
+
+from changedetectionio.model import Watch
+
+
+class TestSchedulePhase(unittest.TestCase):
+
+    def test_deterministic_and_spread(self):
+        watches = [Watch.model(datastore_path='/tmp', default={}) for _ in range(1000)]
+
+        # Same UUID, same phase, every time
+        again = Watch.model(datastore_path='/tmp', default={'uuid': watches[0].get('uuid')})
+        assert again.schedule_phase == watches[0].schedule_phase
+
+        # Roughly evenly spread over the window
+        buckets = [0] * 10
+        for watch in watches:
+            assert 0 <= watch.schedule_phase < 1
+            buckets[int(watch.schedule_phase * 10)] += 1
+        assert min(buckets) > 50
+
+    def test_waits_for_ramp_slot(self):
+        ramp_started = time.time()
+        watch = Watch.model(datastore_path='/tmp', default={})
+        while watch.schedule_phase < 0.5:
+            watch = Watch.model(datastore_path='/tmp', default={})
+
+        # Overdue since before the restart, waits for its slot in the second half of the window
+        watch['last_checked'] = ramp_started - 86400
+        assert watch.waits_for_ramp_slot(now=ramp_started + 10, ramp_started=ramp_started, ramp_seconds=600)
+        assert not watch.waits_for_ramp_slot(now=ramp_started + 600, ramp_started=ramp_started, ramp_seconds=600)
+
+        # Added during the warm-up, checked straight away
+        watch['last_checked'] = 0
+        assert not watch.waits_for_ramp_slot(now=ramp_started + 10, ramp_started=ramp_started, ramp_seconds=600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_screenshots
+
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from changedetectionio import screenshots
+
+
+def jpeg(width=1280, height=3000, colour=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), colour).save(buffer, format='JPEG', quality=72)
+    return buffer.getvalue()
+
+
+class TestScreenshots(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.environ['SCREENSHOT_FORMAT'] = 'webp'
+
+    def tearDown(self):
+        del os.environ['SCREENSHOT_FORMAT']
+
+    def test_save_dedupe_thumbnail(self):
+        # What older versions left behind
+        with open(os.path.join(self.dir, 'last-screenshot.png'), 'wb') as f:
+            f.write(jpeg())
+
+        assert screenshots.save(self.dir, 'last-screenshot', jpeg(), thumbnail=True)
+        path = screenshots.find(self.dir, 'last-screenshot')
+        assert path.endswith('.webp')
+        assert not os.path.isfile(os.path.join(self.dir, 'last-screenshot.png'))
+        assert Image.open(path).format == 'WEBP'
+
+        thumbnail = Image.open(screenshots.find(self.dir, 'last-screenshot-thumbnail'))
+        assert thumbnail.size == screenshots.THUMBNAIL_SIZE, "Top of the page, not the whole long page squashed"
+
+        mtime = os.path.getmtime(path)
+        os.utime(path, (mtime - 100, mtime - 100))
+        assert not screenshots.save(self.dir, 'last-screenshot', jpeg(), thumbnail=True), "Same picture is not written again"
+        assert os.path.getmtime(path) > mtime - 100
+
+        assert screenshots.save(self.dir, 'last-screenshot', jpeg(colour=(30, 200, 30)), thumbnail=True)
+
+    def test_long_page_and_jpeg(self):
+        # Too long for WebP
+        assert screenshots.save(self.dir, 'last-screenshot', jpeg(width=800, height=20000))
+        assert screenshots.find(self.dir, 'last-screenshot').endswith('.jpeg')
+
+        os.environ['SCREENSHOT_FORMAT'] = 'jpeg'
+        original = jpeg(colour=(1, 2, 3))
+        screenshots.save(self.dir, 'last-error-screenshot', original)
+        with open(screenshots.find(self.dir, 'last-error-screenshot'), 'rb') as f:
+            assert f.read() == original, "Already JPEG, stored as it came"
+
+        screenshots.delete(self.dir, 'last-error-screenshot')
+        assert screenshots.find(self.dir, 'last-error-screenshot') is None
+
+    def test_not_convertible(self):
+        # Not something Pillow reads, kept as it came instead of failing the check
+        assert screenshots.save(self.dir, 'last-screenshot', b'not a picture', thumbnail=True)
+        with open(screenshots.find(self.dir, 'last-screenshot'), 'rb') as f:
+            assert f.read() == b'not a picture'
+        assert screenshots.find(self.dir, 'last-screenshot-thumbnail') is None
+
+        # More pixels than Pillow opens (very long full page screenshot)
+        max_pixels = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = 100 * 100
+        try:
+            long_page = jpeg(width=300, height=1000)
+            assert screenshots.save(self.dir, 'last-screenshot', long_page)
+            assert screenshots.find(self.dir, 'last-screenshot').endswith('.jpeg')
+        finally:
+            Image.MAX_IMAGE_PIXELS = max_pixels
+
+    def test_as_jpeg(self):
+        screenshots.save(self.dir, 'last-screenshot', jpeg())
+        path = screenshots.as_jpeg(self.dir, 'last-screenshot')
+        assert path != screenshots.find(self.dir, 'last-screenshot')
+        assert Image.open(path).format == 'JPEG', "Email clients often don't show WebP"
+
+        screenshots.delete(self.dir, 'last-screenshot')
+        assert not os.path.isfile(path)
+        assert screenshots.as_jpeg(self.dir, 'last-screenshot') is None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_selenium_pool
+
+import unittest
+
+from selenium.common.exceptions import WebDriverException
+
+from changedetectionio.content_fetchers.selenium_pool import selenium_pool
+
+
+class fake_switch_to():
+    def window(self, handle):
+        pass
+
+
+class fake_driver():
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+        self.visited = []
+        self.cookies_cleared = 0
+        self.window_handles = ['main']
+        self.switch_to = fake_switch_to()
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise WebDriverException("invalid session id")
+        return self.visited[-1] if self.visited else 'about:blank'
+
+    def execute(self, command, params):
+        self.cookies_cleared += 1
+
+    def execute_script(self, script):
+        pass
+
+    def get(self, url):
+        if not self.alive:
+            raise WebDriverException("invalid session id")
+        self.visited.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+class TestSeleniumPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+    def create_driver(self):
+        driver = fake_driver()
+        self.created.append(driver)
+        return driver
+
+    def check(self, pool, url='https://example.com'):
+        with pool.session(url='http://grid:4444/wd/hub', proxy=None, create_driver=self.create_driver) as driver:
+            driver.get(url)
+        return driver
+
+    def test_reuse_reset_recycle(self):
+        pool = selenium_pool(max_uses=3, max_idle_seconds=240, max_idle_sessions=5)
+        drivers = [self.check(pool) for n in range(4)]
+
+        assert drivers[0] is drivers[1] is drivers[2]
+        assert drivers[0].visited == ['https://example.com', 'about:blank'] * 2 + ['https://example.com'], "Reset between checks"
+        assert drivers[0].cookies_cleared == 2
+        assert drivers[0].quit_called, "Recycled after max_uses"
+        assert drivers[3] is not drivers[0]
+        stats = pool.get_stats()
+        assert stats['sessions_created'] == 2
+        assert stats['sessions_reused'] == 2
+        assert stats['idle_sessions'] == 1
+
+        pool.close_all()
+        assert drivers[3].quit_called
+
+    def test_lost_session(self):
+        pool = selenium_pool(max_uses=100, max_idle_seconds=240, max_idle_sessions=5)
+        first = self.check(pool)
+        # Grid timed out the session while it was in the pool
+        first.alive = False
+        second = self.check(pool)
+        assert second is not first
+        assert first.quit_called
+        assert pool.get_stats()['session_failures'] == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_session_pool
+
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from changedetectionio.content_fetchers.session_pool import session_pool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'hello'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'session=secret')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSessionPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def test_connections_are_reused(self):
+        pool = session_pool(max_sessions=2, max_hosts=10, per_host=2, idle_seconds=300)
+        for _ in range(5):
+            r = pool.get(proxies={}, verify=False).get(self.url)
+            assert r.text == 'hello'
+
+        stats = pool.get_stats()
+        assert stats['requests'] == 5
+        assert stats['new_connections'] == 1
+        assert stats['reused_connections'] == 4
+        assert stats['sessions'] == 1
+
+        assert not len(pool.get(proxies={}, verify=False).cookies), "Cookies are never kept between watches"
+
+    def test_bounded_and_idle_eviction(self):
+        pool = session_pool(max_sessions=2, max_hosts=10, per_host=2, idle_seconds=300)
+        a = pool.get(proxies={'http': 'http://proxy-a:3128'})
+        pool.get(proxies={'http': 'http://proxy-b:3128'})
+        assert pool.get(proxies={'http': 'http://proxy-a:3128'}) is a
+        pool.get(proxies={'http': 'http://proxy-c:3128'})
+        assert pool.get_stats()['sessions'] == 2
+        assert pool.get_stats()['sessions_evicted'] == 1, "Least recently used (proxy-b) was closed"
+        assert pool.get(proxies={'http': 'http://proxy-a:3128'}) is a
+
+        pool.idle_seconds = 0
+        time.sleep(0.01)
+        pool.get(proxies={})
+        assert pool.get_stats()['sessions'] == 1, "Idle sessions were closed"
+
+
+if __name__ == '__main__':
+    unittest.main()
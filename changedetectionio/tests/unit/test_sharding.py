@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_sharding
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from changedetectionio import sharding
+
+
+class TestSharding(unittest.TestCase):
+
+    def test_hash_ring(self):
+        uuids = [f"watch-{n}" for n in range(3000)]
+        ring = sharding.hash_ring(['a', 'b', 'c'])
+        owners = {uuid: ring.get_node(uuid) for uuid in uuids}
+        for node in ['a', 'b', 'c']:
+            assert 700 < list(owners.values()).count(node) < 1300, "Roughly evenly spread"
+
+        # Only the watches of the instance that left move
+        smaller = sharding.hash_ring(['a', 'c'])
+        for uuid in uuids:
+            if owners[uuid] != 'b':
+                assert smaller.get_node(uuid) == owners[uuid]
+
+        assert sharding.hash_ring([]).get_node('x') is None
+
+    def test_membership(self):
+        with tempfile.TemporaryDirectory() as datastore_path:
+            a = sharding.shard_membership(datastore_path=datastore_path, instance_id='a')
+            b = sharding.shard_membership(datastore_path=datastore_path, instance_id='b')
+            a.heartbeat()
+            b.heartbeat()
+            a.heartbeat(force=True)
+            assert a.members == ['a', 'b'] and b.members == ['a', 'b']
+            assert all(a.owns(f"w{n}") != b.owns(f"w{n}") for n in range(100))
+
+            # Stopped updating its heartbeat
+            with open(os.path.join(datastore_path, 'instances', 'b.json'), 'w') as f:
+                json.dump({'instance_id': 'b', 'time': time.time() - 120}, f)
+            a.heartbeat(force=True)
+            assert a.members == ['a']
+            assert all(a.owns(f"w{n}") for n in range(100))
+
+            a.leave()
+            assert not os.path.isfile(os.path.join(datastore_path, 'instances', 'a.json'))
+
+    def test_merge_shared_json(self):
+        base = {'app_guid': 'x',
+                'settings': {'application': {'fetch_backend': 'html_requests', 'tags': {'t1': {'title': 'One'}}}},
+                'watching': {'w1': {'url': 'https://a', 'last_checked': 1},
+                             'w2': {'url': 'https://b', 'last_checked': 1},
+                             'w3': {'url': 'https://c', 'last_checked': 1}}}
+
+        # This instance checked w1 and deleted w3
+        local = json.loads(json.dumps(base))
+        local['watching']['w1']['last_checked'] = 100
+        del local['watching']['w3']
+
+        # Another instance checked w2, edited w1 in the UI, added w4 and a tag, changed a setting
+        disk = json.loads(json.dumps(base))
+        disk['watching']['w2']['last_checked'] = 200
+        disk['watching']['w1']['url'] = 'https://a/new'
+        disk['watching']['w4'] = {'url': 'https://d'}
+        disk['settings']['application']['tags']['t2'] = {'title': 'Two'}
+        disk['settings']['application']['fetch_backend'] = 'html_webdriver'
+
+        merged = sharding.merge_shared_json(base=base, local=local, disk=disk)
+        assert merged['watching'] == {'w1': {'url': 'https://a/new', 'last_checked': 100},
+                                      'w2': {'url': 'https://b', 'last_checked': 200},
+                                      'w4': {'url': 'https://d'}}
+        assert set(merged['settings']['application']['tags'].keys()) == {'t1', 't2'}
+        assert merged['settings']['application']['fetch_backend'] == 'html_webdriver'
+        assert merged['app_guid'] == 'x'
+
+    def test_apply_shared_json(self):
+        memory = {'settings': {'application': {'fetch_backend': 'html_requests', 'tags': {}}},
+                  'watching': {'w1': {'url': 'https://a', 'title': None, 'last_checked': 1},
+                               'w2': {'url': 'https://b'}}}
+        snapshot = json.loads(json.dumps(memory))
+
+        # Edited in the UI here while the sync was reading and writing the file
+        memory['watching']['w1']['title'] = 'Mine'
+
+        # Another instance changed the title and checked it, deleted w2, added w3
+        merged = json.loads(json.dumps(snapshot))
+        merged['watching']['w1']['title'] = 'Theirs'
+        merged['watching']['w1']['last_checked'] = 200
+        del merged['watching']['w2']
+        merged['watching']['w3'] = {'url': 'https://c'}
+        merged['settings']['application']['fetch_backend'] = 'html_webdriver'
+
+        sharding.apply_shared_json(memory=memory, snapshot=snapshot, merged=merged, new_watch=lambda uuid, watch: {**watch, 'uuid': uuid})
+        assert memory['watching']['w1'] == {'url': 'https://a', 'title': 'Mine', 'last_checked': 200}, "Not over the local edit"
+        assert memory['watching']['w3'] == {'url': 'https://c', 'uuid': 'w3'}
+        assert 'w2' not in memory['watching']
+        assert memory['settings']['application']['fetch_backend'] == 'html_webdriver'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_worker_autoscaler
+
+import time
+import unittest
+
+from changedetectionio.worker_autoscaler import worker_autoscaler
+
+
+class fake_worker():
+    current_uuid = None
+    current_started = None
+    retire = False
+    abandoned = False
+    name = 'fake-worker'
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return not self.retire
+
+
+class TestWorkerAutoscaler(unittest.TestCase):
+
+    def _autoscaler(self, min_workers, max_workers):
+        workers = []
+        a = worker_autoscaler(workers=workers, start_worker=fake_worker, min_workers=min_workers, max_workers=max_workers)
+        a.interval_seconds = 0
+        a.cooldown_seconds = 0
+        a.target_seconds = 60
+        a.scale_to(min_workers)
+        return a, workers
+
+    def test_fixed_when_no_bounds(self):
+        a, workers = self._autoscaler(min_workers=5, max_workers=5)
+        a.evaluate(queue_size=1000, oldest_due_seconds=5000, average_check_seconds=10)
+        assert len(workers) == 5
+        assert not a.get_state()['autoscale']
+
+    def test_grow_and_shrink(self):
+        a, workers = self._autoscaler(min_workers=2, max_workers=20)
+        for w in workers:
+            w.current_uuid = 'busy'
+
+        # 30 waiting at 10s each should be done in 60s, 2 busy + 5 more
+        a.evaluate(queue_size=30, oldest_due_seconds=0, average_check_seconds=10)
+        assert len(a.active_workers()) == 7
+        assert a.get_state()['decisions'][-1]['to'] == 7
+
+        # Falling behind, grows by a quarter even when the queue looks small, never above max
+        a.evaluate(queue_size=1, oldest_due_seconds=600, average_check_seconds=1)
+        assert len(a.active_workers()) == 9
+        a.evaluate(queue_size=100000, oldest_due_seconds=600, average_check_seconds=10)
+        assert len(a.active_workers()) == 20
+
+        # Queue empty, idle workers retire one at a time, busy ones are never asked to stop
+        for w in workers:
+            w.current_uuid = None
+        workers[0].current_uuid = 'busy'
+        a.evaluate(queue_size=0, oldest_due_seconds=0, average_check_seconds=1)
+        assert len(a.active_workers()) == 19
+        for _ in range(30):
+            a.evaluate(queue_size=0, oldest_due_seconds=0, average_check_seconds=1)
+        assert len(a.active_workers()) == 2
+        assert not workers[0].retire
+        assert len(workers) == 2, "Finished retired workers are removed from the list"
+
+    def test_watchdog_replaces_hung_worker(self):
+        a, workers = self._autoscaler(min_workers=3, max_workers=3)
+        abandoned = []
+        workers[0].current_uuid = 'stuck'
+        workers[0].current_started = time.time() - 1000
+        workers[1].current_uuid = 'busy'
+        workers[1].current_started = time.time() - 10
+
+        a.reclaim_hung_workers(deadline_seconds=900, on_abandoned=lambda uuid, seconds: abandoned.append(uuid))
+        assert abandoned == ['stuck']
+        assert workers[0].abandoned and workers[0].retire
+        assert not workers[1].abandoned
+        # Replaced even though it is at max_workers, the stuck one does not count
+        assert len(a.active_workers()) == 3
+        assert len(workers) == 4
+
+        # Only reported once
+        a.reclaim_hung_workers(deadline_seconds=900, on_abandoned=lambda uuid, seconds: abandoned.append(uuid))
+        assert abandoned == ['stuck']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -171,6 +171,29 @@ def live_server_setup(live_server):
         except FileNotFoundError:
             return make_response('', status_code)
 
+    # Replies "304 Not Modified" when the ETag or Last-Modified sent back still matches the content
+    @live_server.app.route('/test-conditional-endpoint')
+    def test_conditional_endpoint():
+        import hashlib
+        with open("test-datastore/endpoint-content.txt", "r") as f:
+            content = f.read()
+
+        etag = '"{}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+        last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+        with open("test-datastore/conditional-request-headers.txt", "a") as f:
+            f.write("If-None-Match:{} If-Modified-Since:{}\n".format(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')))
+
+        if request.headers.get('If-None-Match') == etag or request.headers.get('If-Modified-Since') == last_modified:
+            resp = make_response('', 304)
+        else:
+            resp = make_response(content, 200)
+            resp.headers['Content-Type'] = 'text/html'
+            # Used to simulate a server that lies about the content not changing
+            resp.headers['Last-Modified'] = last_modified
+        resp.headers['ETag'] = etag
+        return resp
+
     # Just return the headers in the request
     @live_server.app.route('/test-headers')
     def test_headers():
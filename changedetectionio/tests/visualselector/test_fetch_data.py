@@ -53,7 +53,8 @@ def test_visual_selector_content_ready(client, live_server):
     assert b"user-agent: mycustomagent" in res.data
 
 
-    assert os.path.isfile(os.path.join('test-datastore', uuid, 'last-screenshot.png')), "last-screenshot.png should exist"
+    assert live_server.app.config['DATASTORE'].data['watching'][uuid].get_screenshot(), "last-screenshot should exist"
+    assert live_server.app.config['DATASTORE'].data['watching'][uuid].get_screenshot_thumbnail(), "last-screenshot-thumbnail should exist"
     assert os.path.isfile(os.path.join('test-datastore', uuid, 'elements.json')), "xpath elements.json data should exist"
 
     # Open it and see if it roughly looks correct
@@ -2,8 +2,9 @@ import os
 import threading
 import queue
 import time
+import requests
 from . import content_fetchers
-from changedetectionio import html_tools
+from changedetectionio import html_tools, processing_pool
 from .processors.text_json_diff import FilterNotFoundInResponse
 from .processors.restock_diff import UnableToExtractRestockData
 
@@ -17,6 +18,12 @@ from loguru import logger
 
 class update_worker(threading.Thread):
     current_uuid = None
+    # When the current check started, for the watchdog
+    current_started = None
+    # Set by the autoscaler, the worker stops after the current loop
+    retire = False
+    # Set by the watchdog when the current check took too long and a replacement worker was started
+    abandoned = False
 
     def __init__(self, q, notification_q, app, datastore, *args, **kwargs):
         self.q = q
@@ -75,7 +82,7 @@ class update_worker(threading.Thread):
             'diff_patch': diff.render_diff(prev_snapshot, current_snapshot, line_feed_sep=line_feed_sep, patch_format=True),
             'diff_removed': diff.render_diff(prev_snapshot, current_snapshot, include_added=False, line_feed_sep=line_feed_sep),
             'notification_timestamp': now,
-            'screenshot': watch.get_screenshot() if watch and watch.get('notification_screenshot') else None,
+            'screenshot': watch.get_screenshot_as_jpeg() if watch and watch.get('notification_screenshot') else None,
             'triggered_text': triggered_text,
             'uuid': watch.get('uuid') if watch else None,
             'watch_url': watch.get('url') if watch else None,
@@ -218,18 +225,50 @@ class update_worker(threading.Thread):
 
     def cleanup_error_artifacts(self, uuid):
         # All went fine, remove error artifacts
-        cleanup_files = ["last-error-screenshot.png", "last-error.txt"]
-        for f in cleanup_files:
-            full_path = os.path.join(self.datastore.datastore_path, uuid, f)
-            if os.path.isfile(full_path):
-                os.unlink(full_path)
+        from changedetectionio import screenshots
+        screenshots.delete(os.path.join(self.datastore.datastore_path, uuid), "last-error-screenshot")
+        full_path = os.path.join(self.datastore.datastore_path, uuid, "last-error.txt")
+        if os.path.isfile(full_path):
+            os.unlink(full_path)
+
+    def update_recheck_schedule(self, uuid, error_category=None):
+        watch = self.datastore.data['watching'].get(uuid)
+        if not watch:
+            return
+
+        # Any error left on the watch after the check means this attempt failed
+        consecutive_errors = watch.get('consecutive_errors', 0) + 1 if watch.get('last_error') else 0
+        self.datastore.update_watch(uuid=uuid, update_obj={'consecutive_errors': consecutive_errors})
+
+        requests_settings = self.datastore.data['settings']['requests']
+        seconds = watch.threshold_seconds() or self.datastore.threshold_seconds
+        schedule = self.datastore.get_schedule_for_watch(uuid)
+        if schedule and schedule.get('cron'):
+            # Retries and back-off are based on how often the cron expression runs
+            seconds = watch.effective_threshold_seconds(default_seconds=seconds, schedule=schedule)
+        elif watch.get('adaptive_recheck'):
+            seconds = watch.adaptive_threshold_seconds(base_seconds=seconds,
+                                                       minimum_seconds=requests_settings.get('adaptive_recheck_min_seconds'),
+                                                       maximum_seconds=requests_settings.get('adaptive_recheck_max_seconds'))
+            logger.debug(f"Watch {uuid} adaptive recheck interval is now {seconds}s")
+            self.datastore.update_watch(uuid=uuid, update_obj={'adaptive_recheck_seconds': seconds})
+
+        error_recheck_seconds = None
+        if consecutive_errors:
+            error_recheck_seconds = watch.error_recheck_seconds(error_category=error_category,
+                                                                base_seconds=seconds,
+                                                                retry_seconds=requests_settings.get('error_retry_seconds', 30),
+                                                                retry_attempts=requests_settings.get('error_retry_attempts', 3),
+                                                                maximum_seconds=requests_settings.get('error_backoff_max_seconds', 86400))
+            logger.debug(f"Watch {uuid} {error_category} error #{consecutive_errors}, next check in {error_recheck_seconds}s")
+        self.datastore.update_watch(uuid=uuid, update_obj={'error_recheck_seconds': error_recheck_seconds})
 
     def run(self):
 
         from .processors import text_json_diff, restock_diff
         now = time.time()
         
-        while not self.app.config.exit.is_set():
+        while not self.app.config.exit.is_set() and not self.retire:
             update_handler = None
 
             try:
@@ -240,11 +279,14 @@ class update_worker(threading.Thread):
             else:
                 uuid = queued_item_data.item.get('uuid')
                 self.current_uuid = uuid
+                self.current_started = time.time()
                 if uuid in list(self.datastore.data['watching'].keys()) and self.datastore.data['watching'][uuid].get('url'):
                     changed_detected = False
                     contents = b''
                     process_changedetection_results = True
                     update_obj = {}
+                    # 'transient' errors are retried soon, anything else backs off, see update_recheck_schedule()
+                    error_category = 'persistent'
                     logger.info(f"Processing watch UUID {uuid} "
                             f"Priority {queued_item_data.priority} "
                             f"URL {self.datastore.data['watching'][uuid]['url']}")
@@ -262,7 +304,16 @@ class update_worker(threading.Thread):
                         # @todo some way to switch by name
                         # Init a new 'difference_detection_processor'
 
-                        if processor == 'restock_diff':
+                        if os.getenv('REMOTE_WORKER_QUEUE'):
+                            # Distributed mode, a worker node does the fetch and processing, results are applied here as usual
+                            from .distributed import remote_update_handler
+                            update_handler = remote_update_handler(datastore=self.datastore,
+                                                                   watch_uuid=uuid,
+                                                                   queue_path=os.getenv('REMOTE_WORKER_QUEUE'),
+                                                                   priority=queued_item_data.priority,
+                                                                   exit_event=self.app.config.exit
+                                                                   )
+                        elif processor == 'restock_diff':
                             update_handler = restock_diff.perform_site_check(datastore=self.datastore,
                                                                              watch_uuid=uuid
                                                                              )
@@ -275,11 +326,18 @@ class update_worker(threading.Thread):
                         # Clear last errors (move to preflight func?)
                         self.datastore.data['watching'][uuid]['browser_steps_last_error_step'] = None
 
-                        update_handler.call_browser()
+                        update_handler.call_browser(skip_when_checksum_same=skip_when_same_checksum)
 
-                        changed_detected, update_obj, contents = update_handler.run_changedetection(uuid,
-                                                                                    skip_when_checksum_same=skip_when_same_checksum,
-                                                                                    )
+                        if processing_pool.processing_workers() and not os.getenv('REMOTE_WORKER_QUEUE'):
+                            # Parsing, filtering and text extraction in another process, keeps this thread free for I/O
+                            changed_detected, update_obj, contents = processing_pool.run_changedetection(update_handler,
+                                                                                                         uuid,
+                                                                                                         skip_when_checksum_same=skip_when_same_checksum,
+                                                                                                         )
+                        else:
+                            changed_detected, update_obj, contents = update_handler.run_changedetection(uuid,
+                                                                                        skip_when_checksum_same=skip_when_same_checksum,
+                                                                                        )
 
                         # Re #342
                         # In Python 3, all strings are sequences of Unicode characters. There is a bytes type that holds raw bytes.
@@ -332,6 +390,9 @@ class update_worker(threading.Thread):
                             self.datastore.save_error_text(watch_uuid=uuid, contents=e.page_text)
 
                         self.datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text})
+                        # Server trouble or rate limited, usually goes away by itself
+                        if e.status_code in [408, 429] or e.status_code >= 500:
+                            error_category = 'transient'
                         process_changedetection_results = False
 
                     except FilterNotFoundInResponse as e:
@@ -368,12 +429,14 @@ class update_worker(threading.Thread):
                                                     update_obj={'last_error': e.msg
                                                                 }
                                                     )
+                        error_category = 'transient'
                         process_changedetection_results = False
                     except content_fetchers.exceptions.BrowserFetchTimedOut as e:
                         self.datastore.update_watch(uuid=uuid,
                                                     update_obj={'last_error': e.msg
                                                                 }
                                                     )
+                        error_category = 'transient'
                         process_changedetection_results = False
                     except content_fetchers.exceptions.BrowserStepsStepException as e:
 
@@ -381,12 +444,12 @@ class update_worker(threading.Thread):
                             continue
 
                         error_step = e.step_n + 1
-                        from playwright._impl._errors import TimeoutError, Error
 
                         # Generally enough info for TimeoutError (couldnt locate the element after default seconds)
                         err_text = f"Browser step at position {error_step} could not run, check the watch, add a delay if necessary, view Browser Steps to see screenshot at that step."
 
-                        if e.original_e.name == "TimeoutError":
+                        # Playwright or Puppeteer (pyppeteer) error
+                        if type(e.original_e).__name__ == "TimeoutError":
                             # Just the first line is enough, the rest is the stack trace
                             err_text += " Could not find the target."
                         else:
@@ -422,11 +485,13 @@ class update_worker(threading.Thread):
                         err_text = "EmptyReply - try increasing 'Wait seconds before extracting text', Status Code {}".format(e.status_code)
                         self.datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
                                                                            'last_check_status': e.status_code})
+                        error_category = 'transient'
                         process_changedetection_results = False
                     except content_fetchers.exceptions.ScreenshotUnavailable as e:
                         err_text = "Screenshot unavailable, page did not render fully in the expected time or page was too long - try increasing 'Wait seconds before extracting text'"
                         self.datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
                                                                            'last_check_status': e.status_code})
+                        error_category = 'transient'
                         process_changedetection_results = False
                     except content_fetchers.exceptions.JSActionExceptions as e:
                         err_text = "Error running JS Actions - Page request - "+e.message
@@ -446,6 +511,8 @@ class update_worker(threading.Thread):
                         self.datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
                                                                            'last_check_status': e.status_code,
                                                                            'has_ldjson_price_data': None})
+                        # Connection refused, DNS lookup failed, network changed etc
+                        error_category = 'transient'
                         process_changedetection_results = False
                     except content_fetchers.exceptions.BrowserStepsInUnsupportedFetcher as e:
                         err_text = "This watch has Browser Steps configured and so it cannot run with the 'Basic fast Plaintext/HTTP Client', either remove the Browser Steps or select a Chrome fetcher."
@@ -463,6 +530,8 @@ class update_worker(threading.Thread):
                         logger.error(f"Exception reached processing watch UUID: {uuid}")
                         logger.error(str(e))
                         self.datastore.update_watch(uuid=uuid, update_obj={'last_error': "Exception: " + str(e)})
+                        if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError)):
+                            error_category = 'transient'
                         # Other serious error
                         process_changedetection_results = False
 #                        import traceback
@@ -480,8 +549,15 @@ class update_worker(threading.Thread):
                         # Everything ran OK, clean off any previous error
                         update_obj['last_error'] = False
 
+                        # Remember the ETag/Last-Modified of what was just processed, for the next conditional request
+                        update_obj.update(update_handler.fetcher.get_conditional_request_validators())
+
                         self.cleanup_error_artifacts(uuid)
 
+                    # Which fetcher worked for the 'auto' fetch backend, also when the check itself failed
+                    if update_handler and update_handler.auto_fetch_update:
+                        self.datastore.update_watch(uuid=uuid, update_obj=update_handler.auto_fetch_update)
+
                     #
                     # Different exceptions mean that we may or may not want to bump the snapshot, trigger notifications etc
                     if process_changedetection_results:
@@ -529,6 +605,8 @@ class update_worker(threading.Thread):
                                                                            'check_count': count
                                                                            })
 
+                        self.update_recheck_schedule(uuid, error_category=error_category)
+
                         # Always save the screenshot if it's available
                         if update_handler.screenshot:
                             self.datastore.save_screenshot(watch_uuid=uuid, screenshot=update_handler.screenshot)
@@ -536,7 +614,10 @@ class update_worker(threading.Thread):
                             self.datastore.save_xpath_data(watch_uuid=uuid, data=update_handler.xpath_data)
 
 
+                if self.abandoned:
+                    logger.warning(f"Watch {uuid} finished after {time.time()-now:.2f}s, long after the watchdog abandoned it")
                 self.current_uuid = None  # Done
+                self.current_started = None
                 self.q.task_done()
                 logger.debug(f"Watch {uuid} done in {time.time()-now:.2f}s")
 
@@ -544,3 +625,7 @@ class update_worker(threading.Thread):
                 time.sleep(0.1)
 
             self.app.config.exit.wait(1)
+
+        # Retired or shutting down, close the browser connections this thread kept open
+        from changedetectionio.content_fetchers import playwright_pool
+        playwright_pool.close_thread()
@@ -0,0 +1,136 @@
+import math
+import os
+import time
+from collections import deque
+
+from loguru import logger
+
+# Grows and shrinks the number of update_worker threads between FETCH_WORKERS_MIN and FETCH_WORKERS_MAX,
+# based on how much is waiting in the queue, how overdue the most overdue watch is and how long a check takes.
+# When both are the same (the default) the number of workers is fixed, like before.
+
+# Set by the ticker thread, read by the API
+autoscaler = None
+
+
+class worker_autoscaler():
+
+    def __init__(self, workers, start_worker, min_workers, max_workers):
+        """
+        :param workers: The list of running update_worker threads, workers are added to/removed from it
+        :param start_worker: Function that returns a new (not started) update_worker
+        """
+        self.workers = workers
+        self.start_worker = start_worker
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        # Try to get through what is waiting in the queue within this many seconds
+        self.target_seconds = int(os.getenv('FETCH_WORKERS_TARGET_SECONDS', 60))
+        # Seconds between decisions, and how long after growing before shrinking is considered
+        self.interval_seconds = int(os.getenv('FETCH_WORKERS_SCALE_INTERVAL_SECONDS', 10))
+        self.cooldown_seconds = int(os.getenv('FETCH_WORKERS_SCALE_DOWN_COOLDOWN_SECONDS', 60))
+        self.last_evaluated = 0
+        self.last_scaled_up = 0
+        self.decisions = deque(maxlen=20)
+        self.metrics = {'queue_size': 0, 'oldest_due_seconds': 0, 'average_check_seconds': 0}
+
+    @property
+    def autoscale(self):
+        return self.max_workers > self.min_workers
+
+    def active_workers(self):
+        return [w for w in self.workers if not w.retire]
+
+    def scale_to(self, n):
+        n = min(max(n, self.min_workers), self.max_workers)
+        while len(self.active_workers()) < n:
+            new_worker = self.start_worker()
+            self.workers.append(new_worker)
+            new_worker.start()
+
+        # Only idle workers are asked to stop, they finish after the current loop
+        for w in self.active_workers():
+            if len(self.active_workers()) <= n:
+                break
+            if not w.current_uuid:
+                w.retire = True
+
+    def _decide(self, n, reason):
+        active = len(self.active_workers())
+        if n > active:
+            self.last_scaled_up = time.time()
+        self.scale_to(n)
+        if len(self.active_workers()) == active:
+            # Nothing idle to retire right now
+            return
+        decision = {'time': round(time.time()), 'from': active, 'to': len(self.active_workers()), 'reason': reason, **self.metrics}
+        self.decisions.append(decision)
+        logger.info(f"Workers {decision['from']} -> {decision['to']}, {reason}")
+
+    def evaluate(self, queue_size, oldest_due_seconds, average_check_seconds):
+        """
+        Called from the ticker every second, decides every interval_seconds
+        """
+        # Retired workers that finished can go
+        for w in [w for w in self.workers if w.retire and not w.is_alive()]:
+            self.workers.remove(w)
+
+        if not self.autoscale or time.time() - self.last_evaluated < self.interval_seconds:
+            return
+        self.last_evaluated = time.time()
+
+        self.metrics = {'queue_size': queue_size,
+                        'oldest_due_seconds': round(oldest_due_seconds, 1),
+                        'average_check_seconds': round(average_check_seconds, 2)}
+
+        active = self.active_workers()
+        busy = len([w for w in active if w.current_uuid])
+
+        # Enough workers to get through the queue within target_seconds at the current speed per check
+        needed = busy + math.ceil(queue_size * max(average_check_seconds, 1) / self.target_seconds)
+        reason = f"{queue_size} queued, {busy} busy, {average_check_seconds:.1f}s per check"
+
+        # Falling behind anyway? grow by a quarter
+        if queue_size and oldest_due_seconds > self.target_seconds:
+            needed = max(needed, len(active) + math.ceil(len(active) / 4))
+            reason += f", most overdue watch is {oldest_due_seconds:.0f}s late"
+
+        needed = min(max(needed, self.min_workers), self.max_workers)
+
+        if needed > len(active):
+            self._decide(needed, reason)
+        elif needed < len(active) and not queue_size and time.time() - self.last_scaled_up > self.cooldown_seconds:
+            # Shrink slowly, one at a time
+            self._decide(len(active) - 1, reason)
+
+    def reclaim_hung_workers(self, deadline_seconds, on_abandoned):
+        """
+        Watchdog, a check that runs longer than deadline_seconds is abandoned and a replacement worker started.
+        A Python thread can't be killed, the stuck one keeps its current_uuid (so that watch is not queued again
+        while it is still stuck) and exits when (if ever) the check returns.
+        :param on_abandoned: Called with the watch UUID and the seconds it was running
+        """
+        if not deadline_seconds:
+            return
+
+        for w in self.active_workers():
+            started = w.current_started
+            if w.current_uuid and started and time.time() - started > deadline_seconds:
+                w.abandoned = True
+                w.retire = True
+                logger.critical(f"Watchdog: worker {w.name} stuck on watch {w.current_uuid} for {time.time() - started:.0f}s, starting a replacement")
+                on_abandoned(w.current_uuid, time.time() - started)
+                self.scale_to(len(self.active_workers()) + 1)
+
+    def get_state(self):
+        active = self.active_workers()
+        return {
+            'autoscale': self.autoscale,
+            'busy': len([w for w in active if w.current_uuid]),
+            'count': len(active),
+            'decisions': list(self.decisions),
+            'max': self.max_workers,
+            'min': self.min_workers,
+            'abandoned': len([w for w in self.workers if w.abandoned and w.is_alive()]),
+            **self.metrics,
+        }